@@ -19,6 +19,7 @@ from src.database import (
         Database,
         get_class_from_name,
         InstagramDatabase,
+        InstagramStoreDatabase,
         SUBCLASSES,
         SubredditsDatabase,
         UniqueConstraintFailed,
@@ -48,6 +49,7 @@ IG_DB_LIKES     = 'ig-db-likes'
 IG_DB_COMMENTS  = 'ig-db-comments'
 IG_DB_LINKS_RAW = 'ig-db-links-raw'
 IG_CHOICES      = 'ig-db-choices'
+IG_DB_MIGRATE   = 'ig-db-migrate'
 
 DATABASE_CHOICES = sorted(list(SUBCLASSES.keys()))
 try:
@@ -667,6 +669,106 @@ def print_igdb_choices(cfg, do_print=True):
         # print the trailing database choices
         print(sep.join(line))
 
+def migrate_instagram_databases(cfg, do_migrate=True):
+    """
+    Imports the per-user instagram databases into the consolidated media store
+    """
+    from src.config import MEDIA_STORE_SHARDS
+
+    if not do_migrate:
+        return
+
+    num_shards = cfg.media_store_shards
+    if num_shards <= 0:
+        logger.info('Cannot migrate instagram databases: please set'
+                ' \'{key}\' > 0 in \'{path}\' first.',
+                key=MEDIA_STORE_SHARDS,
+                path=cfg.path,
+        )
+        return
+
+    users = sorted(set(
+            re.sub(r'([.]fetching)?[.]db$', '', name)
+            for name in IG_DB_CHOICES
+    ))
+    if not users:
+        logger.info('No instagram databases in \'{path}\'', path=igdb_path)
+        return
+
+    logger.info('Migrating #{num} instagram user{plural} into #{num_shards}'
+            ' file{plural_shards} ...',
+            num=len(users),
+            plural=('' if len(users) == 1 else 's'),
+            num_shards=num_shards,
+            plural_shards=('' if num_shards == 1 else 's'),
+    )
+
+    # {store path: InstagramStoreDatabase}
+    stores = {}
+    migrated = []
+    num_media = 0
+    basenames = (('{0}.db', False), ('{0}.fetching.db', True))
+    for user in users:
+        for basename, fetching in basenames:
+            path = os.path.join(resolved_igdb_path, basename.format(user))
+            if not os.path.exists(path):
+                continue
+
+            store_path = InstagramStoreDatabase.get_path(user, num_shards)
+            try:
+                store = stores[store_path]
+            except KeyError:
+                store = InstagramStoreDatabase(store_path, user)
+                stores[store_path] = store
+            # XXX: re-use the store instance to skip re-verifying the tables
+            # for every user
+            store.user = user
+
+            user_db = InstagramDatabase(path)
+            try:
+                if fetching:
+                    # an older in-progress fetch: carry over the codes it saw
+                    codes = user_db.get_all_codes()
+                    with store:
+                        store.mark_seen(codes)
+                    num = len(codes)
+                else:
+                    num = store.migrate(user_db)
+            except Exception:
+                logger.exception('Failed to migrate \'{path}\'!', path=path)
+                continue
+            finally:
+                user_db.close()
+
+            logger.debug('{user}: imported #{num} row{plural} from \'{path}\'',
+                    user=user,
+                    num=num,
+                    plural=('' if num == 1 else 's'),
+                    path=path,
+            )
+            num_media += num
+            migrated.append(path)
+
+    for store in stores.values():
+        store.close()
+
+    logger.info('Imported #{num} media from #{num_files} database file{plural}',
+            num=num_media,
+            num_files=len(migrated),
+            plural=('' if len(migrated) == 1 else 's'),
+    )
+
+    if migrated and confirm(
+            'Remove the {0} migrated per-user database files?'.format(
+                len(migrated)
+            )
+    ):
+        for path in migrated:
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                logger.exception('Failed to remove \'{path}\'!', path=path)
+
 def handle(cfg, args):
     handlers = {
             SHUTDOWN: shutdown,
@@ -685,6 +787,7 @@ def handle(cfg, args):
             IG_DB_COMMENTS: print_instagram_database,
             IG_DB_LINKS_RAW: print_instagram_database_links,
             IG_CHOICES: print_igdb_choices,
+            IG_DB_MIGRATE: migrate_instagram_databases,
     }
     order = {
             IG_DB: None,
@@ -870,6 +973,12 @@ def parse():
             action='store_true',
             help='List valid --{0} choices.'.format(IG_DB),
     )
+    parser.add_argument('--{0}'.format(IG_DB_MIGRATE), action='store_true',
+            help='Import the per-user instagram databases into the'
+            ' consolidated media store (see \'{0}\' in the config). This'
+            ' will ask for confirmation before removing the imported'
+            ' files.'.format(config.MEDIA_STORE_SHARDS),
+    )
 
     return vars(parser.parse_args())
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measures the time taken to prune bad usernames from a parsed thing's
+usernames.
+
+    $ python -m benchmarks.bad_usernames [-n PARSES]
+
+'regex' compiles an alternation of every get_bad_username_patterns pattern
+per parse (the previous parser behavior); 'set' is
+BadUsernamesDatabase.is_bad_username. 'first' is the first parse (compiling
+the regex or building the set); 'parse' is the average over the remaining
+parses of the unchanged database (the regex is then served from re's compile
+cache but the patterns are still re-read and joined).
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import random
+import re
+import shutil
+import string
+import tempfile
+import time
+
+from src.database import BadUsernamesDatabase
+
+
+SIZES = [100, 10000, 100000]
+# the number of usernames checked per parse
+NUM_USERNAMES = 3
+
+def _username():
+    length = random.randint(6, 20)
+    return ''.join(
+            random.choice(string.ascii_lowercase + string.digits + '_')
+            for _ in range(length)
+    )
+
+def _seed(db, num):
+    with db:
+        db._db.executemany(
+                'INSERT OR IGNORE INTO bad_usernames(string, thing_fullname)'
+                ' VALUES(?, ?)',
+                ((_username(), 't3_foobar') for _ in range(num)),
+        )
+
+def _regex(db, usernames):
+    patterns = db.get_bad_username_patterns()
+    bad_username_regex = re.compile(
+            '^(?:{0})$'.format('|'.join(patterns)),
+            flags=re.IGNORECASE,
+    )
+    return [name for name in usernames if bad_username_regex.search(name)]
+
+def _set(db, usernames):
+    return [name for name in usernames if db.is_bad_username(name)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--parses', type=int, default=20,
+            help='The number of parses to time for each method.',
+    )
+    options = parser.parse_args()
+
+    random.seed(0)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('{0:<6} {1:>8} {2:>11} {3:>12}'.format(
+            'method', 'rows', 'first (ms)', 'parse (ms)',
+        ))
+        for size in SIZES:
+            db = BadUsernamesDatabase()
+            db.path = os.path.join(tmpdir, 'bad_usernames-{0}.db'.format(size))
+            _seed(db, size)
+            # check a mix of bad and good usernames
+            usernames = random.sample(
+                    sorted(db.get_bad_username_strings_raw()), 1
+            ) + [_username() for _ in range(NUM_USERNAMES - 1)]
+
+            for method, func in (('regex', _regex), ('set', _set)):
+                # the regex is too slow to parse many times at large sizes
+                num_parses = max(2, options.parses * 100 // size)
+                results = []
+                for _ in range(num_parses):
+                    start = time.time()
+                    pruned = func(db, usernames)
+                    results.append(1000.0 * (time.time() - start))
+                assert usernames[0] in pruned
+
+                print('{0:<6} {1:>8} {2:>11.3f} {3:>12.3f}'.format(
+                    method, size, results[0],
+                    sum(results[1:]) / len(results[1:]),
+                ))
+            db.close()
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
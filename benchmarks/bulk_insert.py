@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Measures the time taken to write a user's fetched media to the cache, one
+20-item page per transaction.
+
+    $ python -m benchmarks.bulk_insert [-p POSTS]
+
+'per-item' is the insert -> UniqueConstraintFailed -> update path with a
+second in-progress fetch database recording the seen codes; 'upsert' is
+InstagramDatabase.upsert. 'new' imports an empty cache, 'refetch' re-imports
+every post (ie, every row conflicts).
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from src.database import (
+        InstagramDatabase,
+        InstagramStoreDatabase,
+        UniqueConstraintFailed,
+)
+
+
+PAGE_SIZE = 20
+
+def _item(i):
+    return {
+            'shortcode': 'code{0}'.format(i),
+            'edge_media_preview_like': {'count': random.randint(1, 100000)},
+            'edge_media_to_comment': {'count': random.randint(0, 2000)},
+            'taken_at_timestamp': 1500000000 + i,
+    }
+
+def _pages(num_posts):
+    items = [_item(i) for i in range(num_posts)]
+    return [
+            items[i : i + PAGE_SIZE]
+            for i in range(0, len(items), PAGE_SIZE)
+    ]
+
+def _per_item(db, seen_db, pages):
+    for page in pages:
+        with db, seen_db:
+            for item in page:
+                try:
+                    db.insert(item)
+                except UniqueConstraintFailed:
+                    db.update(item)
+                try:
+                    seen_db.insert(item)
+                except UniqueConstraintFailed:
+                    pass
+
+def _upsert(db, seen_db, pages):
+    for page in pages:
+        with db:
+            db.upsert(page)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-p', '--posts', type=int, default=5000,
+            help='The number of posts to import.',
+    )
+    options = parser.parse_args()
+
+    random.seed(0)
+    pages = _pages(options.posts)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('{0:<8} {1:<9} {2:>8} {3:>10} {4:>13}'.format(
+            'database', 'method', 'posts', 'new (ms)', 'refetch (ms)',
+        ))
+        for name in ('user', 'store'):
+            for method, func in (('per-item', _per_item), ('upsert', _upsert)):
+                def open_db(basename):
+                    path = os.path.join(
+                            tmpdir, '{0}-{1}-{2}'.format(name, method, basename)
+                    )
+                    if name == 'user':
+                        return InstagramDatabase(path)
+                    return InstagramStoreDatabase(path, 'foo')
+
+                db = open_db('cache.db')
+                seen_db = open_db('seen.db')
+                results = []
+                for _ in range(2):
+                    start = time.time()
+                    func(db, seen_db, pages)
+                    results.append(1000.0 * (time.time() - start))
+                    # the seen codes are reset once a fetch finishes
+                    if seen_db.exists:
+                        seen_db.remove()
+                    if func is _upsert:
+                        db.prune_unseen()
+                assert db.size() == options.posts
+
+                print('{0:<8} {1:<9} {2:>8} {3:>10.1f} {4:>13.1f}'.format(
+                    name, method, options.posts, results[0], results[1],
+                ))
+                db.close()
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measures the time taken to extract instagram links from a comment's html.
+
+    $ python -m benchmarks.link_extraction [-n COMMENTS]
+
+'soup' builds a BeautifulSoup tree (lxml if installed) and tests every anchor
+(the previous parser behavior); 'hrefs' only tokenizes html containing an
+instagram domain (see: util.hrefs.parse_hrefs). Each comment kind is timed
+separately: 'text' has no links, 'other' links elsewhere and 'ig' links to an
+instagram profile.
+"""
+
+from __future__ import print_function
+import argparse
+import time
+
+from bs4 import (
+        BeautifulSoup,
+        FeatureNotFound,
+)
+
+from src import instagram
+from src.util.hrefs import parse_hrefs
+
+
+_HTML_FMT = '<!-- SC_OFF --><div class="md"><p>{0}</p>\n</div><!-- SC_ON -->'
+
+COMMENTS = {
+        'text': _HTML_FMT.format(
+            'Story of my life. I&#39;m okay with this, not sure about the'
+            ' rest of the thread though.'
+        ),
+        'other': _HTML_FMT.format(
+            'Sauce? <a href="https://imgur.com/a/rB7ck">here</a> and'
+            ' <a href="https://gfycat.com/PreciousNippyCaecilian">here</a>'
+        ),
+        'ig': _HTML_FMT.format(
+            'Victoria Kay: <a href="https://www.instagram.com/viktoria_kay/'
+            '?hl=en">https://www.instagram.com/viktoria_kay/?hl=en</a>'
+        ),
+}
+
+def _link_matches(link):
+    return bool(
+            instagram.IG_LINK_REGEX.search(link)
+            or instagram.IG_LINK_QUERY_REGEX.search(link)
+    )
+
+def _soup(html):
+    try:
+        soup = BeautifulSoup(html, 'lxml')
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, 'html.parser')
+    return [
+            a['href'] for a in soup.find_all('a', href=True)
+            if _link_matches(a['href'])
+    ]
+
+def _hrefs(html):
+    if not instagram.HAS_IG_DOMAIN_REGEX.search(html):
+        return []
+    return [href for href in parse_hrefs(html) if _link_matches(href)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--comments', type=int, default=2000,
+            help='The number of comments of each kind to parse.',
+    )
+    options = parser.parse_args()
+
+    print('{0:<6} {1:<6} {2:>16}'.format('method', 'kind', 'per-comment (us)'))
+    for kind, html in sorted(COMMENTS.items()):
+        expected = _soup(html)
+        for method, func in (('soup', _soup), ('hrefs', _hrefs)):
+            assert func(html) == expected
+
+            start = time.time()
+            for _ in range(options.comments):
+                func(html)
+            elapsed = time.time() - start
+
+            print('{0:<6} {1:<6} {2:>16.1f}'.format(
+                method, kind, 1000000.0 * elapsed / options.comments,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Measures the per-call cost of the logger methods at enabled and disabled
+levels.
+
+    $ python -m benchmarks.logger_calls [-n NUMBER] [-d DEPTH]
+
+'inspect' resolves the calling module with inspect.stack() (the previous
+implementation) and builds the record regardless of level; 'frames' is the
+current cached frame walk which returns before doing anything else if the
+level is disabled. Calls are made DEPTH frames deep to approximate a real
+call stack. Enabled records are handled by a handler that discards them.
+"""
+
+from __future__ import print_function
+import argparse
+import inspect
+import logging
+import timeit
+
+from src.util import logger
+from src.util.logger import methods
+
+
+def _inspect_module_name():
+    name = None
+    module = None
+    stack = inspect.stack()
+    while stack and not module:
+        frame = stack.pop(0)
+        module = inspect.getmodule(frame[0])
+        if module and module.__name__ in (__name__, methods.__name__):
+            module = None
+    if module:
+        name = module.__name__
+    return name
+
+def _inspect_log(level, msg, **kwargs):
+    # the previous _log
+    methods._get(_inspect_module_name()).log(level, msg, **kwargs)
+
+def _call_at_depth(depth, func):
+    if depth > 0:
+        return _call_at_depth(depth - 1, func)
+    return func()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--number', type=int, default=2000,
+            help='The number of logger calls to time.',
+    )
+    parser.add_argument('-d', '--depth', type=int, default=20,
+            help='The extra stack depth of each call.',
+    )
+    options = parser.parse_args()
+
+    handler = logging.NullHandler()
+    logger.add_handler(handler)
+    logger.set_level(logging.INFO)
+
+    print('{0:<8} {1:<9} {2:>12}'.format('method', 'level', 'us / call'))
+    for method, log in (
+            ('inspect', _inspect_log),
+            ('frames', methods._log),
+    ):
+        for name, level in (
+                ('enabled', logging.INFO),
+                ('disabled', logging.DEBUG),
+        ):
+            def call():
+                log(level, 'foo={foo} bar={bar}', foo=1, bar='baz')
+            total = timeit.timeit(
+                    lambda: _call_at_depth(options.depth, call),
+                    number=options.number,
+            )
+            print('{0:<8} {1:<9} {2:>12.2f}'.format(
+                method, name, 1e6 * total / options.number,
+            ))
+
+    logger.remove_handler(handler)
+
+
+if __name__ == '__main__':
+    main()
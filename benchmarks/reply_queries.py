@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measures the reply history lookups made for every comment the bot considers
+replying to against a large replies.db.
+
+    $ python -m benchmarks.reply_queries [-r ROWS] [-n REPEAT]
+
+'unindexed' is the database without its declared indexes (see:
+ReplyDatabase._create_index_data; the UNIQUE constraint's index remains) and
+the previous submission check, which reads the set of replied things only to
+count it; 'indexed' is the database as created by the bot and the count query
+that the filter now makes.
+"""
+
+from __future__ import print_function
+import argparse
+import collections
+import os
+import shutil
+import tempfile
+import timeit
+
+from src.database import ReplyDatabase
+
+
+# the number of instagram users per reply
+IG_USERS_PER_REPLY = 2
+# the number of replies per submission
+REPLIES_PER_SUBMISSION = 5
+
+_Thing = collections.namedtuple('_Thing', 'fullname')
+
+def _fullname(prefix, i):
+    return _Thing('{0}_{1:x}'.format(prefix, i))
+
+def _seed(db, num_rows):
+    def rows():
+        for i in range(num_rows):
+            reply = i // IG_USERS_PER_REPLY
+            yield (
+                    _fullname('t1', reply).fullname,
+                    _fullname('t3', reply // REPLIES_PER_SUBMISSION).fullname,
+                    # unique per submission
+                    'user{0}'.format(i),
+            )
+
+    with db:
+        db._db.executemany(
+                'INSERT INTO comments('
+                '   replied_fullname, submission_fullname, ig_user'
+                ') VALUES(?, ?, ?)', rows(),
+        )
+
+def _drop_indexes(db):
+    with db:
+        for index in db._create_index_data:
+            db._db.execute('DROP INDEX {0}'.format(index.split()[0]))
+
+def _queries(num_rows):
+    num_replies = num_rows // IG_USERS_PER_REPLY
+    replied = _fullname('t1', num_replies // 2)
+    not_replied = _fullname('t1', num_replies + 1)
+    submission = _fullname('t3', num_replies // REPLIES_PER_SUBMISSION // 2)
+
+    return (
+            ('has_replied (hit)', lambda db, indexed: db.has_replied(replied)),
+            ('has_replied (miss)',
+                lambda db, indexed: db.has_replied(not_replied)),
+            ('num replied', lambda db, indexed: (
+                db.num_replied_things_for_submission(submission) if indexed
+                else len(db.replied_things_for_submission(submission))
+            )),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-r', '--rows', type=int, default=1000000,
+            help='The number of rows in the replies database.',
+    )
+    parser.add_argument('-n', '--repeat', type=int, default=20,
+            help='The number of lookups to time per case.',
+    )
+    options = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        db = ReplyDatabase()
+        db.path = os.path.join(tmpdir, 'replies.db')
+        _seed(db, options.rows)
+
+        queries = _queries(options.rows)
+        results = collections.defaultdict(list)
+        for indexed in (False, True):
+            if not indexed:
+                _drop_indexes(db)
+            else:
+                # re-opening the database creates the missing indexes (before
+                # the lookups are timed)
+                db.close()
+                db.commit()
+
+            for name, func in queries:
+                elapsed = timeit.timeit(
+                        lambda: func(db, indexed), number=options.repeat
+                )
+                results[name].append(1000.0 * elapsed / options.repeat)
+
+        for name, func in queries:
+            assert func(db, False) == func(db, True)
+
+        print('{0:<18} {1:>8} {2:>15} {3:>13} {4:>9}'.format(
+            'query', 'rows', 'unindexed (ms)', 'indexed (ms)', 'speedup',
+        ))
+        for name, _ in queries:
+            unindexed, indexed = results[name]
+            print('{0:<18} {1:>8} {2:>15.3f} {3:>13.3f} {4:>8.1f}x'.format(
+                name, options.rows, unindexed, indexed,
+                unindexed / max(indexed, 1e-6),
+            ))
+        db.close()
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
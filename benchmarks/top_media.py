@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Measures InstagramDatabase.get_top_media lookup latency for users with
+differing numbers of cached posts.
+
+    $ python -m benchmarks.top_media [-n REPEAT]
+
+'unranked' is the lookup without a materialized ranking (the ranking
+statistics and full ORDER BY are computed on every call); 'ranked' is the
+indexed read of the ranking computed when a fetch finishes.
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import timeit
+
+from src.database import (
+        InstagramDatabase,
+        InstagramStoreDatabase,
+)
+
+
+SIZES = (50, 1000, 10000)
+NUM_HIGHLIGHTS = 10
+
+def _item(i):
+    return {
+            'shortcode': 'code{0}'.format(i),
+            'edge_media_preview_like': {'count': random.randint(1, 100000)},
+            'edge_media_to_comment': {'count': random.randint(0, 2000)},
+            'taken_at_timestamp': 1500000000 + i,
+    }
+
+def _seed(db, size):
+    with db:
+        for i in range(size):
+            db.insert(_item(i))
+    db.update_ranking()
+    return db
+
+def _unranked(db):
+    from src.instagram import MEDIA_LINK_FMT
+
+    cursor = db._execute(
+            'SELECT code FROM cache WHERE {{where}}'
+            ' ORDER BY {0} LIMIT {1}'.format(db.order_string, NUM_HIGHLIGHTS)
+    )
+    return [MEDIA_LINK_FMT.format(row['code']) for row in cursor]
+
+def _ranked(db):
+    return db.get_top_media(num=NUM_HIGHLIGHTS)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--repeat', type=int, default=200,
+            help='The number of lookups to time per case.',
+    )
+    options = parser.parse_args()
+
+    random.seed(0)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('{0:<8} {1:>7} {2:>14} {3:>14} {4:>9}'.format(
+            'database', 'posts', 'unranked (ms)', 'ranked (ms)', 'speedup',
+        ))
+        for size in SIZES:
+            databases = (
+                    ('user', InstagramDatabase(
+                        os.path.join(tmpdir, 'user{0}.db'.format(size))
+                    )),
+                    # other users share the store file
+                    ('store', InstagramStoreDatabase(
+                        os.path.join(tmpdir, 'store.db'),
+                        'user{0}'.format(size),
+                    )),
+            )
+            for name, db in databases:
+                _seed(db, size)
+                assert _unranked(db) == _ranked(db)
+
+                results = []
+                for func in (_unranked, _ranked):
+                    elapsed = timeit.timeit(
+                            lambda: func(db), number=options.repeat
+                    )
+                    results.append(1000.0 * elapsed / options.repeat)
+
+                print('{0:<8} {1:>7} {2:>14.3f} {3:>14.3f} {4:>8.1f}x'.format(
+                    name, size, results[0], results[1],
+                    results[0] / results[1],
+                ))
+                db.close()
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
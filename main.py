@@ -10,7 +10,10 @@ from six import (
 import args
 import constants
 from constants import __DEBUG__
-from src import config
+from src import (
+        config,
+        database,
+)
 from src.util import logger
 
 
@@ -32,7 +35,12 @@ def init_logger(cfg=None, options=None, off=False):
         handlers = []
         path = options['logging_path'] or cfg.logging_path
         if path:
-            hndlr = logger.ProcessFileHandler(path)
+            if cfg.log_writer:
+                hndlr = logger.RotatingFileHandler(
+                        path, cfg.log_max_size, cfg.log_rotate_time,
+                )
+            else:
+                hndlr = logger.ProcessFileHandler(path)
             hndlr.setLevel(level)
             handlers.append(hndlr)
         else:
@@ -77,6 +85,16 @@ def init_logger(cfg=None, options=None, off=False):
         logger.clear_handlers()
         for hndlr in handlers:
             hndlr.setFormatter(formatter)
+
+        if cfg.log_writer:
+            # format & write in a separate process; the handlers are used
+            # only by that process
+            hndlr = logger.start_writer(handlers)
+            # don't ship records that none of the handlers would write
+            hndlr.setLevel(level)
+            handlers = [hndlr]
+
+        for hndlr in handlers:
             logger.add_handler(hndlr)
 
     else:
@@ -102,6 +120,7 @@ if __name__ == '__main__':
     # be passed to everything
     constants.dry_run = options['dry_run']
     cfg = config.Config(options['config'])
+    database.initialize(cfg)
     if args.handle(cfg, options):
         sys.exit(0)
 
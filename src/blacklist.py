@@ -1,5 +1,7 @@
+import ctypes
 import multiprocessing
 import os
+import time
 
 from six import string_types
 
@@ -17,17 +19,87 @@ class Blacklist(object):
     Interface between application <-> BlacklistDatabase
 
     This class provides convenience methods specifically for BlacklistDatabase
+
+    Checks are made against a per-process in-memory snapshot of the database
+    which is reloaded whenever the shared generation counter changes (ie, the
+    blacklist was modified through any process's instance).
     """
 
+    # the max age of a process's snapshot before it is reloaded regardless of
+    # the generation (picks up modifications made outside of the bot's
+    # processes; eg. --add-blacklist)
+    SNAPSHOT_MAX_AGE = 60
+    # the minimum number of seconds between sweep()s
+    SWEEP_INTERVAL = 60
+
     def __init__(self, cfg):
         self.cfg = cfg
         self.__badactors = BadActorsDatabase(cfg)
         self.__database = BlacklistDatabase(cfg, do_seed=True)
         self.__lock = multiprocessing.RLock()
+        # incremented whenever the blacklist is modified
+        self.__generation = multiprocessing.Value(ctypes.c_long, 0)
+        self.__snapshot = None
+        self.__snapshot_generation = None
+        self.__last_sweep = 0
 
     def __str__(self):
         return self.__class__.__name__
 
+    @property
+    def _snapshot(self):
+        """
+        This process's BlacklistSnapshot; reloaded if the blacklist was
+        modified since it was taken
+        """
+        # read the generation first so that a modification made while loading
+        # causes another reload
+        generation = self.__generation.value
+        snapshot = self.__snapshot
+        if (
+                snapshot is None
+                or self.__snapshot_generation != generation
+                or time.time() - snapshot.created >= Blacklist.SNAPSHOT_MAX_AGE
+        ):
+            snapshot = self.__database.get_snapshot()
+            self.__snapshot = snapshot
+            self.__snapshot_generation = generation
+        return snapshot
+
+    def __bump_generation(self):
+        """
+        Flags every process's snapshot as outdated
+        """
+        with self.__generation.get_lock():
+            self.__generation.value += 1
+
+    def __sweep_expired(self):
+        """
+        Returns the number of expired temporary bans lifted or made permanent
+        """
+        num_swept = sum(self.__database.sweep_expired())
+        if num_swept:
+            self.__bump_generation()
+        return num_swept
+
+    def sweep(self, force=False):
+        """
+        Lifts expired temporary bans or makes them permanent if they were
+        flagged to be (at most once every SWEEP_INTERVAL seconds).
+
+        Checks already treat expired bans as lifted/permanent; this applies
+        them to the database so that checks never have to write.
+
+        Returns the number of bans swept
+        """
+        elapsed = time.time() - self.__last_sweep
+        if not force and elapsed < Blacklist.SWEEP_INTERVAL:
+            return 0
+
+        self.__last_sweep = time.time()
+        with self.__lock:
+            return self.__sweep_expired()
+
     @staticmethod
     def __get_blacklist_type(name, prefix):
         """
@@ -107,6 +179,9 @@ class Blacklist(object):
             prefixed_name = reddit.prefix(name_raw, name_type)
 
             with self.__lock:
+                # expired bans must be swept first so that they are not
+                # re-inserted
+                self.__sweep_expired()
                 is_blacklisted = self.__database.is_blacklisted(
                         name_raw, name_type
                 )
@@ -162,6 +237,7 @@ class Blacklist(object):
 
                 if success:
                     self.__database.commit()
+                    self.__bump_generation()
 
         return success
 
@@ -206,6 +282,7 @@ class Blacklist(object):
             # I'm not 100% certain this requires locking.. maybe in extremely
             # rare situations.
             with self.__lock:
+                self.__sweep_expired()
                 if self.__database.is_blacklisted(name_raw, name_type):
                     time_left = self.__database.blacklist_time_left_seconds(
                             name_raw
@@ -242,6 +319,7 @@ class Blacklist(object):
 
                 if success:
                     self.__database.commit()
+                    self.__bump_generation()
 
         return success
 
@@ -256,13 +334,14 @@ class Blacklist(object):
 
         Returns False if not blacklisted
         """
+        snapshot = self._snapshot
         try:
             subreddit = thing.subreddit.display_name
-            if self.__database.is_blacklisted_subreddit(subreddit):
+            if snapshot.is_blacklisted_subreddit(subreddit):
                 return reddit.prefix_subreddit(subreddit)
 
             author = thing.author.name
-            if self.__database.is_blacklisted_user(author):
+            if snapshot.is_blacklisted_user(author):
                 return reddit.prefix_user(author)
 
         except AttributeError:
@@ -294,13 +373,13 @@ class Blacklist(object):
                 reddit.is_subreddit_prefix(prefix)
                 or reddit.is_subreddit_prefix(parsed_prefix)
         ):
-            return self.__database.is_blacklisted_subreddit(name_raw)
+            return self._snapshot.is_blacklisted_subreddit(name_raw)
 
         if (
                 reddit.is_user_prefix(prefix)
                 or reddit.is_user_prefix(parsed_prefix)
         ):
-            return self.__database.is_blacklisted_user(name_raw)
+            return self._snapshot.is_blacklisted_user(name_raw)
 
         msg = ['Unrecognized prefix for {color_name}:']
         if prefix:
@@ -334,7 +413,7 @@ class Blacklist(object):
             return 0
 
         parsed_prefix, name_raw = reddit.split_prefixed_name(name)
-        return self.__database.blacklist_time_left_seconds(name_raw)
+        return self._snapshot.time_left_seconds(name_raw)
 
     def increment_bad_actor(self, thing):
         """
@@ -10,6 +10,7 @@ from src import (
         instagram,
         mentions,
         messages,
+        poller,
         ratelimit,
         reddit,
         replies,
@@ -18,17 +19,18 @@ from src import (
 )
 from src.mixins import (
         RunForeverMixin,
-        SubredditsCommentStreamMixin,
+        SubscriptionStreamMixin,
 )
 from src.util import logger
 
 
-class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
+class IgHighlightsBot(RunForeverMixin, SubscriptionStreamMixin):
     """
     Instagram Highlights reddit bot class
 
     This is intended to be run in the main process. It spawns all other
-    processes and crawls comments from subreddits in the subreddits database.
+    processes and parses the comments that the poller streams from subreddits
+    in the subreddits database.
     """
 
     def __init__(self, cfg):
@@ -36,7 +38,10 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         # this is created here so that any process can flag that the account
         # is rate-limited.
         rate_limited = ratelimit.Flag()
-        SubredditsCommentStreamMixin.__init__(self, cfg, rate_limited)
+        self.poller = poller.StreamPoller(cfg, rate_limited)
+        SubscriptionStreamMixin.__init__(
+                self, cfg, rate_limited, self.poller.subscribe('comments'),
+        )
 
         self.blacklist = blacklist.Blacklist(cfg)
         self.ratelimit_handler = ratelimit.RateLimitHandler(
@@ -47,6 +52,7 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         )
         self.submissions = submissions.Submissions(
                 cfg, rate_limited, self.blacklist,
+                self.poller.subscribe('submissions'),
         )
         self.messages = messages.Messages(
                 cfg, rate_limited, self.blacklist,
@@ -60,12 +66,24 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         self.submitter = submitter.Submitter(
                 cfg, rate_limited,
         )
+        self.fetch_workers = [
+                instagram.FetchWorker(cfg, i)
+                for i in range(cfg.fetch_workers)
+        ]
+
+        replies.initialize(cfg)
+        reddit.initialize(cfg)
 
         # initialize stuff that requires correct credentials
         instagram.initialize(cfg, self._reddit.username)
         self.filter = replies.Filter(
                 cfg, self._reddit.username_raw, self.blacklist,
         )
+        self.parse_pool = None
+        if cfg.parse_workers > 0:
+            self.parse_pool = replies.ParsePool(
+                    cfg, rate_limited, self.filter, self._reddit,
+            )
 
     def __str__(self):
         return self._reddit.username_raw
@@ -104,6 +122,7 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
                     num=signum,
             )
 
+        self.poller.kill()
         self.ratelimit_handler.kill()
         self.controversial.kill()
         self.submissions.kill()
@@ -111,7 +130,12 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         self.mentions.kill()
         self.replier.kill()
         self.submitter.kill()
+        for worker in self.fetch_workers:
+            worker.kill()
+        if self.parse_pool:
+            self.parse_pool.kill()
 
+        self.poller.join()
         self.ratelimit_handler.join()
         self.controversial.join()
         self.submissions.join()
@@ -119,6 +143,10 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         self.mentions.join()
         self.replier.join()
         self.submitter.join()
+        for worker in self.fetch_workers:
+            worker.join()
+        if self.parse_pool:
+            self.parse_pool.join()
 
         # XXX: kill the main process last so that daemon processes aren't
         # killed at inconvenient times
@@ -133,6 +161,7 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         signal.signal(signal.SIGINT, signal.SIG_IGN)
         signal.signal(signal.SIGTERM, signal.SIG_IGN)
 
+        self.poller.start()
         self.ratelimit_handler.start()
         self.controversial.start()
         self.submissions.start()
@@ -140,6 +169,10 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
         self.mentions.start()
         self.replier.start()
         self.submitter.start()
+        for worker in self.fetch_workers:
+            worker.start()
+        if self.parse_pool:
+            self.parse_pool.start()
 
         # gracefully handle exit signals
         signal.signal(signal.SIGINT, self.graceful_exit)
@@ -147,19 +180,33 @@ class IgHighlightsBot(RunForeverMixin, SubredditsCommentStreamMixin):
 
         while not self._killed:
             # TODO: can GETs cause praw to throw a ratelimit exception?
-            for comment in self.stream:
-                if not comment or self._killed:
+            # XXX: the comments are handed to the parse pool still pickled
+            # (see: ParsePool.submit)
+            for data in self.pickled_stream:
+                if not data or self._killed:
                     break
 
+                fullname, pickled = data
                 logger.id(logger.info, self,
-                        'Processing {color_comment}',
-                        color_comment=reddit.display_id(comment),
+                        'Processing {color_fullname}',
+                        color_fullname=fullname,
                 )
 
+                if self.parse_pool and self.parse_pool.submit(*data):
+                    continue
+
+                comment = reddit.unpickle_thing(pickled, self._reddit)
                 ig_usernames, _, _ = self.filter.replyable_usernames(comment)
                 if ig_usernames:
                     self.filter.enqueue(comment, ig_usernames)
 
+            if self.parse_pool:
+                self.parse_pool.handle_results()
+                self.parse_pool.log_stats()
+            self.filter.remember_seen()
+            self.filter.log_stats()
+            self.blacklist.sweep()
+            instagram.FetchScheduler.reap_leases()
             if not self._killed:
                 time.sleep(1)
 
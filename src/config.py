@@ -44,15 +44,40 @@ SUBMIT_ENABLED                  = 'submit_enabled'
 SUBMIT_UNIQUE_LINKS_PER_USER    = 'submit_unique_links_per_user'
 SUBMIT_USER_REPOST_INTERVAL     = 'submit_user_repost_interval'
 SUBMIT_INTERVAL                 = 'submit_interval'
+PARSER_WORD_CACHE_SIZE          = 'parser_word_cache_size'
+ENGLISH_WORDS_PATH              = 'english_words_path'
+JARGON_PREFIX_DISPATCH          = 'jargon_prefix_dispatch'
+PARSE_WORKERS                   = 'parse_workers'
+SUBREDDIT_BAN_CACHE_TIME        = 'subreddit_ban_cache_time'
+STREAM_SHARD_SIZE               = 'stream_shard_size'
+STREAM_MAX_POLL_INTERVAL        = 'stream_max_poll_interval'
+POLL_MIN_INTERVAL               = 'poll_min_interval'
+POLL_MAX_INTERVAL               = 'poll_max_interval'
+REDDIT_REQUESTS_PER_MINUTE      = 'reddit_requests_per_minute'
 
 SECTION_INSTAGRAM               = 'INSTAGRAM'
 INSTAGRAM_CACHE_EXPIRE_TIME     = 'instagram_cache_expire_time'
 MIN_FOLLOWER_COUNT              = 'min_follower_count'
+MEDIA_STORE_SHARDS              = 'media_store_shards'
+TOP_MEDIA_CACHE_SIZE            = 'top_media_cache_size'
+FETCH_WORKERS                   = 'fetch_workers'
+INSTAGRAM_RECONCILE_TIME        = 'instagram_reconcile_time'
+REFRESH_TOP_K                   = 'refresh_top_k'
+
+SECTION_DATABASE                = 'DATABASE'
+DATABASE_SYNCHRONOUS            = 'database_synchronous'
+DATABASE_BUSY_TIMEOUT           = 'database_busy_timeout'
+DATABASE_CACHE_SIZE             = 'database_cache_size'
+DATABASE_MMAP_SIZE              = 'database_mmap_size'
+DATABASE_LOCK_MAX_DELAY         = 'database_lock_max_delay'
 
 SECTION_LOGGING                 = 'LOGGING'
 LOGGING_PATH                    = 'logging_path'
 LOGGING_LEVEL                   = 'logging_level'
 COLORFUL_LOGS                   = 'colorful_logs'
+LOG_WRITER                      = 'log_writer'
+LOG_MAX_SIZE                    = 'log_max_size'
+LOG_ROTATE_TIME                 = 'log_rotate_time'
 
 # ######################################################################
 
@@ -155,6 +180,9 @@ class Config(object):
             'Y': 365 * 24 * 60 * 60,
     }
 
+    # https://sqlite.org/pragma.html#pragma_synchronous
+    SQLITE_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
     def __init__(self, path=None):
         self.path = path or Config.PATH
         self._resolved_fallback = resolve_path(CONFIG_DEFAULTS_PATH)
@@ -446,6 +474,46 @@ class Config(object):
     def submit_interval(self):
         return self.__get_time(SECTION_REDDIT, SUBMIT_INTERVAL)
 
+    @property
+    def parser_word_cache_size(self):
+        return self.__get(SECTION_REDDIT, PARSER_WORD_CACHE_SIZE, 'getint')
+
+    @property
+    def english_words_path(self):
+        return resolve_path(self.__get(SECTION_REDDIT, ENGLISH_WORDS_PATH))
+
+    @property
+    def jargon_prefix_dispatch(self):
+        return self.__get(SECTION_REDDIT, JARGON_PREFIX_DISPATCH, 'getboolean')
+
+    @property
+    def parse_workers(self):
+        return self.__get(SECTION_REDDIT, PARSE_WORKERS, 'getint')
+
+    @property
+    def subreddit_ban_cache_time(self):
+        return self.__get_time(SECTION_REDDIT, SUBREDDIT_BAN_CACHE_TIME)
+
+    @property
+    def stream_shard_size(self):
+        return self.__get(SECTION_REDDIT, STREAM_SHARD_SIZE, 'getint')
+
+    @property
+    def stream_max_poll_interval(self):
+        return self.__get_time(SECTION_REDDIT, STREAM_MAX_POLL_INTERVAL)
+
+    @property
+    def poll_min_interval(self):
+        return self.__get_time(SECTION_REDDIT, POLL_MIN_INTERVAL)
+
+    @property
+    def poll_max_interval(self):
+        return self.__get_time(SECTION_REDDIT, POLL_MAX_INTERVAL)
+
+    @property
+    def reddit_requests_per_minute(self):
+        return self.__get(SECTION_REDDIT, REDDIT_REQUESTS_PER_MINUTE, 'getint')
+
     # ##################################################################
     # [INSTAGRAM]
 
@@ -457,6 +525,57 @@ class Config(object):
     def min_follower_count(self):
         return self.__get(SECTION_INSTAGRAM, MIN_FOLLOWER_COUNT, 'getint')
 
+    @property
+    def media_store_shards(self):
+        return self.__get(SECTION_INSTAGRAM, MEDIA_STORE_SHARDS, 'getint')
+
+    @property
+    def top_media_cache_size(self):
+        return self.__get(SECTION_INSTAGRAM, TOP_MEDIA_CACHE_SIZE, 'getint')
+
+    @property
+    def fetch_workers(self):
+        return self.__get(SECTION_INSTAGRAM, FETCH_WORKERS, 'getint')
+
+    @property
+    def instagram_reconcile_time(self):
+        return self.__get_time(SECTION_INSTAGRAM, INSTAGRAM_RECONCILE_TIME)
+
+    @property
+    def refresh_top_k(self):
+        return self.__get(SECTION_INSTAGRAM, REFRESH_TOP_K, 'getint')
+
+    # ##################################################################
+    # [DATABASE]
+
+    @property
+    def database_synchronous(self):
+        synchronous = self.__get(SECTION_DATABASE, DATABASE_SYNCHRONOUS)
+        if (
+                not isinstance(synchronous, string_types)
+                or synchronous.upper() not in Config.SQLITE_SYNCHRONOUS
+        ):
+            synchronous = self.__get_fallback(
+                    SECTION_DATABASE, DATABASE_SYNCHRONOUS
+            )
+        return synchronous.upper()
+
+    @property
+    def database_busy_timeout(self):
+        return self.__get_time(SECTION_DATABASE, DATABASE_BUSY_TIMEOUT)
+
+    @property
+    def database_cache_size(self):
+        return self.__get(SECTION_DATABASE, DATABASE_CACHE_SIZE, 'getint')
+
+    @property
+    def database_mmap_size(self):
+        return self.__get(SECTION_DATABASE, DATABASE_MMAP_SIZE, 'getint')
+
+    @property
+    def database_lock_max_delay(self):
+        return self.__get_time(SECTION_DATABASE, DATABASE_LOCK_MAX_DELAY)
+
     # ##################################################################
     # [LOGGING]
 
@@ -490,6 +609,18 @@ class Config(object):
     def colorful_logs(self):
         return self.__get(SECTION_LOGGING, COLORFUL_LOGS, 'getboolean')
 
+    @property
+    def log_writer(self):
+        return self.__get(SECTION_LOGGING, LOG_WRITER, 'getboolean')
+
+    @property
+    def log_max_size(self):
+        return self.__get(SECTION_LOGGING, LOG_MAX_SIZE, 'getint')
+
+    @property
+    def log_rotate_time(self):
+        return self.__get_time(SECTION_LOGGING, LOG_ROTATE_TIME)
+
 
 __all__ = [
         'resolve_path',
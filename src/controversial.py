@@ -23,6 +23,9 @@ class Controversial(ProcessMixin, StreamMixin):
 
     MIN_SCALE = 0.25
     MAX_DELAY = parse_time('1h')
+    # the number of requests made to list the controversial comments
+    # (see: _stream)
+    NUM_REQUESTS = 2
 
     @staticmethod
     def choose_delay(score, threshold):
@@ -68,11 +71,16 @@ class Controversial(ProcessMixin, StreamMixin):
                 #   2. it will delete more the next pass
                 # [March 20, 2018] increased limit to 200 because the stream
                 # is only returning 75 elements for some reason
+                # (100 per request => NUM_REQUESTS)
                 time_filter='all', limit=200,
         )
 
     def _run_forever(self):
         while not self._killed.is_set():
+            if not self._can_poll(Controversial.NUM_REQUESTS):
+                self._killed.wait(self._poll_delay(0))
+                continue
+
             logger.id(logger.debug, self, 'Processing controversial ...')
 
             threshold = self.cfg.delete_comment_threshold
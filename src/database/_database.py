@@ -7,6 +7,7 @@ import time
 
 from six import (
         add_metaclass,
+        iteritems,
         string_types,
 )
 
@@ -34,12 +35,25 @@ class FailedInit(BaseDatabaseException):
         Exception.__init__(self, *args, **kwargs)
         self.error = error
 
+def initialize(cfg):
+    """
+    Initializes the config used to tune every database connection (sqlite
+    pragmas, lock retry delays).
+
+    This should be called before any processes are spawned so that they
+    inherit the config.
+    """
+    if not Database._cfg:
+        Database._cfg = cfg
+
 class _SqliteConnectionWrapper(object):
     """
     SQLite Connection wrapper (mainly for logging execute calls)
     """
 
     _LOCKED_RE = re.compile(r'database is locked', flags=re.IGNORECASE)
+    # the initial delay before retrying a statement on a locked database
+    _LOCK_MIN_DELAY = 0.05
 
     INTEGRITY_RE_FMT = r'^{0} constraint failed:'
     _UNIQUE_RE = re.compile(INTEGRITY_RE_FMT.format('UNIQUE'))
@@ -68,11 +82,67 @@ class _SqliteConnectionWrapper(object):
     def __str__(self):
         return str(self.parent)
 
+    def __savepoint_stack(self):
+        Database._process_registry()
+        return Database._savepoints.setdefault(self.connection, [])
+
     def __enter__(self):
-        return self.connection
+        """
+        Opens a savepoint so that the block's changes are committed or rolled
+        back on their own.
 
-    def __exit__(self, *args, **kwargs):
-        self.connection.__exit__(*args, **kwargs)
+        Every instance on the same file in a process shares one connection
+        (and so one transaction). A block nested in another block is only
+        committed when the outermost block exits; the outermost block also
+        commits any changes made outside of a block.
+        """
+        savepoints = self.__savepoint_stack()
+        name = 'sp_{0}_{1}'.format(id(self), len(savepoints))
+        self.execute('SAVEPOINT {0}'.format(name))
+        savepoints.append(name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        savepoints = self.__savepoint_stack()
+        if not savepoints:
+            # the transaction was rolled back inside of the block
+            return
+
+        name = savepoints.pop()
+        if exc_type is None and exc_value is None and traceback is None:
+            self.execute('RELEASE SAVEPOINT {0}'.format(name))
+            if not savepoints:
+                self.connection.commit()
+        else:
+            logger.id(logger.debug, self.parent,
+                    'An error occurred! Rolling back changes ...',
+                    exc_info=True,
+            )
+            try:
+                self.execute('ROLLBACK TO SAVEPOINT {0}'.format(name))
+                self.execute('RELEASE SAVEPOINT {0}'.format(name))
+            except sqlite3.OperationalError:
+                # the error already aborted the transaction (eg. disk full)
+                # which discarded every savepoint
+                self.rollback()
+            # TODO? suppress error ?
+            # return True
+
+    def commit(self):
+        """
+        Commits the transaction unless a `with` block is open on the
+        connection (the outermost block commits when it exits)
+        """
+        if not self.__savepoint_stack():
+            self.connection.commit()
+
+    def rollback(self):
+        """
+        Rolls back the transaction, discarding the savepoints of every open
+        `with` block on the connection
+        """
+        del self.__savepoint_stack()[:]
+        self.connection.rollback()
 
     def __getattr__(self, attr):
         return getattr(self.connection, attr)
@@ -87,6 +157,9 @@ class _SqliteConnectionWrapper(object):
 
     def __do_execute(self, func, sql, *args, **kwargs):
         cursor = None
+        lock_start = None
+        num_retries = 0
+        delay = 0
         while not cursor:
             self.parent.do_log(logger.debug,
                     self.__construct_msg(sql, *args, **kwargs),
@@ -101,18 +174,30 @@ class _SqliteConnectionWrapper(object):
             except sqlite3.OperationalError as e:
                 message = Database.get_err_msg(e)
                 if _SqliteConnectionWrapper._LOCKED_RE.search(message):
-                    # a process is taking a long time with its transaction.
-                    # this will be spammy if a process holds the lock
-                    # indefinitely.
-                    logger.id(logger.debug, self,
-                            'Database is locked! retrying ...',
+                    # a process is taking a long time with its transaction
+                    # (sqlite already waited busy_timeout for it). back off
+                    # instead of immediately hammering the lock again.
+                    if lock_start is None:
+                        lock_start = time.time()
+                    num_retries += 1
+                    delay = max(
+                            delay * 2, _SqliteConnectionWrapper._LOCK_MIN_DELAY
+                    )
+                    delay = min(delay, Database.get_setting('lock_max_delay'))
+                    self.parent.do_log(logger.debug,
+                            'Database is locked! retrying in {time} ...',
+                            time=delay,
                     )
+                    time.sleep(delay)
 
                 else:
                     raise
 
             except sqlite3.IntegrityError as e:
                 _SqliteConnectionWrapper.reraise_integrity_error(e)
+
+        if lock_start is not None:
+            self.parent._record_lock_wait(time.time() - lock_start, num_retries)
         return cursor
 
     def execute(self, sql, *args, **kwargs):
@@ -129,6 +214,10 @@ class Database(object):
     Data storage handling (replied comments, etc) abstract base class
     """
 
+    # https://sqlite.org/wal.html
+    # readers do not block the writer (and vice versa) in WAL mode
+    _JOURNAL_MODE = 'WAL'
+
     PATH_ROOT = os.path.join(DATA_ROOT_DIR, 'data')
     BACKUPS_PATH_ROOT = os.path.join(PATH_ROOT, 'backups')
     PATH_FMT = '{0}'
@@ -137,6 +226,92 @@ class Database(object):
     TABLENAME_RE = re.compile(r'^(\w+)\s*[(]')
     COLUMN_RE = re.compile(r'\s*(\w+).+?')
 
+    _cfg = None
+    # fallback connection settings in case initialize() was never called
+    # (eg. from the interpreter). these should match bot.cfg.
+    _DEFAULT_SETTINGS = {
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5,
+            'cache_size': 8192,
+            'mmap_size': 64 * 1024 * 1024,
+            'lock_max_delay': 2,
+    }
+
+    # per-process registry of open connections so that every Database
+    # instance pointing at the same file shares one connection
+    # {resolved_path: [sqlite3.Connection, num_references]}
+    _connections = {}
+    # per-process lock-wait metrics {resolved_path: {...}}
+    _lock_stats = {}
+    # per-process stacks of the savepoints opened by `with` blocks on each
+    # connection {sqlite3.Connection: [savepoint_name, ...]} (see: __enter__)
+    _savepoints = {}
+    _registry_pid = None
+    # connections inherited from the parent process which are never closed
+    # (see _process_registry)
+    _inherited_connections = []
+
+    @staticmethod
+    def get_setting(name):
+        """
+        Returns the [DATABASE] config value for the given setting name
+                eg. 'busy_timeout' -> cfg.database_busy_timeout
+        """
+        if Database._cfg:
+            return getattr(Database._cfg, 'database_{0}'.format(name))
+        return Database._DEFAULT_SETTINGS[name]
+
+    @staticmethod
+    def _process_registry():
+        """
+        Returns the connection registry for the current process.
+
+        sqlite connections must not be used across a fork so the registry is
+        reset the first time it is accessed from a new process.
+        """
+        pid = os.getpid()
+        if Database._registry_pid != pid:
+            # XXX: the parent's connections are deliberately leaked: they
+            # must never be closed (explicitly or by garbage collection)
+            # from the child process. closing a connection may checkpoint the
+            # write-ahead log, delete it or release locks that the parent's
+            # still-open connection depends on. this only holds onto the
+            # connections that were open at the time of the fork.
+            Database._inherited_connections.append(Database._connections)
+            Database._connections = {}
+            Database._lock_stats = {}
+            Database._savepoints = {}
+            Database._registry_pid = pid
+        return Database._connections
+
+    @staticmethod
+    def get_lock_stats():
+        """
+        Returns a copy of this process's lock-wait metrics for every database
+        that has waited on a lock
+        """
+        Database._process_registry()
+        return {
+                path: dict(stats)
+                for path, stats in iteritems(Database._lock_stats)
+        }
+
+    @staticmethod
+    def get_mtime(resolved_path):
+        """
+        Returns the modification time of the database file, accounting for
+        writes that have not been checkpointed out of the write-ahead log yet.
+
+        Raises OSError if the database file could not be stat'd
+        """
+        mtime = os.path.getmtime(resolved_path)
+        try:
+            mtime = max(mtime, os.path.getmtime(resolved_path + '-wal'))
+        except OSError:
+            # no write-ahead log
+            pass
+        return mtime
+
     @staticmethod
     def resolve_path(path):
         if path == ':memory:':
@@ -204,19 +379,14 @@ class Database(object):
         return os.path.basename(self._path)
 
     def __enter__(self):
-        return self._db
+        """
+        Opens a savepoint on the shared connection (see:
+        _SqliteConnectionWrapper.__enter__)
+        """
+        return self._db.__enter__()
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if exc_type is None and exc_value is None and traceback is None:
-            self._db.commit()
-        else:
-            logger.id(logger.debug, self,
-                    'An error occurred! Rolling back changes ...',
-                    exc_info=True,
-            )
-            self._db.rollback()
-            # TODO? suppress error ?
-            # return True
+        return self._db.__exit__(exc_type, exc_value, traceback)
 
     def do_log(
             self, logger_func, msg_, min_threshold_=60, force_=False,
@@ -266,6 +436,54 @@ class Database(object):
 
         return did_log
 
+    @property
+    def lock_stats(self):
+        """
+        Returns this process's lock-wait metrics for the database
+        """
+        Database._process_registry()
+        try:
+            return dict(Database._lock_stats[self._resolved_path])
+        except KeyError:
+            return {
+                    'num_waits': 0,
+                    'num_retries': 0,
+                    'total_wait': 0.0,
+                    'max_wait': 0.0,
+            }
+
+    def _record_lock_wait(self, elapsed, num_retries):
+        """
+        Records the time spent backing off from a locked database
+        """
+        Database._process_registry()
+        try:
+            stats = Database._lock_stats[self._resolved_path]
+        except KeyError:
+            stats = {
+                    'num_waits': 0,
+                    'num_retries': 0,
+                    'total_wait': 0.0,
+                    'max_wait': 0.0,
+            }
+            Database._lock_stats[self._resolved_path] = stats
+
+        stats['num_waits'] += 1
+        stats['num_retries'] += num_retries
+        stats['total_wait'] += elapsed
+        stats['max_wait'] = max(stats['max_wait'], elapsed)
+
+        self.do_log(logger.debug,
+                'Waited {time} for lock ({num} retries)'
+                '\n\ttotal: {time_total} over {num_waits} waits'
+                ' (max: {time_max})',
+                time=elapsed,
+                num=num_retries,
+                time_total=stats['total_wait'],
+                num_waits=stats['num_waits'],
+                time_max=stats['max_wait'],
+        )
+
     @property
     def _db(self):
         """
@@ -273,18 +491,126 @@ class Database(object):
         """
         db = None
         try:
-            db = self.__the_connection
-
+            if self.__connection_pid == os.getpid():
+                db = self.__the_connection
         except AttributeError:
+            pass
+        else:
+            path = self._resolved_path
+            entry = Database._connections.get(path)
+            if (
+                    db is not None and path != ':memory:'
+                    and (not entry or entry[0] is not db.connection)
+            ):
+                # the shared connection was evicted (eg. by another instance
+                # that removed the outdated database file)
+                db = None
+
+        if db is None:
             db = self.__init_db()
             if db is None:
                 # the database was outdated; re-initialize it
                 db = self.__init_db()
 
             self.__the_connection = db
+            self.__connection_pid = os.getpid()
 
         return db
 
+    def __acquire_connection(self):
+        """
+        Returns a tuple (connection, is_new) where
+                connection (sqlite3.Connection) - the process's connection to
+                    the database file (opened if necessary)
+                is_new (bool) - whether the connection was just opened
+        """
+        connections = Database._process_registry()
+        path = self._resolved_path
+        entry = connections.get(path)
+        if entry and not os.path.exists(path):
+            # the file was removed out from under the connection; don't reuse
+            # it (any existing references will close it when released)
+            entry = None
+
+        is_new = not entry
+        if is_new:
+            connection = sqlite3.connect(
+                    path,
+                    timeout=Database.get_setting('busy_timeout'),
+            )
+            entry = [connection, 0]
+            if path != ':memory:':
+                # every ':memory:' connection is its own database
+                connections[path] = entry
+
+        entry[1] += 1
+        return entry[0], is_new
+
+    def __release_connection(self, connection):
+        """
+        Releases a reference to the connection, closing it if nothing else in
+        this process is using it
+        """
+        connections = Database._process_registry()
+        entry = connections.get(self._resolved_path)
+        if entry and entry[0] is connection:
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del connections[self._resolved_path]
+        connection.close()
+
+    def __evict_connection(self, connection):
+        """
+        Closes the connection for every instance in this process (they reopen
+        the file the next time that they are used)
+        """
+        connections = Database._process_registry()
+        entry = connections.get(self._resolved_path)
+        if entry and entry[0] is connection:
+            del connections[self._resolved_path]
+        Database._savepoints.pop(connection, None)
+        connection.close()
+
+    def __configure_connection(self, db, existed):
+        """
+        Sets the pragmas on a newly opened connection
+        """
+        if self._resolved_path != ':memory:':
+            mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+            if mode.lower() != self._JOURNAL_MODE.lower():
+                # preserve the mtime since switching modes writes to the
+                # file header (some callers use the mtime to gauge staleness)
+                mtime = existed and os.path.getmtime(self._resolved_path)
+                try:
+                    # XXX: bypass the locked-database retry loop; leaving WAL
+                    # mode fails for as long as another process has the
+                    # database open
+                    db.connection.execute('PRAGMA journal_mode={0}'.format(
+                        self._JOURNAL_MODE,
+                    ))
+                except sqlite3.OperationalError:
+                    logger.id(logger.debug, self,
+                            'Could not switch journal_mode:'
+                            ' {old} -> {new}',
+                            old=mode,
+                            new=self._JOURNAL_MODE,
+                            exc_info=True,
+                    )
+                if mtime:
+                    os.utime(self._resolved_path, (time.time(), mtime))
+
+        db.execute('PRAGMA synchronous={0}'.format(
+            Database.get_setting('synchronous'),
+        ))
+        # negative => KiB instead of the number of pages
+        db.execute('PRAGMA cache_size={0:d}'.format(
+            -abs(Database.get_setting('cache_size')),
+        ))
+        db.execute('PRAGMA mmap_size={0:d}'.format(
+            max(0, Database.get_setting('mmap_size')),
+        ))
+
     def __verify_db(self, db, tbl_defn):
         """
         Checks if the table definition has changed.
@@ -422,15 +748,17 @@ class Database(object):
         do_integrity_check = os.path.exists(self._resolved_path)
 
         try:
-            db = sqlite3.connect(self._resolved_path)
+            connection, is_new = self.__acquire_connection()
+            db = _SqliteConnectionWrapper(connection, self)
+            if is_new:
+                # https://docs.python.org/2/library/sqlite3.html#row-objects
+                connection.row_factory = sqlite3.Row
+                self.__configure_connection(db, do_integrity_check)
 
         except sqlite3.OperationalError as e:
             raise FailedInit(e, Database.get_err_msg(e), self._resolved_path)
 
         else:
-            # https://docs.python.org/2/library/sqlite3.html#row-objects
-            db.row_factory = sqlite3.Row
-            db = _SqliteConnectionWrapper(db, self)
 
             def initialize_table(table):
                 success = True
@@ -449,6 +777,11 @@ class Database(object):
                 return success
 
             try:
+                if do_integrity_check:
+                    # bring the existing tables up to date before they are
+                    # verified so that they are not dropped
+                    self._migrate_tables(db)
+
                 verified = True
                 if isinstance(self._create_table_data, string_types):
                     verified = initialize_table(self._create_table_data)
@@ -467,7 +800,7 @@ class Database(object):
 
                 if not verified:
                     # existing database does not match table definition(s)
-                    db.close()
+                    self.__evict_connection(connection)
                     db = None
 
                     logger.id(logger.info, self,
@@ -495,6 +828,11 @@ class Database(object):
                         raise
 
                 else:
+                    for index in self._create_index_data:
+                        db.execute(
+                                'CREATE INDEX IF NOT EXISTS {0}'.format(index)
+                        )
+
                     try:
                         self._initialize_tables(db)
                     except sqlite3.IntegrityError:
@@ -503,30 +841,46 @@ class Database(object):
                         # => tables were already initialized
                         pass
 
+                    # XXX: this does not commit the partial changes of
+                    # another instance's open `with` block on the shared
+                    # connection; its block commits the tables too
                     db.commit()
 
             except sqlite3.DatabaseError as e:
-                db.close()
+                self.__release_connection(connection)
                 raise FailedInit(e, Database.get_err_msg(e))
         return db
 
     def commit(self):
+        """
+        Commits the connection's transaction (including the uncommitted
+        changes of every other instance on the same file in this process).
+        This is deferred to the outermost `with` block if one is open.
+        """
         self._db.commit()
 
     def rollback(self):
+        """
+        Rolls back the connection's transaction (including the uncommitted
+        changes of every other instance on the same file in this process).
+        Prefer a `with` block to scope a rollback to the block's changes.
+        """
         self._db.rollback()
 
     def close(self):
         """
-        Closes the database connection
+        Closes the database connection (the underlying connection stays open
+        if other instances in this process are still using it)
         """
         try:
-            self.__the_connection
+            db = self.__the_connection
         except AttributeError:
             # don't create a new connection if none exists
             pass
         else:
-            self.__the_connection.close()
+            if self.__connection_pid == os.getpid():
+                self.__release_connection(db.connection)
+            del self.__the_connection
 
     def __wrapper(self, func, *args, **kwargs):
         """
@@ -569,6 +923,33 @@ class Database(object):
         """
         self.__wrapper(self._update, *args, **kwargs)
 
+    def _exists(self, table, where=None, args=()):
+        """
+        Returns whether any row in the table matches the WHERE clause (or
+        whether the table has any rows if where is None)
+                eg. self._exists('queue', 'fullname = ?', (fullname,))
+
+        This stops at the first matching row unlike _count.
+        """
+        sql = 'SELECT 1 FROM {0}'.format(table)
+        if where:
+            sql += ' WHERE {0}'.format(where)
+        cursor = self._db.execute('SELECT EXISTS({0})'.format(sql), args)
+        return bool(cursor.fetchone()[0])
+
+    def _count(self, table, where=None, args=(), column='*'):
+        """
+        Returns the number of rows in the table matching the WHERE clause (or
+        every row if where is None)
+
+        column (str, optional) - the count() expression
+                eg. 'DISTINCT fullname' to count unique fullnames
+        """
+        sql = 'SELECT count({0}) FROM {1}'.format(column, table)
+        if where:
+            sql += ' WHERE {0}'.format(where)
+        return self._db.execute(sql, args).fetchone()[0]
+
     def _initialize_tables(self, db):
         """
         Overrideable method for child classes to do extra initialization of
@@ -579,6 +960,17 @@ class Database(object):
         """
         pass
 
+    def _migrate_tables(self, db):
+        """
+        Overrideable method for child classes to migrate the tables of an
+        existing database (eg. ALTER TABLE ... ADD COLUMN) before they are
+        verified against _create_table_data.
+
+        ** IMPORTANT: self._db should not be referenced within this method **
+        Instead, use the db parameter.
+        """
+        pass
+
     @abc.abstractproperty
     def _create_table_data(self):
         """
@@ -587,6 +979,17 @@ class Database(object):
         tables in the database.
         """
 
+    @property
+    def _create_index_data(self):
+        """
+        Index definition strings used in __init_db, each created after the
+        tables if it does not exist yet
+                eg. 'queue_order_idx ON queue(priority, timestamp)'
+
+        Note: renaming an index leaves the old one in existing databases.
+        """
+        return []
+
     @abc.abstractmethod
     def _insert(self, *args, **kwargs):
         """
@@ -604,6 +1007,7 @@ __all__ = [
         'NotNullConstraintFailed',
         'CheckConstraintFailed',
         'FailedInit',
+        'initialize',
         'Database',
 ]
 
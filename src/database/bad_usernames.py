@@ -30,6 +30,10 @@ class BadUsernamesDatabase(Database):
     def __init__(self, dry_run=False, *args, **kwargs):
         # don't save a distinct database for dry-runs
         Database.__init__(self, dry_run=False, *args, **kwargs)
+        # process-local cache of the normalized bad username strings
+        # (see: is_bad_username)
+        self.__normalized = None
+        self.__normalized_version = None
 
     def __contains__(self, text):
         cursor = self._db.execute(
@@ -89,6 +93,49 @@ class BadUsernamesDatabase(Database):
         bad_usernames = self.get_bad_username_strings_raw()
         return set(map(format_repeat_each_character_pattern, bad_usernames))
 
+    @property
+    def version(self):
+        """
+        Returns a value that changes whenever the database is modified (by any
+                process)
+        """
+        # data_version only changes when other connections commit so include
+        # this process's own changes
+        cursor = self._db.execute('PRAGMA data_version')
+        return (cursor.fetchone()[0], self._db.total_changes)
+
+    def get_bad_username_strings_normalized(self):
+        """
+        Returns the set of bad username strings with any repeated characters
+                removed (see: util.remove_repeat_characters)
+
+        The set is cached and only rebuilt once the database is modified.
+        """
+        version = self.version
+        if self.__normalized is None or self.__normalized_version != version:
+            from src.util import remove_repeat_characters
+
+            bad_usernames = self.get_bad_username_strings_raw()
+            self.__normalized = set(
+                    map(remove_repeat_characters, bad_usernames)
+            )
+            self.__normalized_version = version
+        return self.__normalized
+
+    def is_bad_username(self, text):
+        """
+        Returns True if the text matches a bad username string ignoring case and
+                repeated characters (eg. 'FooBaaar' matches 'foobar')
+
+        This is a set lookup equivalent to fully matching the text against
+        get_bad_username_patterns except that '.' only matches a literal '.'
+        (the patterns do not escape it).
+        """
+        from src.util import remove_repeat_characters
+
+        normalized = self.get_bad_username_strings_normalized()
+        return remove_repeat_characters(text) in normalized
+
 
 __all__ = [
         'BadUsernamesDatabase',
@@ -2,8 +2,6 @@ import os
 import re
 import time
 
-from six import integer_types
-
 from ._database import (
         Database,
         UniqueConstraintFailed,
@@ -15,6 +13,75 @@ from constants import (
 from src.util import logger
 
 
+def _sanitize(name, name_type):
+    # coerce user profile "subreddits" to their display name
+    # eg. 'u/foobar' -> 'u_foobar'
+    # https://reddit.com/6cfu55
+    if name_type == BlacklistDatabase.TYPE_SUBREDDIT:
+        return re.sub(r'^/?{0}'.format(PREFIX_USER), 'u_', name.strip())
+    return name # TODO? do names need sanitization?
+
+def _time_left(start, make_permanent, temp_ban_time):
+    """
+    Returns float ban time remaining in seconds if still banned
+            -1 if ban is permanent (or an expired ban flagged to be made
+                permanent)
+            0 if the ban expired
+
+    Expired bans are only lifted (or made permanent) in the database by
+    BlacklistDatabase.sweep_expired so that checks never write.
+    """
+    if start < 0:
+        return start
+
+    remaining = temp_ban_time - (time.time() - start)
+    if remaining <= 0:
+        return BlacklistDatabase.PERMANENT if make_permanent else 0
+    return remaining
+
+
+class BlacklistSnapshot(object):
+    """
+    In-memory copy of the blacklist (see: BlacklistDatabase.get_snapshot)
+    """
+
+    def __init__(self, rows, temp_ban_time):
+        self.temp_ban_time = temp_ban_time
+        self.created = time.time()
+        # XXX: lower-cased to match the database's NOCASE collation
+        self.subreddits = set()
+        # {name: (start, make_permanent)}
+        self.users = {}
+        for row in rows:
+            name = row['name'].lower()
+            if row['type'] == BlacklistDatabase.TYPE_SUBREDDIT:
+                self.subreddits.add(name)
+            else:
+                self.users[name] = (row['start'], bool(row['make_permanent']))
+
+    def __len__(self):
+        return len(self.subreddits) + len(self.users)
+
+    def is_blacklisted_subreddit(self, name):
+        name = _sanitize(name, BlacklistDatabase.TYPE_SUBREDDIT)
+        return name.lower() in self.subreddits
+
+    def is_blacklisted_user(self, name):
+        return self.time_left_seconds(name) != 0
+
+    def time_left_seconds(self, name):
+        """
+        Returns the time left in seconds of a temporary blacklist
+                -1 if the blacklist is permanent
+                0 if the name is not blacklisted
+        """
+        try:
+            start, make_permanent = self.users[name.lower()]
+        except KeyError:
+            return 0
+        return _time_left(start, make_permanent, self.temp_ban_time)
+
+
 class BlacklistDatabase(Database):
     """
     Storage of blacklisted subreddits/users
@@ -71,6 +138,14 @@ class BlacklistDatabase(Database):
                 )
         )
 
+    @property
+    def _create_index_data(self):
+        return [
+                # temporary bans expire blacklist_temp_ban_time after they
+                # start (see: sweep_expired)
+                'blacklist_start_idx ON blacklist(start)',
+        ]
+
     def _initialize_tables(self, db):
         if self.do_seed:
             logger.id(logger.debug, self,
@@ -93,7 +168,7 @@ class BlacklistDatabase(Database):
             else:
                 sub_type = BlacklistDatabase.TYPE_SUBREDDIT
                 subreddits = [
-                        self.__sanitize(sub, sub_type)
+                        _sanitize(sub, sub_type)
                         for sub in subreddits
                         if bool(sub.strip())
                 ]
@@ -140,14 +215,6 @@ class BlacklistDatabase(Database):
                                     color_names=added,
                             )
 
-    def __sanitize(self, name, name_type):
-        # coerce user profile "subreddits" to their display name
-        # eg. 'u/foobar' -> 'u_foobar'
-        # https://reddit.com/6cfu55
-        if name_type == BlacklistDatabase.TYPE_SUBREDDIT:
-            return re.sub(r'^/?{0}'.format(PREFIX_USER), 'u_', name.strip())
-        return name # TODO? do names need sanitization?
-
     def _insert(self, name, name_type, is_tmp=False):
         """
         name (str) - the name to blacklist
@@ -155,14 +222,14 @@ class BlacklistDatabase(Database):
         is_tmp (bool, optional) - whether the name is a temporary blacklist
         """
         now = time.time() if is_tmp else BlacklistDatabase.PERMANENT
-        name = self.__sanitize(name, name_type)
+        name = _sanitize(name, name_type)
         self._db.execute(
                 'INSERT INTO blacklist(name, type, start) VALUES(?, ?, ?)',
                 (name, name_type, now),
         )
 
     def _delete(self, name, name_type):
-        name = self.__sanitize(name, name_type)
+        name = _sanitize(name, name_type)
         self._db.execute(
                 'DELETE FROM blacklist WHERE name = ? AND type = ?',
                 (name, name_type),
@@ -205,7 +272,7 @@ class BlacklistDatabase(Database):
         """
         Returns whether the given subreddit is blacklisted
         """
-        name = self.__sanitize(name, BlacklistDatabase.TYPE_SUBREDDIT)
+        name = _sanitize(name, BlacklistDatabase.TYPE_SUBREDDIT)
         cursor = self._db.execute(
                 'SELECT start FROM blacklist WHERE name = ? AND type = ?',
                 (name, BlacklistDatabase.TYPE_SUBREDDIT),
@@ -217,31 +284,13 @@ class BlacklistDatabase(Database):
         """
         Returns whether the given user is blacklisted
         """
-        cursor = self._db.execute(
-                'SELECT start FROM blacklist WHERE name = ? AND type = ?',
-                (name, BlacklistDatabase.TYPE_USER),
-        )
-        row = cursor.fetchone()
-        self.__try_prune_temp_ban(row, name, BlacklistDatabase.TYPE_USER)
-        return bool(row)
+        return self.blacklist_time_left_seconds(name) != 0
 
     def is_blacklisted_temporarily(self, name):
         """
         Returns whether the given username is temporarily blacklisted
         """
-        cursor = self._db.execute(
-                'SELECT start FROM blacklist WHERE name = ? AND type = ?',
-                (name, BlacklistDatabase.TYPE_USER),
-        )
-        row = cursor.fetchone()
-        remaining = self.__try_prune_temp_ban(
-                row, name, BlacklistDatabase.TYPE_USER
-        )
-        return (
-                remaining > 0
-                if isinstance(remaining, integer_types + (float,))
-                else False
-        )
+        return self.blacklist_time_left_seconds(name) > 0
 
     def is_flagged_to_be_made_permanent(self, name):
         """
@@ -253,62 +302,8 @@ class BlacklistDatabase(Database):
                 ' WHERE name = ? AND type = ?',
                 (name, BlacklistDatabase.TYPE_USER),
         )
-        return bool(cursor.fetchone())
-
-    def __try_prune_temp_ban(self, row, name, name_type):
-        """
-        Returns float ban time remaining in seconds if still banned
-                -1 if ban is permanent
-                0 if not banned
-        """
-        if not row:
-            return 0
-
-        start = row['start']
-        if start < 0:
-            return start
-
-        elapsed = time.time() - start
-        remaining = self.cfg.blacklist_temp_ban_time - elapsed
-        if remaining <= 0:
-            # blacklist expired
-            name = self.__sanitize(name, name_type)
-            make_permanent = self.is_flagged_to_be_made_permanent(name)
-            if make_permanent:
-                action = 'making permanent'
-            else:
-                action = 'lifting blacklist'
-
-            logger.id(logger.debug, self,
-                    '{user} temp blacklist expired {time} ago:'
-                    ' {action} ...',
-                    user=name,
-                    time=remaining,
-                    action=action,
-            )
-            with self._db as connection:
-                if make_permanent:
-                    connection.execute(
-                            'UPDATE blacklist'
-                            ' SET start = ?, make_permanent = ?'
-                            ' WHERE name = ? AND type = ?',
-                            (
-                                BlacklistDatabase.PERMANENT,
-                                0,
-                                name,
-                                name_type,
-                            ),
-                    )
-
-                else:
-                    connection.execute(
-                            'DELETE FROM blacklist WHERE'
-                            ' name = ? AND type = ?',
-                            (name, name_type),
-                    )
-            remaining = 0
-
-        return remaining
+        row = cursor.fetchone()
+        return bool(row and row['make_permanent'])
 
     def blacklist_time_left_seconds(self, name):
         """
@@ -317,15 +312,63 @@ class BlacklistDatabase(Database):
                 0 if the name is not blacklisted
         """
         cursor = self._db.execute(
-                'SELECT start FROM blacklist WHERE name = ? AND type = ?',
+                'SELECT start, make_permanent FROM blacklist'
+                ' WHERE name = ? AND type = ?',
                 # assumption: only users can be temporarily blacklisted
                 (name, BlacklistDatabase.TYPE_USER),
         )
         row = cursor.fetchone()
-        return self.__try_prune_temp_ban(row, name, BlacklistDatabase.TYPE_USER)
+        if not row:
+            return 0
+        return _time_left(
+                row['start'],
+                row['make_permanent'],
+                self.cfg.blacklist_temp_ban_time,
+        )
+
+    def get_snapshot(self):
+        """
+        Returns a BlacklistSnapshot of every blacklisted name
+        """
+        cursor = self._db.execute(
+                'SELECT name, type, start, make_permanent FROM blacklist'
+        )
+        return BlacklistSnapshot(cursor, self.cfg.blacklist_temp_ban_time)
+
+    def sweep_expired(self):
+        """
+        Lifts expired temporary blacklists (or makes them permanent if they
+        were flagged to be made permanent)
+
+        Returns tuple (num_lifted, num_made_permanent)
+        """
+        cutoff = time.time() - self.cfg.blacklist_temp_ban_time
+        with self._db:
+            cursor = self._db.execute(
+                    'UPDATE blacklist'
+                    ' SET start = ?, make_permanent = 0'
+                    ' WHERE start >= 0 AND start <= ? AND make_permanent != 0',
+                    (BlacklistDatabase.PERMANENT, cutoff),
+            )
+            num_made_permanent = cursor.rowcount
+            cursor = self._db.execute(
+                    'DELETE FROM blacklist WHERE start >= 0 AND start <= ?',
+                    (cutoff,),
+            )
+            num_lifted = cursor.rowcount
+
+        if num_lifted or num_made_permanent:
+            logger.id(logger.debug, self,
+                    'Swept expired temp blacklists: lifted #{num_lifted},'
+                    ' made permanent #{num_permanent}',
+                    num_lifted=num_lifted,
+                    num_permanent=num_made_permanent,
+            )
+        return (num_lifted, num_made_permanent)
 
 
 __all__ = [
+        'BlacklistSnapshot',
         'BlacklistDatabase',
 ]
 
@@ -0,0 +1,125 @@
+import time
+
+from ._database import Database
+from src.config import parse_time
+
+
+class CommentAncestryDatabase(Database):
+    """
+    The parent and author of the comments that the bot has seen so that
+    comment threads can be walked without fetching them (see:
+    reddit.get_ancestor_authors)
+
+    The comments in the threads that the bot has replied in are pinned so
+    that they never expire (see: pin_thread).
+    """
+
+    PATH = 'comment-ancestry.db'
+
+    # comments are forgotten this long after they were last seen
+    EXPIRE_TIME = parse_time('14d')
+    # the number of inserts (per process) between prunes of expired comments
+    PRUNE_INTERVAL = 1000
+
+    def __init__(self, dry_run=False, *args, **kwargs):
+        Database.__init__(self, dry_run=False, *args, **kwargs)
+        # per-process counts of get lookups
+        self.num_hits = 0
+        self.num_misses = 0
+        self.__num_inserts = 0
+
+    def __contains__(self, fullname):
+        return self._exists('comments', 'fullname = ?', (fullname,))
+
+    @property
+    def _create_table_data(self):
+        return (
+                'comments('
+                '   fullname TEXT PRIMARY KEY NOT NULL,'
+                # the fullname of the parent comment or submission
+                '   parent_fullname TEXT NOT NULL,'
+                '   author TEXT NOT NULL,'
+                '   seen REAL NOT NULL,'
+                # whether the comment never expires
+                '   pinned INTEGER NOT NULL DEFAULT 0'
+                ')'
+        )
+
+    @property
+    def _create_index_data(self):
+        return [
+                'comments_seen_idx ON comments(seen)',
+        ]
+
+    def _insert(self, rows, pinned=False):
+        """
+        rows (list) - tuples of (fullname, parent_fullname, author)
+        pinned (bool, optional) - whether the comments should never expire
+                (a pinned comment stays pinned)
+        """
+        now = time.time()
+        pinned = int(bool(pinned))
+        # XXX: update then insert instead of INSERT OR REPLACE so that pinned
+        # comments are not unpinned (an upsert would need sqlite >= 3.24)
+        self._db.executemany(
+                'UPDATE comments SET parent_fullname = ?, author = ?,'
+                ' seen = ?, pinned = max(pinned, ?) WHERE fullname = ?',
+                [row[1:] + (now, pinned, row[0]) for row in rows],
+        )
+        self._db.executemany(
+                'INSERT OR IGNORE INTO'
+                ' comments(fullname, parent_fullname, author, seen, pinned)'
+                ' VALUES(?, ?, ?, ?, ?)',
+                [row + (now, pinned) for row in rows],
+        )
+
+        self.__num_inserts += len(rows)
+        if self.__num_inserts >= CommentAncestryDatabase.PRUNE_INTERVAL:
+            self.__num_inserts = 0
+            self._db.execute(
+                    'DELETE FROM comments WHERE seen < ? AND NOT pinned',
+                    (now - CommentAncestryDatabase.EXPIRE_TIME,),
+            )
+
+    def pin_thread(self, fullname):
+        """
+        Pins the comment and every one of its ancestors that is known so that
+        they never expire
+
+        Returns the number of comments pinned
+        """
+        cursor = self._db.execute(
+                'UPDATE comments SET pinned = 1'
+                ' WHERE NOT pinned AND fullname IN ('
+                '   WITH RECURSIVE thread(fullname) AS ('
+                '       VALUES(?)'
+                '       UNION SELECT parent_fullname FROM comments'
+                '           JOIN thread USING(fullname)'
+                '   )'
+                '   SELECT fullname FROM thread'
+                ')',
+                (fullname,),
+        )
+        return cursor.rowcount
+
+    def get(self, fullname):
+        """
+        Returns the comment's row (parent_fullname, author)
+                or None if the comment has not been seen
+        """
+        cursor = self._db.execute(
+                'SELECT parent_fullname, author FROM comments'
+                ' WHERE fullname = ?',
+                (fullname,),
+        )
+        row = cursor.fetchone()
+        if row:
+            self.num_hits += 1
+        else:
+            self.num_misses += 1
+        return row
+
+
+__all__ = [
+        'CommentAncestryDatabase',
+]
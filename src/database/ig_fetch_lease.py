@@ -0,0 +1,178 @@
+from errno import ESRCH
+import os
+import time
+
+from ._database import Database
+
+
+def _is_alive(pid):
+    """
+    Returns whether the process with the given pid is running
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM => the process exists but belongs to someone else
+        return e.errno != ESRCH
+    return True
+
+
+class InstagramFetchLeaseDatabase(Database):
+    """
+    Leases held by the processes currently fetching instagram users.
+
+    A lease is owned by a single process and expires unless its owner renews
+    it (see: renew). Leases owned by dead processes or past their expiry are
+    reclaimed by the next process to acquire them or removed by reap.
+    """
+
+    PATH = 'ig-fetch-lease.db'
+
+    def __init__(self, dry_run=False, *args, **kwargs):
+        Database.__init__(self, dry_run=False, *args, **kwargs)
+
+    def __contains__(self, ig_user):
+        return bool(self.get_owner(ig_user))
+
+    @property
+    def _create_table_data(self):
+        return (
+                'leases('
+                '   ig_user TEXT PRIMARY KEY NOT NULL COLLATE NOCASE,'
+                '   pid INTEGER NOT NULL,'
+                '   heartbeat REAL NOT NULL,'
+                '   expires REAL NOT NULL'
+                ')'
+        )
+
+    def _insert(self, ig_user, pid, ttl):
+        # XXX: the UPDATE takes the write lock so that only one process can
+        # take over a stale lease (the WHERE fails for the others once the
+        # first writes). not an upsert (INSERT ... ON CONFLICT DO UPDATE)
+        # which needs sqlite >= 3.24.
+        now = time.time()
+        params = {
+                'ig_user': ig_user,
+                'pid': pid,
+                'now': now,
+                'expires': now + ttl,
+                'stale_pid': self._get_stale_pid(ig_user),
+        }
+        cursor = self._db.execute(
+                'UPDATE leases SET'
+                ' pid = :pid, heartbeat = :now, expires = :expires'
+                ' WHERE ig_user = :ig_user AND ('
+                '   pid = :pid OR pid = :stale_pid OR expires < :now'
+                ' )',
+                params,
+        )
+        if cursor.rowcount > 0:
+            return True
+
+        cursor = self._db.execute(
+                'INSERT OR IGNORE INTO'
+                ' leases(ig_user, pid, heartbeat, expires)'
+                ' VALUES(:ig_user, :pid, :now, :expires)',
+                params,
+        )
+        return cursor.rowcount > 0
+
+    def _delete(self, ig_user, pid):
+        self._db.execute(
+                'DELETE FROM leases WHERE ig_user = ? AND pid = ?',
+                (ig_user, pid),
+        )
+
+    def _get_stale_pid(self, ig_user):
+        """
+        Returns the pid of the dead process owning the user's lease
+                or None if the lease is not owned by a dead process
+        """
+        cursor = self._db.execute(
+                'SELECT pid FROM leases WHERE ig_user = ?',
+                (ig_user,),
+        )
+        row = cursor.fetchone()
+        if row and not _is_alive(row['pid']):
+            return row['pid']
+        return None
+
+    def acquire(self, ig_user, pid, ttl):
+        """
+        Acquires (or renews) the user's lease for the process
+
+        ig_user (str) - the instagram user being fetched
+        pid (int) - the id of the owning process
+        ttl (float) - the number of seconds until the lease expires
+
+        Returns True if the process holds the lease
+                or False if another live process holds it
+        """
+        with self._db:
+            return self._insert(ig_user, pid, ttl)
+
+    def renew(self, ig_user, pid, ttl):
+        """
+        Extends the process's lease on the user
+
+        Returns True if the process still holds the lease
+        """
+        with self._db:
+            cursor = self._db.execute(
+                    'UPDATE leases SET heartbeat = :now, expires = :expires'
+                    ' WHERE ig_user = :ig_user AND pid = :pid',
+                    {
+                        'ig_user': ig_user,
+                        'pid': pid,
+                        'now': time.time(),
+                        'expires': time.time() + ttl,
+                    },
+            )
+        return cursor.rowcount > 0
+
+    def release(self, ig_user, pid):
+        """
+        Releases the process's lease on the user (if it holds it)
+        """
+        with self._db:
+            self._delete(ig_user, pid)
+
+    def get_owner(self, ig_user):
+        """
+        Returns the pid of the live process holding the user's lease
+                or None if the user is not leased
+        """
+        cursor = self._db.execute(
+                'SELECT pid FROM leases WHERE ig_user = ? AND expires >= ?',
+                (ig_user, time.time()),
+        )
+        row = cursor.fetchone()
+        if row and _is_alive(row['pid']):
+            return row['pid']
+        return None
+
+    def reap(self):
+        """
+        Removes expired leases and leases owned by dead processes
+
+        Returns the number of leases removed
+        """
+        cursor = self._db.execute('SELECT ig_user, pid, expires FROM leases')
+        now = time.time()
+        stale = [
+                (row['ig_user'], row['pid'])
+                for row in cursor
+                if row['expires'] < now or not _is_alive(row['pid'])
+        ]
+        if stale:
+            with self._db:
+                self._db.executemany(
+                        'DELETE FROM leases WHERE ig_user = ? AND pid = ?',
+                        stale,
+                )
+        return len(stale)
+
+
+__all__ = [
+        'InstagramFetchLeaseDatabase',
+]
@@ -0,0 +1,127 @@
+import time
+
+from ._database import Database
+
+
+class InstagramFetchQueueDatabase(Database):
+    """
+    Persistent priority queue of instagram users waiting to be fetched by the
+    fetch workers (see: src.instagram.scheduler)
+    """
+
+    PATH = 'ig-fetch-queue.db'
+
+    def __init__(self, dry_run=False, *args, **kwargs):
+        Database.__init__(self, dry_run=False, *args, **kwargs)
+
+    def __contains__(self, ig_user):
+        cursor = self._db.execute(
+                'SELECT ig_user FROM queue WHERE ig_user = ?',
+                (ig_user,),
+        )
+        return bool(cursor.fetchone())
+
+    @property
+    def _create_table_data(self):
+        return (
+                'queue('
+                '   ig_user TEXT PRIMARY KEY NOT NULL COLLATE NOCASE,'
+                # lower values are fetched first
+                '   priority INTEGER NOT NULL,'
+                '   timestamp REAL NOT NULL,'
+                # the id of the worker fetching the user (NULL => waiting)
+                '   worker INTEGER'
+                ')'
+        )
+
+    @property
+    def _create_index_data(self):
+        return [
+                'queue_order_idx ON queue(priority, timestamp)',
+        ]
+
+    def _insert(self, ig_user, priority):
+        # re-queueing a user only ever raises its priority
+        # XXX: not an upsert (INSERT ... ON CONFLICT DO UPDATE) which needs
+        # sqlite >= 3.24
+        self._db.execute(
+                'UPDATE queue SET priority = MIN(priority, ?)'
+                ' WHERE ig_user = ?',
+                (priority, ig_user),
+        )
+        self._db.execute(
+                'INSERT OR IGNORE INTO queue(ig_user, priority, timestamp)'
+                ' VALUES(?, ?, ?)',
+                (ig_user, priority, time.time()),
+        )
+
+    def _delete(self, ig_user):
+        self._db.execute(
+                'DELETE FROM queue WHERE ig_user = ?',
+                (ig_user,),
+        )
+
+    def size(self):
+        cursor = self._db.execute('SELECT count(*) FROM queue')
+        return cursor.fetchone()[0]
+
+    def num_waiting(self):
+        """
+        Returns the number of queued users not claimed by any worker
+        """
+        cursor = self._db.execute(
+                'SELECT count(*) FROM queue WHERE worker IS NULL'
+        )
+        return cursor.fetchone()[0]
+
+    def claim(self, worker):
+        """
+        Claims the highest priority waiting user for the worker. A worker
+        holds at most one claim; its existing claim is returned if it has one.
+
+        worker (int) - the id of the claiming worker
+
+        Returns the claimed ig_user
+                or None if no users are waiting
+        """
+        def get_claim():
+            cursor = self._db.execute(
+                    'SELECT ig_user FROM queue WHERE worker = ?',
+                    (worker,),
+            )
+            return cursor.fetchone()
+
+        with self._db:
+            row = get_claim()
+            if not row:
+                # XXX: a single statement so that workers cannot claim the
+                # same user
+                self._db.execute(
+                        'UPDATE queue SET worker = :worker WHERE ig_user = ('
+                        '   SELECT ig_user FROM queue WHERE worker IS NULL'
+                        '   ORDER BY priority, timestamp LIMIT 1'
+                        ')',
+                        {'worker': worker},
+                )
+                row = get_claim()
+        return row['ig_user'] if row else None
+
+    def release(self, worker, ig_user=None):
+        """
+        Returns the worker's claimed user(s) to the queue so that they are
+        fetched again later (eg. the fetch was interrupted)
+        """
+        sql = ['UPDATE queue SET worker = NULL WHERE worker = :worker']
+        if ig_user:
+            sql.append('AND ig_user = :ig_user')
+
+        with self._db:
+            self._db.execute(
+                    ' '.join(sql),
+                    {'worker': worker, 'ig_user': ig_user},
+            )
+
+
+__all__ = [
+        'InstagramFetchQueueDatabase',
+]
@@ -1,5 +1,7 @@
+from contextlib import contextmanager
 import os
 import time
+import zlib
 
 from six import string_types
 
@@ -20,6 +22,41 @@ class InstagramDatabase(Database):
     BAD_FLAG = ':+$%!!!!!~BAD~!~USERNAME~!!!!!%$+:'
     PRIVATE_FLAG = ':+$%!!!!!~PRIVATE~!~ACCOUNT~!!!!!%$+:'
 
+    # fetch modes (see: record_fetch)
+    FETCH_FULL = 'full'
+    FETCH_INCREMENTAL = 'incremental'
+
+    # per-user databases are small and rarely written by more than one process
+    # at a time. WAL would triple the number of files and checkpointing would
+    # muddle the file mtime (see: mtime).
+    _JOURNAL_MODE = 'DELETE'
+
+    # condition restricting queries to the user's rows. every row in a per-user
+    # database belongs to the user so there is nothing to restrict.
+    _USER_CONDITION = '1'
+
+    # XXX: an UPDATE followed by an INSERT OR IGNORE instead of an upsert
+    # (INSERT ... ON CONFLICT DO UPDATE) which needs sqlite >= 3.24
+    _UPDATE_COUNTS_SQL = (
+            'UPDATE cache SET'
+            ' num_likes = :num_likes, num_comments = :num_comments'
+            ' WHERE code = :code'
+    )
+    _INSERT_NEW_SQL = (
+            'INSERT OR IGNORE INTO'
+            ' cache(code, num_likes, num_comments, created)'
+            ' VALUES(:code, :num_likes, :num_comments, :created)'
+    )
+    _SEEN_INSERT = 'INSERT OR IGNORE INTO seen(code) VALUES(:code)'
+    _FETCH_INSERT = (
+            'INSERT INTO fetches(timestamp, mode, num_requests)'
+            ' VALUES(:timestamp, :mode, :num_requests)'
+    )
+
+    _RANKING_INSERT = 'INSERT INTO ranking(rank, code) VALUES(:rank, :code)'
+    # trigger statement invalidating the ranking when {row}'s media changes
+    _UNRANK_SQL = 'DELETE FROM ranking;'
+
     def __init__(self, path, dry_run=False, *args, **kwargs):
         # XXX: take a dry_run argument in case one is passed, but don't use it
         # don't split instagram by run-mode
@@ -27,6 +64,63 @@ class InstagramDatabase(Database):
         # override the path since this class defines per-user functionality
         self.path = path
 
+    @property
+    def exists(self):
+        """
+        Returns whether any data is stored for the user
+        """
+        return os.path.exists(self._resolved_path)
+
+    @property
+    def mtime(self):
+        """
+        Returns the last time the user's data was modified
+
+        Raises OSError if the user's database file could not be stat'd
+        """
+        return Database.get_mtime(self._resolved_path)
+
+    def remove(self):
+        """
+        Removes all of the user's data
+
+        Raises OSError if the database file could not be removed
+        """
+        self.close()
+        os.remove(self._resolved_path)
+
+    @contextmanager
+    def _preserve_mtime(self):
+        """
+        Context manager for writes of derived data which should not count as
+        a modification of the user's data (see: mtime)
+        """
+        try:
+            mtime = self.mtime
+        except OSError:
+            mtime = None
+
+        yield
+
+        if mtime is not None:
+            os.utime(self._resolved_path, (time.time(), mtime))
+
+    def _params(self, **params):
+        """
+        Returns the named parameters for a query (see: _USER_CONDITION)
+        """
+        return params
+
+    def _execute(self, sql, **params):
+        """
+        Executes the sql restricted to the user's rows. {where} in the sql is
+        replaced by _USER_CONDITION.
+        """
+        return self._db.execute(
+                sql.format(where=self._USER_CONDITION),
+                self._params(**params),
+        )
+
     @property
     def _create_table_data(self):
         return (
@@ -41,8 +135,42 @@ class InstagramDatabase(Database):
                 '   timestamp REAL NOT NULL,'
                 '   num_followers INTEGER PRIMARY KEY NOT NULL'
                 ')',
+
+                # materialized .order_string ranking (see: update_ranking)
+                'ranking('
+                '   rank INTEGER PRIMARY KEY NOT NULL,'
+                '   code TEXT NOT NULL'
+                ')',
+
+                # codes seen by the in-progress fetch (see: prune_unseen)
+                'seen('
+                '   code TEXT PRIMARY KEY NOT NULL'
+                ')',
+
+                # completed fetches (see: record_fetch)
+                'fetches('
+                '   timestamp REAL NOT NULL,'
+                '   mode TEXT NOT NULL,'
+                '   num_requests INTEGER NOT NULL'
+                ')',
         )
 
+    def _initialize_tables(self, db):
+        # any change to the media invalidates the ranking
+        for event, row in (
+                ('INSERT', 'NEW'),
+                ('UPDATE', 'NEW'),
+                ('DELETE', 'OLD'),
+        ):
+            db.execute(
+                    'CREATE TRIGGER IF NOT EXISTS cache_unrank_{0}'
+                    ' AFTER {1} ON cache BEGIN {2} END'.format(
+                        event.lower(),
+                        event,
+                        self._UNRANK_SQL.format(row=row),
+                    )
+            )
+
     def __unpack(self, item):
         return (
                 item['shortcode'],
@@ -55,8 +183,7 @@ class InstagramDatabase(Database):
                 # item['edge_media_to_caption']['edges']['node']['text'],
         )
 
-    def _insert(self, item):
-        code, num_likes, num_comments, created = self.__unpack(item)
+    def _insert_row(self, code, num_likes, num_comments, created):
         self._db.execute(
                 'INSERT INTO'
                 ' cache(code, num_likes, num_comments, created)'
@@ -64,12 +191,93 @@ class InstagramDatabase(Database):
                 (code, num_likes, num_comments, created),
         )
 
+    def _insert(self, item):
+        self._insert_row(*self.__unpack(item))
+
+    def upsert(self, items, mark_seen=True):
+        """
+        Inserts the given media items, updating the like/comment counts of
+        any that are already stored, and marks them as seen by the in-progress
+        fetch (see: prune_unseen).
+
+        This does not commit; wrap the call in a `with` block.
+
+        mark_seen (bool, optional) - whether to mark the items as seen
+                Default: True
+
+        Returns the number of items written
+        """
+        rows = []
+        for item in items:
+            code, num_likes, num_comments, created = self.__unpack(item)
+            rows.append(self._params(
+                    code=code,
+                    num_likes=num_likes,
+                    num_comments=num_comments,
+                    created=created,
+            ))
+
+        if rows:
+            # update the stored items first so that the new ones are not
+            # written twice
+            self._db.executemany(self._UPDATE_COUNTS_SQL, rows)
+            self._db.executemany(self._INSERT_NEW_SQL, rows)
+            if mark_seen:
+                self._db.executemany(self._SEEN_INSERT, rows)
+        return len(rows)
+
+    def mark_seen(self, codes):
+        """
+        Marks the given codes as seen by the in-progress fetch (eg. codes
+        carried over from an older in-progress fetch database).
+
+        This does not commit; wrap the call in a `with` block.
+        """
+        self._db.executemany(
+                self._SEEN_INSERT,
+                [self._params(code=code) for code in codes],
+        )
+
+    def num_seen(self):
+        """
+        Returns the number of codes seen by the in-progress fetch
+        """
+        cursor = self._execute('SELECT count(*) FROM seen WHERE {where}')
+        return cursor.fetchone()[0]
+
+    def get_unseen_codes(self):
+        """
+        Returns the set of stored media codes that were not seen by the
+        in-progress fetch
+        """
+        cursor = self._execute(
+                'SELECT code FROM cache WHERE {where} AND code NOT IN'
+                ' (SELECT code FROM seen WHERE {where})'
+        )
+        return set(row['code'] for row in cursor)
+
+    def prune_unseen(self):
+        """
+        Removes the stored media that was not seen by the in-progress fetch and
+        resets the seen codes. This should be called once a fetch completes.
+
+        Returns the number of media removed
+        """
+        with self._db:
+            cursor = self._execute(
+                    'DELETE FROM cache WHERE {where} AND code NOT IN'
+                    ' (SELECT code FROM seen WHERE {where})'
+            )
+            num_removed = cursor.rowcount
+            self._execute('DELETE FROM seen WHERE {where}')
+        return num_removed
+
     def _delete(self, codes):
         # TODO: .executemany instead
         def do_delete(code):
-            self._db.execute(
-                    'DELETE FROM cache WHERE code = ?',
-                    (code,),
+            self._execute(
+                    'DELETE FROM cache WHERE code = :code AND {where}',
+                    code=code,
             )
 
         if hasattr(codes, '__iter__') and not isinstance(codes, string_types):
@@ -81,10 +289,13 @@ class InstagramDatabase(Database):
 
     def _update(self, item):
         code, num_likes, num_comments, created = self.__unpack(item)
-        self._db.execute(
-                'UPDATE cache SET num_likes = ?, num_comments = ?'
-                ' WHERE code = ?',
-                (num_likes, num_comments, code),
+        self._execute(
+                'UPDATE cache'
+                ' SET num_likes = :num_likes, num_comments = :num_comments'
+                ' WHERE code = :code AND {where}',
+                num_likes=num_likes,
+                num_comments=num_comments,
+                code=code,
         )
 
     def record_num_followers(self, num_followers):
@@ -99,35 +310,41 @@ class InstagramDatabase(Database):
                 pass
 
     def size(self):
-        cursor = self._db.execute('SELECT count(*) FROM cache')
+        cursor = self._execute('SELECT count(*) FROM cache WHERE {where}')
         return cursor.fetchone()[0]
 
     def get_all_codes(self):
         """
         Returns the set of all stored media codes
         """
-        cursor = self._db.execute('SELECT code FROM cache')
+        cursor = self._execute('SELECT code FROM cache WHERE {where}')
         return set(row['code'] for row in cursor)
 
     def _get_max(self, col):
         """
         Returns the max value in the column
         """
-        cursor = self._db.execute('SELECT MAX({0}) FROM cache'.format(col))
+        cursor = self._execute(
+                'SELECT MAX({0}) FROM cache WHERE {{where}}'.format(col)
+        )
         return cursor.fetchone()[0]
 
     def _get_min(self, col):
         """
         Returns the min value in the column
         """
-        cursor = self._db.execute('SELECT MIN({0}) FROM cache'.format(col))
+        cursor = self._execute(
+                'SELECT MIN({0}) FROM cache WHERE {{where}}'.format(col)
+        )
         return cursor.fetchone()[0]
 
     def _get_avg(self, col):
         """
         Returns the avg value of the column
         """
-        cursor = self._db.execute('SELECT AVG({0}) FROM cache'.format(col))
+        cursor = self._execute(
+                'SELECT AVG({0}) FROM cache WHERE {{where}}'.format(col)
+        )
         return cursor.fetchone()[0]
 
     def _get_q1(self, col):
@@ -135,10 +352,12 @@ class InstagramDatabase(Database):
         Returns the 25th percentile (1st quartile) of the given column
         """
         # https://stackoverflow.com/a/15766121
-        cursor = self._db.execute(
-                'SELECT AVG({0}) FROM (SELECT {0} FROM cache ORDER BY {0}'
-                ' LIMIT 2 - (SELECT count(*) FROM cache) % 2'
-                ' OFFSET (SELECT (count(*)/2 - 1) / 2 FROM cache))'.format(col)
+        cursor = self._execute(
+                'SELECT AVG({0}) FROM (SELECT {0} FROM cache WHERE {{where}}'
+                ' ORDER BY {0}'
+                ' LIMIT 2 - (SELECT count(*) FROM cache WHERE {{where}}) % 2'
+                ' OFFSET (SELECT (count(*)/2 - 1) / 2 FROM cache'
+                ' WHERE {{where}}))'.format(col)
         )
         return cursor.fetchone()[0]
 
@@ -147,10 +366,12 @@ class InstagramDatabase(Database):
         Returns the 50th percentile (2nd quartile) of the given column
         """
         # https://stackoverflow.com/a/15766121
-        cursor = self._db.execute(
-                'SELECT AVG({0}) FROM (SELECT {0} FROM cache ORDER BY {0}'
-                ' LIMIT 2 - (SELECT count(*) FROM cache) % 2'
-                ' OFFSET (SELECT count(*)/2 - 1 FROM cache))'.format(col)
+        cursor = self._execute(
+                'SELECT AVG({0}) FROM (SELECT {0} FROM cache WHERE {{where}}'
+                ' ORDER BY {0}'
+                ' LIMIT 2 - (SELECT count(*) FROM cache WHERE {{where}}) % 2'
+                ' OFFSET (SELECT count(*)/2 - 1 FROM cache'
+                ' WHERE {{where}}))'.format(col)
         )
         return cursor.fetchone()[0]
 
@@ -159,11 +380,12 @@ class InstagramDatabase(Database):
         Returns the 75th percentile (3rd quartile) of the given column
         """
         # https://stackoverflow.com/a/15766121
-        cursor = self._db.execute(
-                'SELECT AVG({0}) FROM (SELECT {0} FROM cache ORDER BY {0}'
-                ' LIMIT 2 - (SELECT count(*) FROM cache) % 2'
-                ' OFFSET (SELECT (3*count(*)/2 - 1) / 2'
-                ' FROM cache))'.format(col)
+        cursor = self._execute(
+                'SELECT AVG({0}) FROM (SELECT {0} FROM cache WHERE {{where}}'
+                ' ORDER BY {0}'
+                ' LIMIT 2 - (SELECT count(*) FROM cache WHERE {{where}}) % 2'
+                ' OFFSET (SELECT (3*count(*)/2 - 1) / 2 FROM cache'
+                ' WHERE {{where}}))'.format(col)
         )
         return cursor.fetchone()[0]
 
@@ -270,32 +492,112 @@ class InstagramDatabase(Database):
         """
         from src.instagram import MEDIA_LINK_FMT
 
-        cursor = self._db.execute(
-                'SELECT code FROM cache ORDER BY {0}'.format(self.order_string)
+        return [
+                MEDIA_LINK_FMT.format(code)
+                for code in self.get_top_codes(num, start)
+        ]
+
+    def get_top_codes(self, num=-1, start=0):
+        """
+        Returns a list containing at-most {num} most popular media codes
+
+        See: get_top_media
+        """
+        if not self.is_ranked:
+            self.update_ranking()
+
+        cursor = self._execute(
+                'SELECT code FROM ranking WHERE {where}'
+                ' ORDER BY rank LIMIT :num OFFSET :start',
+                # LIMIT -1 => no limit
+                num=num if num >= 0 else -1,
+                start=max(0, start),
+        )
+        return [row['code'] for row in cursor]
+
+    def record_fetch(self, mode, num_requests):
+        """
+        Records a completed fetch of the user's media
+
+        mode (str) - the FETCH_* mode of the fetch
+        num_requests (int) - the number of requests the fetch made
+        """
+        with self._db:
+            self._db.execute(self._FETCH_INSERT, self._params(
+                    timestamp=time.time(),
+                    mode=mode,
+                    num_requests=num_requests,
+            ))
+
+    @property
+    def last_full_fetch(self):
+        """
+        Returns the time of the last completed full fetch
+                or None if no full fetch has been recorded
+        """
+        cursor = self._execute(
+                'SELECT MAX(timestamp) FROM fetches'
+                ' WHERE mode = :mode AND {where}',
+                mode=InstagramDatabase.FETCH_FULL,
         )
-        media = []
-        for i, row in enumerate(cursor):
-            if len(media) == num:
-                # stop once enough items have been collected
-                break
+        return cursor.fetchone()[0]
 
-            elif i < start:
-                # skip elements before the start index
-                continue
+    def get_fetch_stats(self):
+        """
+        Returns {mode: (num_fetches, total_num_requests)} of the recorded
+                fetches
+        """
+        cursor = self._execute(
+                'SELECT mode, count(*) AS num, SUM(num_requests) AS total'
+                ' FROM fetches WHERE {where} GROUP BY mode'
+        )
+        return {row['mode']: (row['num'], row['total']) for row in cursor}
 
-            link = MEDIA_LINK_FMT.format(row['code'])
-            if link not in media:
-                media.append(link)
+    @property
+    def is_ranked(self):
+        """
+        Returns whether the media ranking is up to date
+        """
+        cursor = self._execute('SELECT 1 FROM ranking WHERE {where} LIMIT 1')
+        return bool(cursor.fetchone())
 
-        return media
+    def update_ranking(self):
+        """
+        Materializes the .order_string ranking of the media so that
+        get_top_media lookups are a simple indexed read. This should be called
+        once a fetch completes; any change to the media invalidates the
+        ranking.
+        """
+        if self.size() == 0:
+            # nothing to rank
+            return
+
+        start = time.time()
+        cursor = self._execute(
+                'SELECT code FROM cache WHERE {{where}}'
+                ' ORDER BY {0}'.format(self.order_string)
+        )
+        ranking = [
+                self._params(rank=rank, code=row['code'])
+                for rank, row in enumerate(cursor)
+        ]
+        with self._preserve_mtime(), self._db:
+            self._execute('DELETE FROM ranking WHERE {where}')
+            self._db.executemany(self._RANKING_INSERT, ranking)
+
+        logger.id(logger.debug, self,
+                'Ranked #{num} media in {time}',
+                num=len(ranking),
+                time=time.time() - start,
+        )
 
     def _is_flagged(self, flag):
         """
         Returns whether the cache is flagged for the given *_FLAG flag
         """
-        cursor = self._db.execute(
-                'SELECT code FROM cache WHERE code = ?',
-                (flag,),
+        cursor = self._execute(
+                'SELECT code FROM cache WHERE code = :code AND {where}',
+                code=flag,
         )
         return bool(cursor.fetchone())
 
@@ -334,7 +636,7 @@ class InstagramDatabase(Database):
                             flag=flag_str(flag),
                     )
                     # clear the cache so that the flag is the only element
-                    cursor = self._db.execute('DELETE FROM cache')
+                    cursor = self._execute('DELETE FROM cache WHERE {where}')
                     if cursor.rowcount > 0:
                         # this probably means that the user made their account
                         # private
@@ -344,32 +646,24 @@ class InstagramDatabase(Database):
                                 plural=('' if cursor.rowcount == 1 else 's'),
                         )
                     # XXX: co-opt the existing columns to flag the username
-                    self._db.execute(
-                            'INSERT INTO'
-                            ' cache(code, num_likes, num_comments, created)'
-                            ' VALUES(?, ?, ?, ?)',
-                            (
-                                flag,
-                                -1,
-                                -1,
-                                time.time(),
-                            ),
-                    )
+                    self._insert_row(flag, -1, -1, time.time())
 
                 else:
                     logger.id(logger.debug, self,
                             'Username is still {flag}: updating flag time ...',
                             flag=flag_str(flag),
                     )
-                    self._db.execute(
-                            'UPDATE cache SET created = ? WHERE code = ?',
-                            (time.time(), flag),
+                    self._execute(
+                            'UPDATE cache SET created = :created'
+                            ' WHERE code = :code AND {where}',
+                            created=time.time(),
+                            code=flag,
                     )
 
         else:
-            cursor = self._db.execute(
-                    'SELECT created FROM cache WHERE code = ?',
-                    (flag,),
+            cursor = self._execute(
+                    'SELECT created FROM cache WHERE code = :code AND {where}',
+                    code=flag,
             )
             row = cursor.fetchone()
 
@@ -399,7 +693,315 @@ class InstagramDatabase(Database):
         self._flag(InstagramDatabase.PRIVATE_FLAG, is_update)
 
 
+class InstagramStoreDatabase(InstagramDatabase):
+    """
+    Cached instagram data for a single user in the consolidated media store.
+
+    The store holds every user's media in a single database file (or one of
+    N shard files) instead of one database file per user.
+    """
+
+    PATH = 'instagram-media.db'
+    FETCHING_PATH = 'instagram-fetching.db'
+
+    _JOURNAL_MODE = 'WAL'
+
+    _USER_CONDITION = 'ig_user = :ig_user'
+
+    _RANKING_INSERT = (
+            'INSERT INTO ranking(ig_user, rank, code)'
+            ' VALUES(:ig_user, :rank, :code)'
+    )
+    _UNRANK_SQL = 'DELETE FROM ranking WHERE ig_user = {row}.ig_user;'
+
+    _UPDATE_COUNTS_SQL = (
+            'UPDATE cache SET'
+            ' num_likes = :num_likes, num_comments = :num_comments'
+            ' WHERE ig_user = :ig_user AND code = :code'
+    )
+    _INSERT_NEW_SQL = (
+            'INSERT OR IGNORE INTO'
+            ' cache(ig_user, code, num_likes, num_comments, created)'
+            ' VALUES(:ig_user, :code, :num_likes, :num_comments, :created)'
+    )
+    _SEEN_INSERT = (
+            'INSERT OR IGNORE INTO seen(ig_user, code) VALUES(:ig_user, :code)'
+    )
+    _FETCH_INSERT = (
+            'INSERT INTO fetches(ig_user, timestamp, mode, num_requests)'
+            ' VALUES(:ig_user, :timestamp, :mode, :num_requests)'
+    )
+
+    # sqlite equivalent of time.time()
+    _NOW = '((julianday(\'now\') - 2440587.5) * 86400.0)'
+
+    @staticmethod
+    def get_path(user, num_shards, fetching=False):
+        """
+        Returns the path of the store file containing the user's data
+
+        user (str) - the instagram user
+        num_shards (int) - the number of files the store is split into
+        fetching (bool, optional) - whether the path should point to the
+                in-progress fetch store instead
+        """
+        basename = (
+                InstagramStoreDatabase.FETCHING_PATH if fetching
+                else InstagramStoreDatabase.PATH
+        )
+        if num_shards > 1:
+            # XXX: crc32 instead of hash() since str hashes are randomized
+            # per-process
+            shard = zlib.crc32(user.lower().encode('utf-8')) % num_shards
+            name, ext = os.path.splitext(basename)
+            basename = '{0}.{1}{2}'.format(name, shard, ext)
+        return Database.format_path(basename, dry_run=False)
+
+    def __init__(self, path, user, *args, **kwargs):
+        InstagramDatabase.__init__(self, path, *args, **kwargs)
+        self.user = user.lower()
+
+    def __str__(self):
+        return '{0}:{1}'.format(InstagramDatabase.__str__(self), self.user)
+
+    @property
+    def _create_table_data(self):
+        return (
+                'cache('
+                '   ig_user TEXT NOT NULL,'
+                '   code TEXT NOT NULL,'
+                '   num_likes INTEGER NOT NULL,'
+                '   num_comments INTEGER DEFAULT 0,'
+                '   created REAL NOT NULL,'
+                '   UNIQUE(ig_user, code)'
+                ')',
+
+                'followers('
+                '   ig_user TEXT NOT NULL,'
+                '   timestamp REAL NOT NULL,'
+                '   num_followers INTEGER NOT NULL,'
+                '   UNIQUE(ig_user, num_followers)'
+                ')',
+
+                # the last time each user's data was modified (the equivalent
+                # of a per-user database file's mtime)
+                'users('
+                '   ig_user TEXT PRIMARY KEY NOT NULL,'
+                '   modified REAL NOT NULL'
+                ')',
+
+                'ranking('
+                '   ig_user TEXT NOT NULL,'
+                '   rank INTEGER NOT NULL,'
+                '   code TEXT NOT NULL,'
+                '   UNIQUE(ig_user, rank)'
+                ')',
+
+                'seen('
+                '   ig_user TEXT NOT NULL,'
+                '   code TEXT NOT NULL,'
+                '   UNIQUE(ig_user, code)'
+                ')',
+
+                'fetches('
+                '   ig_user TEXT NOT NULL,'
+                '   timestamp REAL NOT NULL,'
+                '   mode TEXT NOT NULL,'
+                '   num_requests INTEGER NOT NULL'
+                ')',
+        )
+
+    @property
+    def _create_index_data(self):
+        return [
+                'cache_likes_idx ON cache(ig_user, num_likes)',
+                'cache_comments_idx ON cache(ig_user, num_comments)',
+                'fetches_user_idx ON fetches(ig_user, mode, timestamp)',
+        ]
+
+    def _initialize_tables(self, db):
+        InstagramDatabase._initialize_tables(self, db)
+
+        # keep users.modified up to date with any change to the user's media
+        # XXX: the insert never conflicts rather than relying on an OR-clause
+        # since the conflict policy of the statement firing the trigger (eg.
+        # an UPDATE's implicit ABORT) overrides any OR-clause in the trigger
+        # body. (an upsert would need sqlite >= 3.24)
+        touch = (
+                'UPDATE users SET modified = {1}'
+                ' WHERE ig_user = {0}.ig_user;'
+                'INSERT INTO users(ig_user, modified)'
+                ' SELECT {0}.ig_user, {1} WHERE NOT EXISTS('
+                '   SELECT 1 FROM users WHERE ig_user = {0}.ig_user'
+                ');'
+        )
+        for event, row in (
+                ('INSERT', 'NEW'),
+                ('UPDATE', 'NEW'),
+                ('DELETE', 'OLD'),
+        ):
+            db.execute(
+                    'CREATE TRIGGER IF NOT EXISTS cache_touch_{0}'
+                    ' AFTER {1} ON cache BEGIN {2} END'.format(
+                        event.lower(),
+                        event,
+                        touch.format(row, InstagramStoreDatabase._NOW),
+                    )
+            )
+        # a fetch that found nothing new still refreshes the user's data
+        db.execute(
+                'CREATE TRIGGER IF NOT EXISTS fetches_modified_insert'
+                ' AFTER INSERT ON fetches BEGIN {0} END'.format(
+                    touch.format('NEW', InstagramStoreDatabase._NOW),
+                )
+        )
+
+    @property
+    def exists(self):
+        cursor = self._execute('SELECT 1 FROM users WHERE {where}')
+        return bool(cursor.fetchone())
+
+    @property
+    def mtime(self):
+        """
+        Returns the last time the user's data was modified
+
+        Raises OSError if there is no data stored for the user
+        """
+        from errno import ENOENT
+
+        cursor = self._execute('SELECT modified FROM users WHERE {where}')
+        row = cursor.fetchone()
+        if not row:
+            raise OSError(ENOENT, 'No data for \'{0}\''.format(self.user))
+        return row['modified']
+
+    @contextmanager
+    def _preserve_mtime(self):
+        # writes to the ranking table do not touch users.modified
+        yield
+
+    def remove(self):
+        with self._db:
+            self._execute('DELETE FROM cache WHERE {where}')
+            self._execute('DELETE FROM followers WHERE {where}')
+            self._execute('DELETE FROM seen WHERE {where}')
+            self._execute('DELETE FROM fetches WHERE {where}')
+            # delete the user last since the cache triggers re-insert it
+            self._execute('DELETE FROM users WHERE {where}')
+
+    def _params(self, **params):
+        params['ig_user'] = self.user
+        return params
+
+    def _insert_row(self, code, num_likes, num_comments, created):
+        self._db.execute(
+                'INSERT INTO'
+                ' cache(ig_user, code, num_likes, num_comments, created)'
+                ' VALUES(?, ?, ?, ?, ?)',
+                (self.user, code, num_likes, num_comments, created),
+        )
+
+    def record_num_followers(self, num_followers):
+        with self._db:
+            try:
+                self._db.execute(
+                        'INSERT INTO'
+                        ' followers(ig_user, timestamp, num_followers)'
+                        ' VALUES(?, ?, ?)',
+                        (self.user, time.time(), num_followers),
+                )
+            except UniqueConstraintFailed:
+                pass
+
+    def migrate(self, user_db):
+        """
+        Imports the user's existing per-user database into the store. Rows
+        already in the store are kept.
+
+        user_db (InstagramDatabase) - the user's per-user database
+
+        Returns the number of media rows imported
+        """
+        try:
+            mtime = user_db.mtime
+        except OSError:
+            # nothing to migrate
+            return 0
+
+        cursor = user_db._db.execute(
+                'SELECT code, num_likes, num_comments, created FROM cache'
+        )
+        media = [
+                (
+                    self.user,
+                    row['code'],
+                    row['num_likes'],
+                    row['num_comments'],
+                    row['created'],
+                )
+                for row in cursor
+        ]
+        cursor = user_db._db.execute(
+                'SELECT timestamp, num_followers FROM followers'
+        )
+        followers = [
+                (self.user, row['timestamp'], row['num_followers'])
+                for row in cursor
+        ]
+        # an interrupted fetch's seen codes (see: prune_unseen)
+        cursor = user_db._db.execute('SELECT code FROM seen')
+        seen = [row['code'] for row in cursor]
+        cursor = user_db._db.execute(
+                'SELECT timestamp, mode, num_requests FROM fetches'
+        )
+        fetches = [
+                (self.user, row['timestamp'], row['mode'], row['num_requests'])
+                for row in cursor
+        ]
+
+        try:
+            # keep the most recent modification time if the user already
+            # exists in the store
+            mtime = max(mtime, self.mtime)
+        except OSError:
+            pass
+
+        with self._db:
+            cursor = self._db.executemany(
+                    'INSERT OR IGNORE INTO'
+                    ' cache(ig_user, code, num_likes, num_comments, created)'
+                    ' VALUES(?, ?, ?, ?, ?)',
+                    media,
+            )
+            num_imported = cursor.rowcount
+            self._db.executemany(
+                    'INSERT OR IGNORE INTO'
+                    ' followers(ig_user, timestamp, num_followers)'
+                    ' VALUES(?, ?, ?)',
+                    followers,
+            )
+            self.mark_seen(seen)
+            self._db.executemany(
+                    'INSERT INTO'
+                    ' fetches(ig_user, timestamp, mode, num_requests)'
+                    ' VALUES(?, ?, ?, ?)',
+                    fetches,
+            )
+            # carry over the file's mtime so that the cache does not appear
+            # freshly fetched
+            self._db.execute(
+                    'INSERT OR REPLACE INTO users(ig_user, modified)'
+                    ' VALUES(?, ?)',
+                    (self.user, mtime),
+            )
+
+        self.update_ranking()
+        return num_imported
+
+
 __all__ = [
         'InstagramDatabase',
+        'InstagramStoreDatabase',
 ]
 
@@ -55,11 +55,11 @@ class RedditRateLimitQueueDatabase(Database):
         return value
 
     def __contains__(self, thing):
-        cursor = self._db.execute(
-                'SELECT fullname FROM queue WHERE fullname = ?',
+        return self._exists(
+                'queue',
+                'fullname = ?',
                 (RedditRateLimitQueueDatabase.fullname(thing),),
         )
-        return bool(cursor.fetchone())
 
     @property
     def _create_table_data(self):
@@ -77,6 +77,15 @@ class RedditRateLimitQueueDatabase(Database):
                 ')'
         )
 
+    @property
+    def _create_index_data(self):
+        return [
+                # see: ig_users_for
+                'queue_submission_idx ON queue(submission_fullname)',
+                # see: get
+                'queue_reset_idx ON queue(ratelimit_reset)',
+        ]
+
     def _insert(
             self, thing, ratelimit_delay, body=None, title=None,
             selftext=None, url=None, submission=None
@@ -168,8 +177,7 @@ class RedditRateLimitQueueDatabase(Database):
         )
 
     def __update_has_elements(self):
-        cursor = self._db.execute('SELECT fullname FROM queue')
-        if bool(cursor.fetchone()):
+        if self._exists('queue'):
             if not RedditRateLimitQueueDatabase.__has_elements.is_set():
                 logger.id(logger.debug, self, 'queue has elements')
             RedditRateLimitQueueDatabase.__has_elements.set()
@@ -217,8 +225,7 @@ class RedditRateLimitQueueDatabase(Database):
         Returns the current number of elements in the database
         """
         # https://stackoverflow.com/a/669096
-        cursor = self._db.execute('SELECT count(*) FROM queue')
-        return cursor.fetchone()[0]
+        return self._count('queue')
 
     def get(self, block=True, timeout=None):
         """
@@ -248,7 +255,7 @@ class RedditRateLimitQueueDatabase(Database):
                 or None if all elements are still rate-limited and the timeout
                 has expired.
         """
-        query = 'SELECT * FROM queue ORDER BY ratelimit_reset ASC'
+        query = 'SELECT * FROM queue ORDER BY ratelimit_reset ASC LIMIT 1'
         row = self._db.execute(query).fetchone()
         if not row:
             if block:
@@ -25,6 +25,18 @@ class ReplyDatabase(Database):
                 ')'
         )
 
+    @property
+    def _create_index_data(self):
+        return [
+                # see: has_replied
+                'comments_replied_idx ON comments(replied_fullname)',
+                # covers the replied things of a submission so that they can
+                # be counted without reading the table
+                # (see: num_replied_things_for_submission)
+                'comments_submission_idx'
+                ' ON comments(submission_fullname, replied_fullname)',
+        ]
+
     def _insert(self, thing, ig_list):
         from src import reddit
 
@@ -86,6 +98,20 @@ class ReplyDatabase(Database):
         )
         return set([row['replied_fullname'] for row in cursor])
 
+    def num_replied_things_for_submission(self, submission):
+        """
+        Returns the number of things that the bot has replied to for a given
+        post
+        """
+        from src import reddit
+
+        return self._count(
+                'comments',
+                'submission_fullname = ?',
+                (reddit.fullname(submission),),
+                column='DISTINCT replied_fullname',
+        )
+
     def replied_ig_users_for_submission(self, submission):
         """
         Returns the set of instagram user names that the bot has replied with
@@ -105,12 +131,9 @@ class ReplyDatabase(Database):
         """
         from src import reddit
 
-        cursor = self._db.execute(
-                'SELECT replied_fullname FROM comments'
-                ' WHERE replied_fullname = ?',
-                (reddit.fullname(thing),),
+        return self._exists(
+                'comments', 'replied_fullname = ?', (reddit.fullname(thing),),
         )
-        return bool(cursor.fetchone())
 
 
 __all__ = [
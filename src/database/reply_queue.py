@@ -1,6 +1,7 @@
 import time
 
 from ._database import Database
+from src.util import logger
 
 
 class ReplyQueueDatabase(Database):
@@ -20,37 +21,89 @@ class ReplyQueueDatabase(Database):
             return thing
 
     def __contains__(self, thing):
-        cursor = self._db.execute(
-                'SELECT thing_fullname FROM queue WHERE thing_fullname = ?',
+        return self._exists(
+                'queue',
+                'thing_fullname = ?',
                 (ReplyQueueDatabase.get_fullname(thing),),
         )
-        return bool(cursor.fetchone())
 
     @property
     def _create_table_data(self):
         return (
                 'queue('
                 '   thing_fullname TEXT PRIMARY KEY NOT NULL,'
+                # the time the thing was queued
                 '   timestamp REAL NOT NULL,'
+                # the thing's reddit timestamp; older things are dequeued first
+                '   created_utc REAL NOT NULL,'
+                # the time before which the thing is not dequeued (eg. because
+                # it is waiting on an instagram fetch)
+                '   not_before REAL NOT NULL DEFAULT 0,'
+                # the number of times the thing was deferred
+                '   attempts INTEGER NOT NULL DEFAULT 0,'
                 '   mention_id TEXT'
                 ')'
         )
 
+    def _migrate_tables(self, db):
+        info = db.execute('PRAGMA table_info(\'queue\')').fetchall()
+        existing_columns = [row['name'] for row in info]
+        if not existing_columns:
+            # new database
+            return
+
+        # added with the created_utc ordering and deferred things
+        new_columns = [
+                ('created_utc', 'REAL NOT NULL DEFAULT 0'),
+                ('not_before', 'REAL NOT NULL DEFAULT 0'),
+                ('attempts', 'INTEGER NOT NULL DEFAULT 0'),
+        ]
+        for col, defn in new_columns:
+            if col not in existing_columns:
+                logger.id(logger.info, self,
+                        'Adding column \'{col}\' to table \'queue\'',
+                        col=col,
+                )
+                db.execute(
+                        'ALTER TABLE queue ADD COLUMN {0} {1}'.format(
+                            col, defn,
+                        )
+                )
+
+        if 'created_utc' not in existing_columns:
+            # the queue time is the best approximation of the thing's age
+            db.execute('UPDATE queue SET created_utc = timestamp')
+
+    @property
+    def _create_index_data(self):
+        return [
+                # see: get_ready; ordered by created_utc so that the ready
+                # things are scanned in order (not_before is filtered from the
+                # index instead of sorting every ready row)
+                'queue_ready_idx ON queue(created_utc, not_before)',
+        ]
+
     def _insert(self, thing, mention=None):
+        now = time.time()
         self._db.execute(
-                'INSERT INTO queue(thing_fullname, timestamp, mention_id)'
-                ' VALUES(?, ?, ?)',
+                'INSERT INTO queue(thing_fullname, timestamp, created_utc,'
+                ' mention_id) VALUES(?, ?, ?, ?)',
                 (
                     ReplyQueueDatabase.get_fullname(thing),
-                    time.time(),
+                    now,
+                    getattr(thing, 'created_utc', None) or now,
                     mention and mention.id
                 ),
         )
 
-    def _update(self, thing):
+    def _update(self, thing, delay):
+        """
+        Defers the thing so that it is not dequeued for delay seconds
+        """
         self._db.execute(
-                'UPDATE queue SET timestamp = ? WHERE thing_fullname = ?',
-                (time.time(), ReplyQueueDatabase.get_fullname(thing)),
+                'UPDATE queue SET not_before = ?, attempts = attempts + 1'
+                ' WHERE thing_fullname = ?',
+                (time.time() + delay, ReplyQueueDatabase.get_fullname(thing)),
         )
 
     def _delete(self, thing):
@@ -60,23 +113,24 @@ class ReplyQueueDatabase(Database):
         )
 
     def size(self):
-        cursor = self._db.execute('SELECT count(*) FROM queue')
-        return cursor.fetchone()[0]
+        return self._count('queue')
 
-    def get(self):
+    def get_ready(self, num):
         """
-        Returns (thing_fullname, mention_id) of the oldest record in the
-                    database
-                or None if the queue is empty
+        Returns a list of at most num (thing_fullname, mention_id, attempts)
+                of the oldest things that are not deferred (see: update)
+                or an empty list if no queued thing is ready
         """
         cursor = self._db.execute(
-                'SELECT thing_fullname, mention_id FROM queue'
-                ' ORDER BY timestamp ASC'
+                'SELECT thing_fullname, mention_id, attempts FROM queue'
+                ' WHERE not_before <= ?'
+                ' ORDER BY created_utc ASC LIMIT ?',
+                (time.time(), num),
         )
-        row = cursor.fetchone()
-        if row:
-            return (row['thing_fullname'], row['mention_id'])
-        return None
+        return [
+                (row['thing_fullname'], row['mention_id'], row['attempts'])
+                for row in cursor
+        ]
 
 
 __all__ = [
@@ -0,0 +1,69 @@
+from ._database import Database
+
+
+class SeenThingsDatabase(Database):
+    """
+    Fixed-size ring buffer of the fullnames most recently polled from the
+    subreddit streams so that the things replayed when a stream is
+    re-initialized (or the bot restarts) are dropped before they are parsed
+    (see: poller.StreamPoller)
+    """
+
+    PATH = 'seen-things.db'
+
+    # the number of fullnames remembered
+    CAPACITY = 10000
+
+    def __init__(self, capacity=CAPACITY, *args, **kwargs):
+        """
+        capacity (int, optional) - the number of fullnames remembered; the
+                oldest fullname is overwritten once the buffer is full
+        """
+        Database.__init__(self, *args, **kwargs)
+        self.capacity = capacity
+        # the sequence number of the next insert (see: _insert)
+        self.__head = None
+
+    def __contains__(self, fullname):
+        return self._exists('seen', 'fullname = ?', (fullname,))
+
+    @property
+    def _create_table_data(self):
+        return (
+                'seen('
+                # the fullname's position in the ring buffer (seq % capacity)
+                '   slot INTEGER PRIMARY KEY NOT NULL,'
+                '   seq INTEGER NOT NULL,'
+                '   fullname TEXT NOT NULL UNIQUE'
+                ')'
+        )
+
+    def _initialize_tables(self, db):
+        # drop the slots beyond the buffer if the capacity shrank
+        db.execute('DELETE FROM seen WHERE slot >= ?', (self.capacity,))
+
+    @property
+    def _head(self):
+        if self.__head is None:
+            cursor = self._db.execute('SELECT max(seq) FROM seen')
+            seq = cursor.fetchone()[0]
+            self.__head = 0 if seq is None else seq + 1
+        return self.__head
+
+    def _insert(self, fullname):
+        seq = self._head
+        # overwrites the oldest fullname once the buffer is full
+        self._db.execute(
+                'INSERT OR REPLACE INTO seen(slot, seq, fullname)'
+                ' VALUES(?, ?, ?)',
+                (seq % self.capacity, seq, fullname),
+        )
+        self.__head = seq + 1
+
+    def size(self):
+        return self._count('seen')
+
+
+__all__ = [
+        'SeenThingsDatabase',
+]
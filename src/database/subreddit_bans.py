@@ -0,0 +1,64 @@
+import time
+
+from ._database import Database
+
+
+class SubredditBansDatabase(Database):
+    """
+    Cache of whether the bot is banned from subreddits (see:
+    reddit.is_banned_from)
+    """
+
+    PATH = 'subreddit-bans.db'
+
+    def __init__(self, dry_run=False, *args, **kwargs):
+        Database.__init__(self, dry_run=False, *args, **kwargs)
+        # per-process counts of get_banned lookups
+        self.num_hits = 0
+        self.num_misses = 0
+
+    @property
+    def _create_table_data(self):
+        return (
+                'bans('
+                '   subreddit TEXT PRIMARY KEY NOT NULL COLLATE NOCASE,'
+                '   banned INTEGER NOT NULL,'
+                '   checked REAL NOT NULL'
+                ')'
+        )
+
+    def _insert(self, subreddit, banned):
+        self._db.execute(
+                'INSERT OR REPLACE INTO bans(subreddit, banned, checked)'
+                ' VALUES(?, ?, ?)',
+                (subreddit, int(bool(banned)), time.time()),
+        )
+
+    def _delete(self, subreddit):
+        self._db.execute(
+                'DELETE FROM bans WHERE subreddit = ?',
+                (subreddit,),
+        )
+
+    def get_banned(self, subreddit, max_age):
+        """
+        Returns whether the bot is banned from the subreddit
+                or None if the subreddit was not checked within the last
+                    max_age seconds
+        """
+        cursor = self._db.execute(
+                'SELECT banned FROM bans WHERE subreddit = ? AND checked >= ?',
+                (subreddit, time.time() - max_age),
+        )
+        row = cursor.fetchone()
+        if not row:
+            self.num_misses += 1
+            return None
+
+        self.num_hits += 1
+        return bool(row['banned'])
+
+
+__all__ = [
+        'SubredditBansDatabase',
+]
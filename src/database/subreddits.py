@@ -34,7 +34,7 @@ class SubredditsDatabase(Database):
             self.__mtime
 
         except AttributeError:
-            self.__mtime = os.stat(self._resolved_path).st_mtime
+            self.__mtime = Database.get_mtime(self._resolved_path)
 
         except OSError as e:
             # probably a permissions issue; this should be fatal
@@ -200,7 +200,7 @@ class SubredditsDatabase(Database):
 
     @property
     def is_dirty(self):
-        return self.__mtime != os.stat(self._resolved_path).st_mtime
+        return self.__mtime != Database.get_mtime(self._resolved_path)
 
     @contextmanager
     def updating(self):
@@ -216,7 +216,7 @@ class SubredditsDatabase(Database):
         """
         yield
         if self.is_dirty:
-            self.__mtime = os.stat(self._resolved_path).st_mtime
+            self.__mtime = Database.get_mtime(self._resolved_path)
 
     def get_all_subreddits(self):
         cursor = self._db.execute('SELECT subreddit_name FROM subreddits')
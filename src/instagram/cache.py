@@ -6,6 +6,7 @@ from src.database import (
         Database,
         InstagramDatabase,
         InstagramQueueDatabase,
+        InstagramStoreDatabase,
         UniqueConstraintFailed,
 )
 from src.util import logger
@@ -19,9 +20,17 @@ class Cache(object):
     _ig_queue = None
 
     def __init__(self, user):
+        from .instagram import Instagram
+
         self.user = user
         self.__the_cache = None
         self.__the_inprogress_cache = None
+        # the databases whose `with` blocks are open (see: __enter__)
+        self.__entered = []
+        # the number of consolidated media store files (0 => per-user files)
+        self.num_shards = (
+                Instagram._cfg.media_store_shards if Instagram._cfg else 0
+        )
 
         if not Cache._ig_queue:
             Cache._ig_queue = InstagramQueueDatabase()
@@ -40,44 +49,59 @@ class Cache(object):
             return getattr(self.__cache, attr)
 
     def __enter__(self):
+        # XXX: scope the block to the database's savepoint instead of
+        # committing/rolling back its connection which may be shared with
+        # other users' caches (see: Database.__enter__)
+        cache = self.__cache
+        cache.__enter__()
+        self.__entered.append(cache)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if exc_type is None and exc_value is None and traceback is None:
-            self.__cache.commit()
-            self.__fetch_cache.commit()
+        cache = self.__entered.pop()
+        cache.__exit__(exc_type, exc_value, traceback)
 
-        else:
-            logger.id(logger.debug, self,
-                    'An error occurred! Rolling back changes ...',
-                    exc_info=True,
-            )
-            self.__cache.rollback()
-            self.__fetch_cache.rollback()
+    @property
+    def is_store(self):
+        """
+        Returns whether the user's data is kept in the consolidated media store
+        """
+        return self.num_shards > 0
+
+    def __open(self, path):
+        if self.is_store:
+            return InstagramStoreDatabase(path, self.user)
+        return InstagramDatabase(path)
 
     @property
     def __cache(self):
         if not self.__the_cache:
-            self.__the_cache = InstagramDatabase(self.dbpath)
+            self.__the_cache = self.__open(self.dbpath)
         return self.__the_cache
 
     @property
     def __fetch_cache(self):
         """
-        In-progress fetch cache used to compare missing database elements
+        Older in-progress fetch cache (see: _import_fetch_cache)
         """
         if not self.__the_inprogress_cache:
-            self.__the_inprogress_cache = InstagramDatabase(self.seenpath)
+            self.__the_inprogress_cache = self.__open(self.seenpath)
         return self.__the_inprogress_cache
 
-    def _get_path(self, basename_fmt):
+    def _get_path(self, basename_fmt, fetching=False):
+        if self.is_store:
+            path = InstagramStoreDatabase.get_path(
+                    self.user, self.num_shards, fetching,
+            )
+            return Database.resolve_path(path)
+
         basename = basename_fmt.format(self.user)
         path = Database.format_path(InstagramDatabase.PATH, dry_run=False)
         return Database.resolve_path(os.path.join(path, basename))
 
     @property
     def exists(self):
-        return os.path.exists(self.dbpath)
+        return self.__cache.exists
 
     @property
     def dbpath(self):
@@ -90,8 +114,11 @@ class Cache(object):
     def seenpath(self):
         """
         Returns the resolved path of the user's in-progress fetch database file
+
+        Note: fetches track the codes they have seen in the user's cache; this
+        file only exists if a fetch was interrupted before that was the case.
         """
-        return self._get_path('{0}.fetching.db')
+        return self._get_path('{0}.fetching.db', fetching=True)
 
     @property
     def queued_last_id(self):
@@ -106,7 +133,7 @@ class Cache(object):
                 or None if the database does not exist
         """
         private = None
-        if os.path.exists(self.dbpath):
+        if self.__cache.exists:
             private = self.__cache.is_private_account
 
         return private
@@ -120,7 +147,7 @@ class Cache(object):
                 or None if the database does not exist
         """
         bad = None
-        if os.path.exists(self.dbpath):
+        if self.__cache.exists:
             bad = self.__cache.is_flagged_as_bad
 
         return bad
@@ -139,7 +166,7 @@ class Cache(object):
         expired = False
 
         try:
-            cache_mtime = os.path.getmtime(self.dbpath)
+            cache_mtime = self.__cache.mtime
         except OSError as e:
             if e.errno == ENOENT:
                 # no cached media
@@ -170,6 +197,38 @@ class Cache(object):
 
         return expired
 
+    @property
+    def should_reconcile(self):
+        """
+        Returns whether the next fetch should be a full fetch (ie, re-fetch
+                every item and prune the missing ones) rather than an
+                incremental refresh
+        """
+        from .instagram import Instagram
+
+        interval = Instagram._cfg.instagram_reconcile_time
+        if (
+                interval <= 0
+                or not self.__cache.exists
+                # the account may have changed since it was flagged
+                or self.is_private
+                or self.is_bad
+        ):
+            return True
+
+        last_full_fetch = self.__cache.last_full_fetch
+        if not last_full_fetch:
+            return True
+
+        age = time.time() - last_full_fetch
+        reconcile = age > interval
+        if reconcile:
+            logger.id(logger.debug, self,
+                    'Reconciling: last full fetch {time_age} ago',
+                    time_age=age,
+            )
+        return reconcile
+
     def enqueue(self, last_id):
         """
         Enqueues the user so that their in-progress fetch can be continued
@@ -239,64 +298,106 @@ class Cache(object):
 
         This is intended to be called during the fetch.
         """
-        try:
-            self.__cache.insert(item)
-        except UniqueConstraintFailed:
-            self.__cache.update(item)
+        self.insert_many([item])
 
-        try:
-            self.__fetch_cache.insert(item)
-        except UniqueConstraintFailed:
-            # this shouldn't happen
-            logger.id(logger.debug, self,
-                    'Already saw \'{code}\' (was \'{path}\' not deleted?)',
-                    code=item['shortcode'],
-                    path=self.seenpath,
-            )
+    def insert_many(self, items, seen=True):
+        """
+        Inserts (or updates) the given media items into the cache and records
+        them as seen by the in-progress fetch.
+
+        This is intended to be called once per fetched page.
+
+        seen (bool, optional) - whether to record the items as seen. This
+                should be False for incremental refreshes since they do not
+                prune.
+        """
+        self.__cache.upsert(items, mark_seen=seen)
 
     def update(self, item):
         # override the update method since insert has update baked in
         pass
 
-    def finish(self):
+    def flag_as_private(self, *args, **kwargs):
+        from .instagram import Instagram
+
+        self.__cache.flag_as_private(*args, **kwargs)
+        Instagram.invalidate(self.user)
+
+    def flag_as_bad(self, *args, **kwargs):
+        from .instagram import Instagram
+
+        self.__cache.flag_as_bad(*args, **kwargs)
+        Instagram.invalidate(self.user)
+
+    def finish(self, num_requests=None, full=True):
         """
         This method handles the cleanup/conclusion of an in-progress fetch.
+
+        num_requests (int, optional) - the number of requests the fetch made
+        full (bool, optional) - whether the fetch re-fetched every item (False
+                for incremental refreshes)
         """
-        self._prune_missing()
-        self._remove_fetch_cache()
+        from .instagram import Instagram
+
+        if full:
+            self._import_fetch_cache()
+            self._prune_missing()
+        if num_requests is not None:
+            self._record_fetch(num_requests, full)
+        self.__cache.update_ranking()
+        Instagram.invalidate(self.user)
         # remove any queued instagram data for the user, if any
         if self.user in Cache._ig_queue:
             with Cache._ig_queue:
                 Cache._ig_queue.delete(self.user)
 
+    def _record_fetch(self, num_requests, full):
+        """
+        Records the number of requests the fetch made so that the cost of
+        full fetches can be compared with incremental refreshes
+        """
+        mode = (
+                InstagramDatabase.FETCH_FULL if full
+                else InstagramDatabase.FETCH_INCREMENTAL
+        )
+        self.__cache.record_fetch(mode, num_requests)
+
+        # {mode: (#fetches, #requests)}
+        stats = self.__cache.get_fetch_stats()
+        logger.id(logger.debug, self,
+                '{mode} fetch: #{num} request{plural} (all fetches: {stats})',
+                mode=mode,
+                num=num_requests,
+                plural=('' if num_requests == 1 else 's'),
+                stats=stats,
+        )
+
     def _prune_missing(self):
         """
         Removes extraneous elements in the cache that were not seen during
         the most recent fetch.
 
-        This assumes that the fetch database is transient (that is it is
-        only used during and immediately after a single fetch)
+        This assumes that the seen codes are transient (that is they are
+        only recorded during and cleared immediately after a single fetch)
         """
-        if not os.path.exists(self.seenpath):
-            # nothing to prune: the in-progress fetch database doesn't exist
+        num_fetched = self.__cache.num_seen()
+        if not num_fetched:
+            # nothing to prune: no fetch recorded any codes
             return
 
-        cached_codes = self.__cache.get_all_codes()
-        fetched_codes = self.__fetch_cache.get_all_codes()
-        missing = cached_codes - fetched_codes
-
         logger.id(logger.info, self,
                 'Fetched #{num} item{plural}',
-                num=len(fetched_codes),
-                plural=('' if len(fetched_codes) == 1 else 's'),
+                num=num_fetched,
+                plural=('' if num_fetched == 1 else 's'),
         )
 
+        missing = self.__cache.get_unseen_codes()
         if missing:
             logger.id(logger.debug, self,
                     '\ncached:  #{num_cached}'
                     '\nfetched: #{num_fetched}',
-                    num_cached=len(cached_codes),
-                    num_fetched=len(fetched_codes),
+                    num_cached=self.__cache.size(),
+                    num_fetched=num_fetched,
             )
             logger.id(logger.info, self,
                     '#{num} item{plural} missing: pruning ...',
@@ -308,8 +409,28 @@ class Cache(object):
                     color=missing,
             )
 
-            with self.__cache:
-                self.__cache.delete(missing)
+        # always prune to reset the seen codes
+        self.__cache.prune_unseen()
+
+    def _import_fetch_cache(self):
+        """
+        Carries over the codes seen by an in-progress fetch that was recorded
+        in a separate database file (see: seenpath) so that they are not
+        pruned, then removes that file.
+        """
+        if not os.path.exists(self.seenpath) or not self.__fetch_cache.exists:
+            return
+
+        codes = self.__fetch_cache.get_all_codes()
+        logger.id(logger.debug, self,
+                'Importing #{num} seen code{plural} from \'{path}\' ...',
+                num=len(codes),
+                plural=('' if len(codes) == 1 else 's'),
+                path=self.seenpath,
+        )
+        with self.__cache:
+            self.__cache.mark_seen(codes)
+        self._remove_fetch_cache()
 
     def _remove_fetch_cache(self):
         """
@@ -317,21 +438,14 @@ class Cache(object):
         fetch has completed.
         """
         removed = False
-        if os.path.exists(self.seenpath):
-            try:
-                self.__the_inprogress_cache.close()
-            except AttributeError:
-                pass
-            else:
-                self.__the_inprogress_cache = None
-
+        if self.__fetch_cache.exists:
             logger.id(logger.debug, self,
                     'Removing \'{path}\' ...',
                     path=self.seenpath,
             )
 
             try:
-                os.remove(self.seenpath)
+                self.__fetch_cache.remove()
             except (IOError, OSError):
                 logger.id(logger.warn, self,
                         'Could not remove \'{path}\'!',
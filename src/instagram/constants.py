@@ -28,6 +28,8 @@ MEDIA_ENDPOINT = 'https://www.{0}/{{0}}/media'.format(BASE_URL)
 # XXX: the __a=1 endpoint no longer paginates as of March 13, 2018
 META_ENDPOINT = 'https://www.{0}/{{0}}/?__a=1'.format(BASE_URL)
 MEDIA_LINK_FMT = 'https://www.{0}/p/{{0}}'.format(BASE_URL)
+# single media data endpoint
+POST_ENDPOINT = MEDIA_LINK_FMT + '/?__a=1'
 # https://stackoverflow.com/a/49266320
 # https://stackoverflow.com/a/47243409
 # paginated user media data endpoint
@@ -243,3 +245,26 @@ IG_USER_STRING_REGEX = re.compile(
         flags=re.IGNORECASE,
 )
 
+# XXX: the domains are not escaped (like _BASE_URL_PTN) so that this matches
+# every link that the link regexes can
+HAS_IG_DOMAIN_REGEX = re.compile(
+        '|'.join(BASE_URL_VARIATIONS),
+        flags=re.IGNORECASE,
+)
+
+# cheap pre-filter matching a superset of the text that the regexes above (and
+# the parser's single word guesses) can match: text that does not match this
+# cannot contain an instagram username.
+MAY_CONTAIN_IG_USER_REGEX = re.compile(
+        r'(?:{0})|@|\b(?:insta|ig)|^(?:>|[^\S\n])*\S+(?:>|[^\S\n])*$'.format(
+        #  \___/ | \______________/ \________________________________/
+        #    |   |        |                        \
+        #    |   |        |          match a line containing a single word
+        #    |   |        |            (potentially quoted)
+        #    |   |   match the start of an instagram keyword
+        #    | match a potential '@username'
+        #  match any instagram domain
+            HAS_IG_DOMAIN_REGEX.pattern,
+        ),
+        flags=re.IGNORECASE | re.MULTILINE,
+)
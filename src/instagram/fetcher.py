@@ -3,6 +3,7 @@ import multiprocessing
 import os
 import re
 import time
+import zlib
 
 from six import string_types
 
@@ -10,6 +11,7 @@ from .constants import (
         MEDIA_ENDPOINT, # XXX: broken as of Nov 7, 2017 (always 404s)
         META_ENDPOINT, # XXX: pagination broken as of March 13, 2018
         GRAPH_QUERY_ENDPOINT,
+        POST_ENDPOINT,
         RATELIMIT_THRESHOLD,
 )
 from .cache import Cache
@@ -19,6 +21,7 @@ from src.config import (
 )
 from src.database import (
         Database,
+        InstagramFetchLeaseDatabase,
         InstagramRateLimitDatabase,
         UniqueConstraintFailed,
 )
@@ -39,8 +42,17 @@ class Fetcher(object):
     _requestor = None
     _cfg = None
 
-    _manager = multiprocessing.Manager()
-    _in_progress = _manager.dict()
+    # the leases of the users currently being fetched (see: in_progress)
+    _leases = None
+    _LEASE_TTL = parse_time('2m')
+    # notified whenever a fetch lease is released. waiters are split across
+    # the conditions by user so that a release only wakes the waiters on its
+    # stripe (conditions cannot be created per user once processes are
+    # spawned; see: _lease_condition)
+    _NUM_LEASE_CONDITIONS = 16
+    _lease_released = [
+            multiprocessing.Condition() for _ in range(_NUM_LEASE_CONDITIONS)
+    ]
 
     # the lock that prevents multiple processes accidentally issuing requests
     # when the bot is already ratelimited
@@ -58,6 +70,9 @@ class Fetcher(object):
 
     _was_ratelimited = multiprocessing.Value(ctypes.c_bool, False)
 
+    # the number of media requested per page
+    _PAGE_SIZE = 20
+
     _RATELIMIT_RESET_PATH = resolve_path(
             Database.format_path('instagram-ratelimit', dry_run=False)
     )
@@ -91,6 +106,46 @@ class Fetcher(object):
             Fetcher._ratelimit = InstagramRateLimitDatabase(max_age='1h')
         return Fetcher._ratelimit
 
+    @classproperty
+    def leases(cls):
+        if not Fetcher._leases:
+            Fetcher._leases = InstagramFetchLeaseDatabase()
+        return Fetcher._leases
+
+    @staticmethod
+    def is_leased(user):
+        """
+        Returns whether a live process is currently fetching the user
+        """
+        return user in Fetcher.leases
+
+    @staticmethod
+    def _lease_condition(user):
+        """
+        Returns the condition notified when the user's lease is released
+        """
+        # XXX: crc32 instead of hash() since str hashes are randomized
+        key = zlib.crc32(user.lower().encode('utf-8'))
+        return Fetcher._lease_released[key % Fetcher._NUM_LEASE_CONDITIONS]
+
+    @staticmethod
+    def wait_for_lease(user, timeout, killed=None):
+        """
+        Waits until the user's fetch lease is released (or the timeout elapses)
+
+        Returns True if the user is no longer being fetched
+        """
+        condition = Fetcher._lease_condition(user)
+        expire = time.time() + timeout
+        while Fetcher.is_leased(user):
+            time_left = expire - time.time()
+            if time_left <= 0 or (killed and killed.is_set()):
+                return False
+            # wake periodically in case the owner died without releasing
+            with condition:
+                condition.wait(min(time_left, 5))
+        return True
+
     @classproperty
     def requestor(cls):
         from .instagram import Instagram
@@ -370,9 +425,11 @@ class Fetcher(object):
                 )
 
     @staticmethod
-    def _handle_too_many_requests(response):
+    def _handle_too_many_requests(response, sent):
         """
         Handles 429 Too Many Requests response
+
+        sent (float) - the time that the request was issued
         """
         if response.status_code == 429:
             logger.id(logger.info, Fetcher.ME,
@@ -420,6 +477,13 @@ class Fetcher(object):
                 Fetcher._log_ratelimit()
                 Fetcher._record_ratelimit_reset()
 
+            elif sent < Fetcher._429_timestamp.value:
+                # the request was already in flight when the bot was
+                # ratelimited (eg. by another fetch worker's request)
+                logger.id(logger.debug, Fetcher.ME,
+                        'In-flight request ratelimited',
+                )
+
             else:
                 try:
                     Fetcher._multi_429_count += 1
@@ -450,19 +514,8 @@ class Fetcher(object):
     @staticmethod
     def request(url, *args, **kwargs):
         """
-        Inter-process request handling. See _request() documentation.
-        * This method should be used to issue requests, NOT _request().
-        """
-        # serialize instagram requests so that multiple processes do not
-        # issue requests after the bot has been ratelimited
-        with Fetcher._request_lock:
-            return Fetcher._request(url, *args, **kwargs)
-
-    @staticmethod
-    def _request(url, *args, **kwargs):
-        """
-        request call wrapper
-        *Note: this method should only be called by the request() method.
+        Inter-process request handling. This method should be used to issue
+        instagram requests.
 
         *args, **kwargs are passed to the request call
 
@@ -473,13 +526,19 @@ class Fetcher(object):
                 or False if the bot is instagram ratelimited or requests are
                     still delayed due to a 500-level status code
         """
-        if (
-                # the bot is ratelimited
-                Fetcher._handle_rate_limit()
-                # or requests are still delayed
-                or time.time() < Fetcher.request_delay_expire
-        ):
-            return False
+        # XXX: the lock only guards the shared ratelimit/delay state, not the
+        # request itself, so that the fetch workers' requests run
+        # concurrently. no process issues a request once the bot is known to
+        # be ratelimited (requests already in flight may still come back 429).
+        with Fetcher._request_lock:
+            if (
+                    # the bot is ratelimited
+                    Fetcher._handle_rate_limit()
+                    # or requests are still delayed
+                    or time.time() < Fetcher.request_delay_expire
+            ):
+                return False
+            sent = time.time()
 
         response = Fetcher.requestor.request(url, *args, **kwargs)
 
@@ -490,6 +549,18 @@ class Fetcher(object):
         # account the ratelimit hit
         # Fetcher.account_ratelimit(response)
 
+        with Fetcher._request_lock:
+            Fetcher._handle_response(response, sent)
+        return response
+
+    @staticmethod
+    def _handle_response(response, sent):
+        """
+        Updates the shared ratelimit/delay state from a response
+        *Note: this method should only be called by the request() method.
+
+        sent (float) - the time that the request was issued
+        """
         if response is not None:
             if Fetcher.has_server_issue(response):
                 # instagram is experiencing server issues
@@ -511,7 +582,7 @@ class Fetcher(object):
                 )
 
             if response.status_code == 429: # too many requests
-                Fetcher._handle_too_many_requests(response)
+                Fetcher._handle_too_many_requests(response, sent)
 
             elif Fetcher.request_delay_expire > 0:
                 # instagram's server issues cleared up
@@ -526,8 +597,6 @@ class Fetcher(object):
                 Fetcher._500_timestamp.value = 0
                 Fetcher._500_delay.value = 0
 
-        return response
-
     # ##################################################################
 
     def __init__(self, user, killed=None):
@@ -538,6 +607,13 @@ class Fetcher(object):
         self.user_id = None
         self._fetch_started = False
         self._valid_response = True
+        # the number of requests made for the user (see: Cache.finish)
+        self.num_requests = 0
+        # whether only the media newer than the cached media is fetched
+        self.is_incremental = False
+        self._known_codes = set()
+        self._new_items = []
+        self._num_parsed = 0
 
         self._exists = None
         self._private = None
@@ -662,11 +738,43 @@ class Fetcher(object):
         return was_killed
 
     def _enqueue(self):
-        if self._fetch_started:
+        # incremental refreshes are cheap enough to simply restart
+        if self._fetch_started and not self.is_incremental:
             self.cache.enqueue(self.last_id)
 
+    def _user_request(self, url, *args, **kwargs):
+        """
+        Fetcher.request wrapper which counts the requests made for the user
+        """
+        response = Fetcher.request(url, *args, **kwargs)
+        if response is not False:
+            # False => no request was made
+            self.num_requests += 1
+        return response
+
+    def _renew_lease(self, ttl=0):
+        """
+        Acquires or extends this process's lease on the user for at least
+        ttl + _LEASE_TTL seconds
+
+        Returns True if this process holds the lease
+        """
+        return Fetcher.leases.acquire(
+                self.user, os.getpid(), ttl + Fetcher._LEASE_TTL,
+        )
+
+    def _release_lease(self):
+        if self._fetch_started:
+            Fetcher.leases.release(self.user, os.getpid())
+            condition = Fetcher._lease_condition(self.user)
+            with condition:
+                condition.notify_all()
+
     def _wait(self, delay):
         if delay > 0:
+            if self._fetch_started:
+                # don't let the lease expire while waiting
+                self._renew_lease(delay)
             if hasattr(self.killed, 'wait'):
                 do_wait = self.killed.wait
             else:
@@ -763,13 +871,15 @@ class Fetcher(object):
         if nodes:
             self.last_id = nodes[-1]['node']['id']
 
+            if self.is_incremental:
+                return self._parse_incremental_data(data, nodes)
+
             with self.cache:
-                for item in nodes:
-                    self.cache.insert(item['node'])
+                self.cache.insert_many(item['node'] for item in nodes)
 
             if not self._has_more(data):
                 # just parsed the last set of items
-                self.cache.finish()
+                self.cache.finish(self.num_requests)
                 success = True
 
         else:
@@ -778,6 +888,144 @@ class Fetcher(object):
 
         return success
 
+    def _parse_incremental_data(self, data, nodes):
+        """
+        Buffers the media in a single iteration of the user's data that is
+        newer than the cached media (see: _finish_incremental)
+
+        Returns True once the cached media has been reached
+                or None if there are still more items to be processed
+        """
+        new_items = []
+        known_items = []
+        for item in nodes:
+            if item['node']['shortcode'] in self._known_codes:
+                known_items.append(item['node'])
+            else:
+                new_items.append(item['node'])
+        self._new_items.extend(new_items)
+        self._num_parsed += len(nodes)
+
+        if not known_items and self._has_more(data):
+            return None
+
+        logger.id(logger.debug, self,
+                'Caught up to cached media: #{num} new item{plural}',
+                num=len(self._new_items),
+                plural=('' if len(self._new_items) == 1 else 's'),
+        )
+        if self._has_more(data) and self._is_full_fetch_cheaper():
+            logger.id(logger.debug, self,
+                    'Switching to a full fetch (cheaper than refreshing)',
+            )
+            self.is_incremental = False
+            # every previous page was new
+            with self.cache:
+                self.cache.insert_many(self._new_items + known_items)
+            return None
+        return True
+
+    def _is_full_fetch_cheaper(self):
+        """
+        Returns whether fetching the user's remaining pages would take no more
+        requests than refreshing their top media (eg. users with few posts)
+        """
+        if not isinstance(self._num_posts, int):
+            return False
+
+        num_remaining = max(0, self._num_posts - self._num_parsed)
+        num_pages = -(-num_remaining // Fetcher._PAGE_SIZE) # ceil
+        num_refresh = min(Fetcher._cfg.refresh_top_k, len(self._known_codes))
+        return num_pages <= num_refresh
+
+    def _refresh_top_media(self, skip_codes):
+        """
+        Re-fetches the user's most popular cached media so that their like and
+        comment counts stay current
+
+        skip_codes (set) - the codes that do not need to be re-fetched
+
+        Returns (items, deleted_codes) if every item was re-fetched
+                or None if the refresh was interrupted
+        """
+        codes = [
+                code for code in self.cache.get_top_codes(
+                    Fetcher._cfg.refresh_top_k
+                )
+                if code not in skip_codes
+        ]
+        logger.id(logger.debug, self,
+                'Refreshing #{num} top item{plural} ...',
+                num=len(codes),
+                plural=('' if len(codes) == 1 else 's'),
+        )
+
+        items = []
+        deleted = []
+        for code in codes:
+            if self._killed or not self._renew_lease():
+                return None
+
+            response = self._user_request(POST_ENDPOINT.format(code))
+            if (
+                    Fetcher._is_bad_response(response)
+                    or response.status_code == 429
+            ):
+                return None
+
+            if response.status_code == 404:
+                # the post was removed
+                deleted.append(code)
+
+            elif response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError:
+                    logger.id(logger.debug, self,
+                            'Bad json refreshing \'{code}\'!',
+                            code=code,
+                            exc_info=True,
+                    )
+                    return None
+                items.append(data['graphql']['shortcode_media'])
+
+            elif response.status_code // 100 == 4:
+                response.raise_for_status()
+
+        return items, deleted
+
+    def _finish_incremental(self):
+        """
+        Stores the new media found by an incremental refresh along with the
+        refreshed top media. Nothing is stored if the refresh is interrupted
+        so that the cache stays expired.
+
+        Returns True if the cache was refreshed
+                or None if the refresh was interrupted
+        """
+        new_codes = set(item['shortcode'] for item in self._new_items)
+        refreshed = self._refresh_top_media(new_codes)
+        if refreshed is None:
+            logger.id(logger.debug, self, 'Incremental refresh interrupted!')
+            return None
+
+        items, deleted = refreshed
+        with self.cache:
+            # XXX: incremental refreshes do not prune
+            self.cache.insert_many(self._new_items + items, seen=False)
+            if deleted:
+                self.cache.delete(deleted)
+        if deleted:
+            logger.id(logger.info, self,
+                    '#{num} top item{plural} removed:\n\n{color}\n\n',
+                    num=len(deleted),
+                    plural=('' if len(deleted) == 1 else 's'),
+                    color=deleted,
+            )
+
+        self.cache.finish(self.num_requests, full=False)
+        return True
+
     @property
     def should_fetch(self):
         """
@@ -795,7 +1043,7 @@ class Fetcher(object):
         Returns True if the user is currently being fetched (either by this
         process or another process)
         """
-        return self.user in Fetcher._in_progress
+        return Fetcher.is_leased(self.user)
 
     def _parse_meta_data(self, data):
         """
@@ -937,7 +1185,7 @@ class Fetcher(object):
 
         data = None
         while not data and not self._killed:
-            response = Fetcher.request(META_ENDPOINT.format(self.user))
+            response = self._user_request(META_ENDPOINT.format(self.user))
             if Fetcher._is_bad_response(response):
                 # wait out the delay
                 request_delay = Fetcher.request_delay
@@ -1007,8 +1255,17 @@ class Fetcher(object):
         success = None
         data = None
         self.last_id = self.cache.queued_last_id
+        # resumed fetches are always full fetches
+        self.is_incremental = (
+                not self.last_id and not self.cache.should_reconcile
+        )
+        if self.is_incremental:
+            self._known_codes = self.cache.get_all_codes()
 
-        msg = ['Fetching data']
+        msg = [
+                'Refreshing data' if self.is_incremental
+                else 'Fetching data'
+        ]
         if self.last_id:
             msg.append('(starting @ {last_id})')
         msg.append('...')
@@ -1049,7 +1306,7 @@ class Fetcher(object):
                                 '{0}\'s user_id never set!'.format(self.user)
                         )
 
-                response = Fetcher.request(
+                response = self._user_request(
                         GRAPH_QUERY_ENDPOINT,
                         params={
                             # XXX: static magic number (no idea how this
@@ -1067,7 +1324,8 @@ class Fetcher(object):
                             # 'query_hash': '472f257a40c653c64c666ce877d59d2b',
 
                             'id': self.user_id,
-                            'first': 20, # number of media to request
+                            # number of media to request
+                            'first': Fetcher._PAGE_SIZE,
                             'after': self.last_id,
                         },
                 )
@@ -1075,10 +1333,18 @@ class Fetcher(object):
                     self._enqueue()
                     break
 
+                # (re-)acquiring the lease once per page doubles as its
+                # heartbeat
+                if not self._renew_lease():
+                    logger.id(logger.info, self,
+                            'Already being fetched (pid={pid}): halting ...',
+                            pid=Fetcher.leases.get_owner(self.user),
+                    )
+                    break
+
                 # seeing one actual response indicates that the fetch has
                 # started in earnest
                 self._fetch_started = True
-                Fetcher._in_progress[self.user] = True
 
                 if response.status_code == 200:
                     self._exists = True
@@ -1099,8 +1365,9 @@ class Fetcher(object):
 
                         # XXX: not an 'elif' in case _parse_data changed the
                         # success value.
-                        if success is False:
+                        if success is not None:
                             # private/non-user page/not enough followers
+                            # or an incremental refresh reached cached media
                             break
 
                 elif response.status_code == 404:
@@ -1117,6 +1384,9 @@ class Fetcher(object):
                     self._enqueue()
                     response.raise_for_status()
 
+            if success and self.is_incremental:
+                success = self._finish_incremental()
+
         except (KeyError, TypeError):
             if data:
                 logger.id(logger.debug, self,
@@ -1132,10 +1402,8 @@ class Fetcher(object):
             self._enqueue()
             raise
 
-        try:
-            del Fetcher._in_progress[self.user]
-        except KeyError:
-            pass
+        finally:
+            self._release_lease()
 
         if success is None:
             self._valid_response = False
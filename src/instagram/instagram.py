@@ -1,4 +1,4 @@
-import os
+import time
 
 from .constants import BASE_URL
 from .cache import Cache
@@ -6,6 +6,7 @@ from .fetcher import Fetcher
 from constants import EMAIL
 from src.util import logger
 from src.util.decorators import classproperty
+from src.util.lru import LRUCache
 from src.util.version import get_version
 
 
@@ -39,6 +40,38 @@ class Instagram(object):
 
     _cfg = None
     _useragent = None
+    _lru = None
+
+    @classproperty
+    def lru(cls):
+        """
+        Process-wide in-memory cache of looked-up user data (top media,
+        private/bad flags and profile meta data)
+
+        Entries are keyed by user so that a user's data can be dropped
+        directly (see: invalidate); each holds the user's cache mtime and a
+        dictionary of the remembered values.
+        """
+        if Instagram._lru is None:
+            size = Instagram._cfg.top_media_cache_size if Instagram._cfg else 0
+            Instagram._lru = LRUCache(size)
+        return Instagram._lru
+
+    @classproperty
+    def lru_stats(cls):
+        """
+        Returns the in-memory cache's hit/miss counters (see LRUCache.stats)
+        """
+        return Instagram.lru.stats
+
+    @staticmethod
+    def invalidate(user):
+        """
+        Drops the user's looked-up data from this process' in-memory cache.
+        This should be called whenever the user's cache is written to.
+        """
+        if Instagram._lru is not None:
+            Instagram._lru.pop(user.lower())
 
     @classproperty
     def request_delay_expire(cls):
@@ -60,9 +93,34 @@ class Instagram(object):
     def is_ratelimited(cls):
         return Fetcher.is_ratelimited
 
-    def __init__(self, user, killed=None):
+    @staticmethod
+    def is_fetching(user):
+        """
+        Returns whether some process is currently fetching the user
+        """
+        return Fetcher.is_leased(user)
+
+    @staticmethod
+    def wait_for_fetch(user, timeout, killed=None):
+        """
+        Blocks until the user's in-progress fetch finishes (or the timeout
+        elapses)
+
+        Returns True if the user is no longer being fetched
+        """
+        return Fetcher.wait_for_lease(user, timeout, killed)
+
+    def __init__(self, user, killed=None, priority=None):
+        """
+        user (str) - the instagram username
+        killed (multiprocessing.Event, optional) - flag to interrupt fetches
+        priority (int, optional) - the FetchScheduler.PRIORITY_* to queue the
+                    user's fetch with if the fetch workers are enabled
+                Default: None => fetch in the calling process
+        """
         # all instagram usernames are lowercase
         self.user = user.lower()
+        self.priority = priority
         self.cache = Cache(self.user)
         self.fetcher = Fetcher(self.user, killed=killed)
 
@@ -91,7 +149,9 @@ class Instagram(object):
             return self.__getattribute__(attr)
         except AttributeError:
             if attr in Fetcher._EXPOSE_PROPS:
-                return getattr(self.fetcher, attr)
+                return self._remember(
+                        attr, lambda: getattr(self.fetcher, attr),
+                )
             else:
                 raise
 
@@ -101,11 +161,57 @@ class Instagram(object):
 
     @property
     def is_private(self):
-        return self.cache.is_private
+        return self._remember('is_private', lambda: self.cache.is_private)
 
     @property
     def is_bad(self):
-        return self.cache.is_bad
+        return self._remember('is_bad', lambda: self.cache.is_bad)
+
+    def _lru_values(self):
+        """
+        Returns the dictionary of the user's values remembered in memory
+                or None if the user's cache should not be served from memory
+                    (ie, it does not exist or is expired)
+
+        The remembered values are dropped if the cache's mtime changed so that
+        writes made by other processes are never served stale.
+        """
+        try:
+            mtime = self.cache.mtime
+        except OSError:
+            return None
+
+        if time.time() - mtime > Instagram._cfg.instagram_cache_expire_time:
+            return None
+
+        lru = Instagram.lru
+        entry = lru.get(self.user, count=False)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, {})
+            lru.set(self.user, entry)
+        return entry[1]
+
+    def _remember(self, name, lookup):
+        """
+        Returns the user's named value from the in-memory cache, calling
+        lookup() to determine it on a miss.
+
+        None (unknown/retry) values are never remembered.
+        """
+        values = self._lru_values()
+        if values is not None:
+            value = values.get(name)
+            Instagram.lru.count_lookup(value is not None)
+            if value is not None:
+                return value
+
+        value = lookup()
+        if value is not None:
+            # the lookup may have fetched (ie, modified the cache)
+            values = self._lru_values()
+            if values is not None:
+                values[name] = value
+        return value
 
     @property
     def non_highlighted_media(self):
@@ -121,9 +227,12 @@ class Instagram(object):
         try:
             media = self.__cached_non_highlighted_media
         except AttributeError:
-            media = self._fetch_or_lookup_media(
-                    num_highlights=-1,
-                    start=Instagram._cfg.num_highlights_per_ig_user,
+            media = self._remember(
+                    'non_highlighted_media',
+                    lambda: self._fetch_or_lookup_media(
+                        num_highlights=-1,
+                        start=Instagram._cfg.num_highlights_per_ig_user,
+                    ),
             )
             self.__cached_non_highlighted_media = media
 
@@ -133,18 +242,20 @@ class Instagram(object):
     def top_media(self):
         """
         Returns a list of the user's most popular media
-                or None if the fetch was interrupted/should be retried
+                or None if the fetch was interrupted/should be retried (or
+                    was queued for a fetch worker)
                 or False if the user's profile does not exist, is not a
                     valid user page (eg. /about), or the user has too few
                     followers
                 or True if the user's profile is private
 
-        Note: the return value is cached in memory.
+        Note: the return value is cached in memory (and in the process-wide
+        cache until the user's database changes or expires).
         """
         try:
             media = self.__cached_top_media
         except AttributeError:
-            media = self._fetch_or_lookup_media()
+            media = self._remember('top_media', self._fetch_or_lookup_media)
             # XXX: even the retry/resume value is cached so the expectation
             # is that Instagram instances are not long-lived
             # ie: retry/resume should happen through new instances
@@ -166,6 +277,9 @@ class Instagram(object):
         media = None
 
         if self.fetcher.should_fetch:
+            if self._defer_fetch():
+                return None
+
             media = self.fetcher.fetch_data()
             if media:
                 # fetch succeeded; reset the media value
@@ -189,6 +303,9 @@ class Instagram(object):
                 logger.id(logger.debug, self,
                         'Fetching outdated cache ...',
                 )
+                if self._defer_fetch():
+                    return None
+
                 media = self.fetcher.fetch_data()
                 if media:
                     # fetch succeeded; reset the media value
@@ -205,6 +322,21 @@ class Instagram(object):
 
         return media
 
+    def _defer_fetch(self):
+        """
+        Queues the user to be fetched by a fetch worker if the workers are
+        enabled and this instance was given a priority.
+
+        Returns True if the fetch was queued (ie, it should not happen in this
+                process)
+        """
+        from .scheduler import FetchScheduler
+
+        if self.priority is not None and FetchScheduler.is_enabled:
+            FetchScheduler.enqueue(self.user, self.priority)
+            return True
+        return False
+
     def _lookup_top_media(self, num_highlights=None, start=0):
         """
         Retreives the top N media for the user from the cache
@@ -242,9 +374,8 @@ class Instagram(object):
                         'Removing \'{path}\': empty database',
                         path=self.cache.dbpath,
                 )
-                self.cache.close()
                 try:
-                    os.remove(self.cache.dbpath)
+                    self.cache.remove()
 
                 except OSError:
                     logger.id(logger.warn, self,
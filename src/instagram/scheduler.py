@@ -0,0 +1,239 @@
+import ctypes
+import multiprocessing
+import time
+
+from .fetcher import Fetcher
+from src.database import InstagramFetchQueueDatabase
+from src.mixins.proc import ProcessMixin
+from src.util import logger
+from src.util.decorators import classproperty
+
+
+class FetchScheduler(object):
+    """
+    Inter-process instagram fetch scheduling.
+
+    Processes that need a user's data enqueue the user instead of fetching it
+    themselves; the FetchWorker processes fetch queued users in priority order
+    and notify any waiters once a user's cache is ready.
+    """
+
+    # lower values are fetched first
+    PRIORITY_REPLY = 0
+    PRIORITY_SUBMIT = 10
+
+    _queue = None
+
+    # notified whenever a user is enqueued
+    _pending = multiprocessing.Condition()
+    # notified whenever a worker finishes with a user
+    _ready = multiprocessing.Condition()
+
+    # the minimum number of seconds between reap_leases() sweeps
+    REAP_INTERVAL = 5 * 60
+    _last_reap = multiprocessing.Value(ctypes.c_double, 0.0)
+
+    @classproperty
+    def queue(cls):
+        if not FetchScheduler._queue:
+            FetchScheduler._queue = InstagramFetchQueueDatabase()
+        return FetchScheduler._queue
+
+    @classproperty
+    def is_enabled(cls):
+        """
+        Returns whether fetches are deferred to the fetch workers
+        """
+        from .instagram import Instagram
+
+        return bool(Instagram._cfg and Instagram._cfg.fetch_workers > 0)
+
+    @staticmethod
+    def enqueue(user, priority):
+        """
+        Queues the user to be fetched by a worker
+        """
+        user = user.lower()
+        if user not in FetchScheduler.queue:
+            logger.id(logger.debug, __name__,
+                    'Queueing {color_user} for fetch (priority={priority})'
+                    ' ...',
+                    color_user=user,
+                    priority=priority,
+            )
+        with FetchScheduler.queue:
+            FetchScheduler.queue.insert(user, priority)
+
+        with FetchScheduler._pending:
+            FetchScheduler._pending.notify_all()
+
+    @staticmethod
+    def is_pending(user):
+        """
+        Returns whether the user is queued or being fetched
+        """
+        return user.lower() in FetchScheduler.queue
+
+    @staticmethod
+    def wait_for(user, timeout, killed=None):
+        """
+        Waits until the user's fetch finishes (or the timeout elapses)
+
+        Returns True if the user is no longer pending
+        """
+        expire = time.time() + timeout
+        while FetchScheduler.is_pending(user):
+            time_left = expire - time.time()
+            if time_left <= 0 or (killed and killed.is_set()):
+                return False
+            # wake periodically in case the notification was missed
+            FetchScheduler.wait_ready(min(time_left, 5))
+        return True
+
+    @staticmethod
+    def wait_ready(timeout):
+        """
+        Blocks until any worker finishes with a user (or the timeout elapses)
+        """
+        with FetchScheduler._ready:
+            FetchScheduler._ready.wait(timeout)
+
+    @staticmethod
+    def reap_leases():
+        """
+        Removes the fetch leases left behind by crashed or killed fetches (at
+        most once every REAP_INTERVAL seconds). A stale lease is otherwise
+        only reclaimed when its user is fetched again.
+
+        Returns the number of leases removed
+        """
+        with FetchScheduler._last_reap.get_lock():
+            now = time.time()
+            elapsed = now - FetchScheduler._last_reap.value
+            if elapsed < FetchScheduler.REAP_INTERVAL:
+                return 0
+            FetchScheduler._last_reap.value = now
+
+        num_reaped = Fetcher.leases.reap()
+        if num_reaped:
+            logger.id(logger.debug, __name__,
+                    'Removed #{num} stale fetch lease{plural}',
+                    num=num_reaped,
+                    plural=('' if num_reaped == 1 else 's'),
+            )
+        return num_reaped
+
+    @staticmethod
+    def _notify_ready():
+        with FetchScheduler._ready:
+            FetchScheduler._ready.notify_all()
+
+    @staticmethod
+    def _wait_pending(timeout):
+        with FetchScheduler._pending:
+            FetchScheduler._pending.wait(timeout)
+
+
+class FetchWorker(ProcessMixin):
+    """
+    Instagram fetch worker process. fetch_workers of these run concurrently,
+    each fetching one queued user at a time.
+
+    Note: the workers' requests are concurrent; Fetcher.request only
+    serializes the checks of the shared 429/5xx delays so that no worker
+    issues a request once the bot is known to be ratelimited.
+    """
+
+    # XXX: short so that kill()s are noticed promptly while idle
+    IDLE_DELAY = 1
+    RETRY_DELAY = 5
+
+    def __init__(self, cfg, worker_id):
+        ProcessMixin.__init__(self)
+        self.cfg = cfg
+        self.worker_id = worker_id
+
+    def __str__(self):
+        return '{0}.{1}'.format(ProcessMixin.__str__(self), self.worker_id)
+
+    @property
+    def _pid_name(self):
+        return '{0}.{1}'.format(self.__class__.__name__, self.worker_id)
+
+    def _wait_for_delay(self):
+        """
+        Waits out any instagram ratelimit or server-issue delay
+
+        Returns True if a wait occurred
+        """
+        delay = max(Fetcher.ratelimit_delay, Fetcher.request_delay)
+        if delay > 0:
+            logger.id(logger.debug, self,
+                    'Waiting out fetch delay: {time} ...',
+                    time=delay,
+            )
+            self._killed.wait(delay)
+            return True
+        return False
+
+    def _fetch(self, user):
+        """
+        Fetches the user's data
+
+        Returns True if the user is done (fetched or not fetchable)
+                or False if the fetch was interrupted and should be retried
+        """
+        from .instagram import Instagram
+
+        logger.id(logger.debug, self,
+                'Fetching {color_user} ...',
+                color_user=user,
+        )
+        start = time.time()
+        # XXX: no priority => fetch in this process
+        ig = Instagram(user, self._killed)
+        media = ig.top_media
+        logger.id(logger.debug, self,
+                'Finished {color_user} in {time}',
+                color_user=user,
+                time=time.time() - start,
+        )
+        return media is not None
+
+    def _run_forever(self):
+        queue = FetchScheduler.queue
+        # return any user claimed before a previous shutdown
+        queue.release(self.worker_id)
+
+        while not self._killed.is_set():
+            if self._wait_for_delay():
+                continue
+
+            user = queue.claim(self.worker_id)
+            if not user:
+                FetchScheduler._wait_pending(FetchWorker.IDLE_DELAY)
+                continue
+
+            try:
+                done = self._fetch(user)
+            except Exception:
+                logger.id(logger.exception, self,
+                        'Failed to fetch {color_user}!',
+                        color_user=user,
+                )
+                done = True
+
+            if done:
+                with queue:
+                    queue.delete(user)
+            else:
+                # retry once the delay (if any) is over
+                queue.release(self.worker_id, user)
+                self._killed.wait(FetchWorker.RETRY_DELAY)
+            FetchScheduler._notify_ready()
+
+
+__all__ = [
+        'FetchScheduler',
+        'FetchWorker',
+]
@@ -35,7 +35,9 @@ class Mentions(ProcessMixin, StreamMixin):
         Returns True if the bot is banned from the submission's subreddit
                 or has the submission's subreddit blacklisted
         """
-        banned = reddit.is_banned_from(submission)
+        banned = reddit.is_banned_from(
+                submission, self.cfg.subreddit_ban_cache_time,
+        )
         blacklisted = False
 
         display_name = submission.subreddit.display_name
@@ -185,10 +187,14 @@ class Mentions(ProcessMixin, StreamMixin):
         )
 
         mentions_db = database.MentionsDatabase()
-        delay = 60 # too long?
         first_run = True
 
         while not self._killed.is_set():
+            if not self._can_poll():
+                self._killed.wait(self._poll_delay(0))
+                continue
+
+            num_new = 0
             for mention in self.stream:
                 if mention is None or self._killed.is_set():
                     break
@@ -220,9 +226,10 @@ class Mentions(ProcessMixin, StreamMixin):
                     break
 
                 self._process_mention(mention)
+                num_new += 1
 
             first_run = False
-            self._killed.wait(delay)
+            self._killed.wait(self._poll_delay(num_new))
 
         if self._killed.is_set():
             logger.id(logger.debug, self, 'Killed!')
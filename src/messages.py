@@ -201,15 +201,19 @@ class Messages(ProcessMixin, StreamMixin):
         seen_from_robots = set()
         robots = bottiquette.RobotsTxt(self._reddit)
         messages_db = database.MessagesDatabase()
-        # XXX: a manual delay is used instead of relying on praw's stream
-        # delay so that external shutdown events can be received in a timely
-        # fashion.
-        delay = 60 # too long?
+        # XXX: a manual delay (see: _poll_delay) is used instead of relying on
+        # praw's stream delay so that external shutdown events can be received
+        # in a timely fashion.
         # check all items on the first run since stream_generator will fetch
         # the first 100 newest items (all of which may or may not be duplicates)
         first_run = True
 
         while not self._killed.is_set():
+            if not self._can_poll():
+                self._killed.wait(self._poll_delay(0))
+                continue
+
+            num_new = 0
             # add new banned subreddits from r/bottiquette:
             # https://www.reddit.com/r/Bottiquette/wiki/robots_txt_json
             # XXX: this list has not been updated for over 1 year as of
@@ -273,6 +277,8 @@ class Messages(ProcessMixin, StreamMixin):
                     )
                     break
 
+                num_new += 1
+
                 # ignore comments, though I don't think it is possible that
                 # any message in the messages() inbox can be a comment.
                 if message.was_comment:
@@ -350,7 +356,7 @@ class Messages(ProcessMixin, StreamMixin):
 
             # flag that duplicate items should now break out of the stream
             first_run = False
-            self._killed.wait(delay)
+            self._killed.wait(self._poll_delay(num_new))
 
         if self._killed.is_set():
             logger.id(logger.debug, self, 'Killed!')
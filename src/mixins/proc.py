@@ -74,6 +74,13 @@ class RunForeverMixin(object):
     exceptions and exit.
     """
 
+    @property
+    def _pid_name(self):
+        """
+        The name of the process's pid file
+        """
+        return self.__class__.__name__
+
     @abc.abstractmethod
     def _run_forever(self):
         """
@@ -88,7 +95,7 @@ class RunForeverMixin(object):
         # ensure there is only one instance of this class running across the
         # system
         # TODO? move to a separate mixin? (pid stuff may not belong here)
-        pid_file = get_pid_file(self.__class__.__name__)
+        pid_file = get_pid_file(self._pid_name)
         if pid_file:
             pid = None
             try:
@@ -111,7 +118,7 @@ class RunForeverMixin(object):
             )
             return
 
-        pid_file = write_pid(self.__class__.__name__)
+        pid_file = write_pid(self._pid_name)
 
         logger.id(logger.info, self, 'Starting run_forever ...')
         try:
@@ -3,6 +3,7 @@ from errno import ECONNRESET
 import time
 
 from six import add_metaclass
+from six.moves.queue import Empty
 from prawcore.exceptions import (
         BadJSON,
         NotFound,
@@ -27,6 +28,10 @@ class StreamMixin(RedditInstanceMixin):
     Provides Reddit.stream_generator fetching through the .stream property.
     This mixin handles delaying the next fetch when either a RequestException or
     ServerError is thrown (internet hiccup, reddit down).
+
+    Loops which poll the stream on their own schedule can use _poll_delay to
+    adapt it to the stream's activity and _can_poll to account for the polls
+    against the shared request budget.
     """
 
     _RETRYABLE = (
@@ -34,6 +39,10 @@ class StreamMixin(RedditInstanceMixin):
             RequestException,
     )
 
+    # the fraction of the shared request budget that polls leave for replies
+    # (see: reddit.spend_requests)
+    POLL_RESERVE = 0.25
+
     @property
     def _stream_method(self):
         """
@@ -64,8 +73,72 @@ class StreamMixin(RedditInstanceMixin):
     def _pause_after(self):
         """
         This is passed to pause_after argument of stream_generator
+
+        -1 => None after every response so that each poll (see: _can_poll)
+        makes exactly one request. (0 makes another request right away
+        whenever a response had new items.)
+        """
+        return -1
+
+    def _can_poll(self, num_requests=1):
+        """
+        Returns True if num_requests were spent from the shared request budget
+                or False if too little of the budget is left for replies
+
+        A poll is always allowed (overdrawing the budget if necessary) once
+        poll_max_interval seconds have passed since the last one so that the
+        loop is never starved by the other spenders.
+        """
+        now = time.time()
+        try:
+            overdue = now - self.__last_poll >= self.cfg.poll_max_interval
+        except AttributeError:
+            # first poll
+            overdue = True
+
+        reserve = 0 if overdue else StreamMixin.POLL_RESERVE
+        if reddit.spend_requests(num_requests, reserve):
+            self.__last_poll = now
+            return True
+
+        logger.id(logger.debug, self,
+                'Skipping poll: the request budget is low',
+        )
+        return False
+
+    def _poll_delay(self, num_new):
         """
-        return 0
+        Returns the number of seconds to wait before the next poll. The delay
+        is halved when the last poll found something new and doubled when it
+        did not, bounded by poll_min_interval and poll_max_interval.
+
+        num_new (int) - the number of new items found by the last poll (0 if
+                the poll was skipped)
+        """
+        try:
+            delay = self.__poll_delay
+        except AttributeError:
+            delay = self.cfg.poll_min_interval
+
+        if num_new > 0:
+            delay /= 2.0
+        else:
+            delay *= 2.0
+        delay = min(
+                max(delay, self.cfg.poll_min_interval),
+                self.cfg.poll_max_interval,
+        )
+        self.__poll_delay = delay
+        try:
+            # don't sleep past the poll forced by _can_poll
+            time_left = (
+                    self.__last_poll + self.cfg.poll_max_interval - time.time()
+            )
+        except AttributeError:
+            pass
+        else:
+            delay = min(delay, max(0, time_left))
+        return delay
 
     def __sleep(self, delay):
         if self.__is_alive:
@@ -187,7 +260,23 @@ class _SubredditsStreamMixin(StreamMixin):
 
     @abc.abstractproperty
     def _stream_type(self):
-        """ Returns the stream type string: 'comments' or 'submissions' """
+        """
+        Returns the stream type string: 'comments' or 'submissions' (or
+        'things' for both)
+        """
+
+    def _create_stream(self, subreddits):
+        """
+        Returns the stream generator of the set of subreddits' things
+        """
+        subreddits_str = reddit.pack_subreddits(subreddits)
+        logger.id(logger.debug, self,
+                'subreddit string:\n\t{subreddits_str}',
+                subreddits_str=subreddits_str,
+        )
+        subreddits_obj = self._reddit.subreddit(subreddits_str)
+        stream_func = getattr(subreddits_obj.stream, self._stream_type)
+        return stream_func(pause_after=self._pause_after)
 
     @property
     def _stream(self):
@@ -272,19 +361,8 @@ class _SubredditsStreamMixin(StreamMixin):
                             )
                         subs_from_db.add(self._reddit.profile_sub_name)
 
-                    subreddits_str = reddit.pack_subreddits(subs_from_db)
-                    logger.id(logger.debug, self,
-                            'subreddit string:\n\t{subreddits_str}',
-                            subreddits_str=subreddits_str,
-                    )
-                    if subreddits_str:
-                        subreddits_obj = self._reddit.subreddit(
-                                subreddits_str
-                        )
-                        stream_func = getattr(
-                                subreddits_obj.stream, self._stream_type
-                        )
-                        the_stream = stream_func(pause_after=self._pause_after)
+                    if subs_from_db:
+                        the_stream = self._create_stream(subs_from_db)
                         self._cached_stream = the_stream
                         self.__current_subreddits = subs_from_db
 
@@ -325,26 +403,236 @@ class _SubredditsStreamMixin(StreamMixin):
             if re.search(r'/subreddits/search', e.args[0]):
                 self._handle_stream_err(e)
 
-class SubredditsCommentStreamMixin(_SubredditsStreamMixin):
+class StreamShard(object):
+    """
+    A subset of the streamed subreddits whose comment and submission listings
+    are polled together on the shard's own interval. The interval adapts to
+    the shard's observed rate of new things so that busy shards are polled
+    before their listings overflow and quiet ones are left alone.
+    """
+
+    # the number of new things per poll that the interval aims for
+    TARGET_PER_POLL = 25
+    # the fewest things that praw requests per listing (see:
+    # praw.models.util.stream_generator); a poll that returns this many new
+    # things from a listing may have missed some
+    FULL_LISTING = 71
+    # the weight of the latest poll in the rate estimate
+    RATE_WEIGHT = 0.5
+    MIN_INTERVAL = 1
+
+    def __init__(self, name, subreddits_obj, stream_types, max_interval):
+        """
+        name (str) - the shard's multiple subreddit string
+        subreddits_obj (praw.models.Subreddit) - the shard's subreddits
+        stream_types (tuple) - the listings to poll (see:
+                praw.models.SubredditStream)
+        max_interval (float) - the longest number of seconds between polls
+        """
+        self.name = name
+        self.num_subreddits = len(reddit.unpack_subreddits(name))
+        self.max_interval = max(max_interval, StreamShard.MIN_INTERVAL)
+        self.streams = [
+                # XXX: pause_after=-1 => None after every response so that
+                # each poll makes exactly one request per listing
+                getattr(subreddits_obj.stream, stream_type)(pause_after=-1)
+                for stream_type in stream_types
+        ]
+
+        self.interval = StreamShard.MIN_INTERVAL
+        self.next_poll = 0
+        self.last_poll = None
+        # whether this shard's streams were polled yet; their first poll
+        # replays the existing listings (even if the polling state was
+        # inherited) so it is not counted towards the rate, full or lag
+        self.is_primed = False
+        # the estimated number of new things per second
+        self.rate = 0.0
+        self.num_polls = 0
+        self.num_things = 0
+        # the number of listings that were (nearly) full when polled; things
+        # may have been missed if this keeps growing
+        self.num_full = 0
+        # the average age of the things found by the latest poll that found
+        # any (ie, how far behind the shard's listings the stream is)
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def __str__(self):
+        subreddits = reddit.unpack_subreddits(self.name)
+        return '{0}({1}..{2} #{3})'.format(
+                self.__class__.__name__,
+                min(subreddits, key=lambda s: s.lower()),
+                max(subreddits, key=lambda s: s.lower()),
+                self.num_subreddits,
+        )
+
+    def inherit(self, shard):
+        """
+        Carries over the polling state of the shard's previous stream (eg.
+        when the stream is re-initialized after a request failed)
+        """
+        for attr in (
+                'interval', 'next_poll', 'last_poll', 'rate', 'num_polls',
+                'num_things', 'num_full', 'lag', 'max_lag',
+        ):
+            setattr(self, attr, getattr(shard, attr))
+
+    def poll(self):
+        """
+        Returns the list of new things in the shard's listings
+        """
+        now = time.time()
+        things = []
+        for stream in self.streams:
+            num_new = 0
+            for thing in stream:
+                if thing is None:
+                    break
+                things.append(thing)
+                num_new += 1
+
+            if self.is_primed and num_new >= StreamShard.FULL_LISTING:
+                self.num_full += 1
+
+        if things and self.is_primed:
+            lags = [
+                    now - getattr(thing, 'created_utc', now)
+                    for thing in things
+            ]
+            self.lag = sum(lags) / len(lags)
+            self.max_lag = max(self.max_lag, max(lags))
+
+        if self.is_primed and self.last_poll is not None:
+            rate = len(things) / max(now - self.last_poll, 1e-3)
+            self.rate = (
+                    StreamShard.RATE_WEIGHT * rate
+                    + (1 - StreamShard.RATE_WEIGHT) * self.rate
+            )
+            if self.rate > 0:
+                interval = StreamShard.TARGET_PER_POLL / self.rate
+            else:
+                interval = self.max_interval
+            self.interval = min(
+                    max(interval, StreamShard.MIN_INTERVAL), self.max_interval
+            )
+
+        self.is_primed = True
+        self.num_polls += 1
+        self.num_things += len(things)
+        self.last_poll = now
+        self.next_poll = now + self.interval
+        return things
+
+class SubredditsThingsStreamMixin(_SubredditsStreamMixin):
     """
-    Provides subreddits' comment stream through the .stream property
+    Provides subreddits' comment and submission streams through the .stream
+    property.
+
+    The subreddits are split into stream_shard_size StreamShards which are
+    polled round-robin whenever they are due; None is yielded once every due
+    shard was polled.
     """
+
+    # the listings polled by each shard (see: praw.models.SubredditStream)
+    STREAM_TYPES = ('comments', 'submissions')
+
+    def __init__(self, *args, **kwargs):
+        _SubredditsStreamMixin.__init__(self, *args, **kwargs)
+        # the shards of the current stream
+        self.shards = []
+
     @property
     def _stream_type(self):
-        return 'comments'
+        return 'things'
 
-class SubredditsSubmissionsStreamMixin(_SubredditsStreamMixin):
+    def _create_shards(self, subreddits):
+        """
+        Returns the list of StreamShards streaming the set of subreddits
+        """
+        previous = {shard.name: shard for shard in self.shards}
+        shards = []
+        for name in reddit.shard_subreddits(
+                subreddits, self.cfg.stream_shard_size
+        ):
+            shard = StreamShard(
+                    name,
+                    self._reddit.subreddit(name),
+                    SubredditsThingsStreamMixin.STREAM_TYPES,
+                    self.cfg.stream_max_poll_interval,
+            )
+            if name in previous:
+                shard.inherit(previous[name])
+            shards.append(shard)
+        return shards
+
+    def _create_stream(self, subreddits):
+        shards = self._create_shards(subreddits)
+        logger.id(logger.debug, self,
+                'Streaming #{num} shard{plural}:\n\t{shards}',
+                num=len(shards),
+                plural=('' if len(shards) == 1 else 's'),
+                shards='\n\t'.join(shard.name for shard in shards),
+        )
+        self.shards = shards
+
+        def poll_shards():
+            while True:
+                now = time.time()
+                due = [shard for shard in shards if shard.next_poll <= now]
+                # the most overdue shards first
+                for shard in sorted(due, key=lambda shard: shard.next_poll):
+                    # the subreddit streams always spend (like replies)
+                    reddit.spend_requests(len(shard.streams))
+                    for thing in shard.poll():
+                        yield thing
+                yield None
+
+        return poll_shards()
+
+class SubscriptionStreamMixin(RedditInstanceMixin):
     """
-    Provides subreddits' submissions stream through the .stream property
+    Provides the things that a poller fans out to a subscription queue through
+    the .stream property (see: poller.StreamPoller.subscribe). None is yielded
+    once the queue is empty.
     """
+
+    def __init__(self, cfg, rate_limited, subscription):
+        """
+        subscription (multiprocessing.Queue) - the queue of (fullname, pickled
+                thing) to stream
+        """
+        RedditInstanceMixin.__init__(self, cfg, rate_limited)
+        self.subscription = subscription
+
     @property
-    def _stream_type(self):
-        return 'submissions'
+    def pickled_stream(self):
+        """
+        Yields the (fullname, pickled thing) of the queued things (see:
+        reddit.unpickle_thing) so that they can be handed to another process
+        without being unpickled here
+        """
+        while True:
+            try:
+                data = self.subscription.get_nowait()
+            except Empty:
+                break
+            yield data
+        yield None
+
+    @property
+    def stream(self):
+        for data in self.pickled_stream:
+            if data is None:
+                yield None
+            else:
+                yield reddit.unpickle_thing(data[1], self._reddit)
 
 
 __all__ = [
         'StreamMixin',
-        'SubredditsCommentStreamMixin',
-        'SubredditsSubmissionsStreamMixin',
+        'StreamShard',
+        'SubredditsThingsStreamMixin',
+        'SubscriptionStreamMixin',
 ]
 
@@ -0,0 +1,160 @@
+import multiprocessing
+import time
+
+from praw.models import Comment
+
+from src import reddit
+from src.database import SeenThingsDatabase
+from src.mixins import (
+        ProcessMixin,
+        SubredditsThingsStreamMixin,
+)
+from src.util import logger
+
+
+class StreamPoller(ProcessMixin, SubredditsThingsStreamMixin):
+    """
+    Subreddits' comment and submission stream poller
+
+    Both listings of every shard of subreddits are polled by this process
+    alone; every new thing is fanned out to the queues of the consumers
+    subscribed to its type (see: subscribe, mixins.SubscriptionStreamMixin).
+    """
+
+    # the number of seconds between checks for shards that are due
+    POLL_DELAY = 1
+    # the minimum number of seconds between log_stats() logs
+    STATS_INTERVAL = 60
+
+    @staticmethod
+    def stream_type_of(thing):
+        """
+        Returns the SubredditsThingsStreamMixin.STREAM_TYPES type of the thing
+        """
+        if isinstance(thing, Comment):
+            return 'comments'
+        return 'submissions'
+
+    def __init__(self, cfg, rate_limited):
+        ProcessMixin.__init__(self)
+        SubredditsThingsStreamMixin.__init__(self, cfg, rate_limited)
+        # {stream_type: [multiprocessing.Queue, ...]}
+        self._subscriptions = {
+                stream_type: []
+                for stream_type in SubredditsThingsStreamMixin.STREAM_TYPES
+        }
+        # the recently polled fullnames so that duplicates are not fanned out
+        # again (eg. the things re-listed when the stream is re-initialized
+        # because the subreddits changed or after a restart)
+        self.seen = SeenThingsDatabase()
+        self.num_duplicates = 0
+        self._last_stats = time.time()
+
+    def subscribe(self, stream_type):
+        """
+        Returns a new queue of the (fullname, pickled thing) of the things of
+        the given type (see: SubredditsThingsStreamMixin.STREAM_TYPES) polled
+        from now on.
+
+        This must be called before the poller is started.
+        """
+        queue = multiprocessing.Queue()
+        self._subscriptions[stream_type].append(queue)
+        return queue
+
+    def _fan_out(self, thing):
+        """
+        Puts the thing into the queue of every consumer subscribed to its type
+        """
+        subscriptions = self._subscriptions[StreamPoller.stream_type_of(thing)]
+        if subscriptions:
+            data = (reddit.fullname(thing), reddit.pickle_thing(thing))
+            for queue in subscriptions:
+                queue.put(data)
+
+    def _remember(self, fullnames):
+        """
+        Records the fullnames fanned out by a pass in a single transaction
+        """
+        if fullnames:
+            with self.seen:
+                for fullname in fullnames:
+                    self.seen.insert(fullname)
+
+    def log_stats(self, force=False):
+        """
+        Logs each shard's polling interval, rate of new things and lag (at most
+        once every STATS_INTERVAL seconds)
+
+        force (bool, optional) - whether the interval should be ignored
+        """
+        if not force and (
+                time.time() - self._last_stats < StreamPoller.STATS_INTERVAL
+        ):
+            return
+
+        shards = []
+        for shard in self.shards:
+            shards.append(
+                    '{0}: every {1:.1f}s ({2:.1f}/min); #{3} things in #{4}'
+                    ' polls; lag {5:.1f}s (max {6:.1f}s); #{7} full'.format(
+                        shard,
+                        shard.interval,
+                        60 * shard.rate,
+                        shard.num_things,
+                        shard.num_polls,
+                        shard.lag,
+                        shard.max_lag,
+                        shard.num_full,
+                    )
+            )
+
+        if shards:
+            logger.id(logger.debug, self,
+                    'Shards:\n\t{shards}',
+                    shards='\n\t'.join(shards),
+            )
+        if self.num_duplicates:
+            logger.id(logger.debug, self,
+                    'Dropped #{num} duplicate{plural}',
+                    num=self.num_duplicates,
+                    plural=('' if self.num_duplicates == 1 else 's'),
+            )
+        self._last_stats = time.time()
+
+    def _run_forever(self):
+        while not self._killed.is_set():
+            # the fullnames fanned out this pass in order (see: _remember)
+            fullnames = []
+            for thing in self.stream:
+                if not thing or self._killed.is_set():
+                    break
+
+                fullname = reddit.fullname(thing)
+                if fullname in fullnames or fullname in self.seen:
+                    logger.id(logger.debug, self,
+                            'Skipping duplicate {color_thing}',
+                            color_thing=reddit.display_id(thing),
+                    )
+                    self.num_duplicates += 1
+                    continue
+
+                fullnames.append(fullname)
+                self._fan_out(thing)
+
+            self._remember(fullnames)
+            self.log_stats()
+            self._killed.wait(StreamPoller.POLL_DELAY)
+
+        # XXX: don't block exit on things that will never be consumed
+        for subscriptions in self._subscriptions.values():
+            for queue in subscriptions:
+                queue.cancel_join_thread()
+
+        if self._killed.is_set():
+            logger.id(logger.debug, self, 'Killed!')
+
+
+__all__ = [
+        'StreamPoller',
+]
@@ -349,6 +349,8 @@ class RateLimitHandler(ProcessMixin, RedditInstanceMixin):
                             body
                     )
                     if ig_users:
+                        replies = [success] if success is not True else []
+                        reddit.remember_replied_thread(thing, replies)
                         try:
                             with self.reply_history:
                                 self.reply_history.insert(
@@ -1,5 +1,7 @@
+import io
 import multiprocessing
 import os
+import pickle
 import re
 import sys
 import time
@@ -28,6 +30,7 @@ from src import (
         database,
 )
 from src.util import logger
+from src.util.budget import SharedBudget
 from src.util.version import get_version
 
 
@@ -112,6 +115,24 @@ def pack_subreddits(iterable):
     """
     return '+'.join(str(i) for i in iterable)
 
+def shard_subreddits(iterable, size):
+    """
+    Returns the list of multiple subreddit strings of at most size subreddits
+    each (see: pack_subreddits). The subreddits are sorted so that a shard
+    only changes if its own subreddits change or shift.
+    eg. ['AskReddit', 'test', 'help'], 2
+     -> ['AskReddit+help', 'test']
+
+    size (int) - the maximum number of subreddits per shard (<= 0 => one shard)
+    """
+    subreddits = sorted(set(str(i) for i in iterable), key=lambda s: s.lower())
+    if size <= 0:
+        size = max(len(subreddits), 1)
+    return [
+            pack_subreddits(subreddits[i : i + size])
+            for i in range(0, len(subreddits), size)
+    ]
+
 def unpack_subreddits(subreddits_str):
     """
     Returns a set containing each subreddit defined in subreddits_str
@@ -213,11 +234,53 @@ def subreddit_display_name(thing):
 
     return _network_wrapper(_display_name, thing)
 
-def is_banned_from(thing):
+# the reddit request budget shared by every process (see: initialize)
+_request_budget = None
+
+def initialize(cfg):
+    """
+    Initializes the reddit request budget shared by every process (see:
+    spend_requests).
+
+    This should be called before any processes are spawned so that they
+    inherit the budget.
+    """
+    global _request_budget
+    if not _request_budget and cfg.reddit_requests_per_minute > 0:
+        _request_budget = SharedBudget(cfg.reddit_requests_per_minute, 60)
+
+def spend_requests(num=1, reserve=0):
+    """
+    Spends num requests from the shared request budget
+
+    reserve (float, optional) - the fraction of the budget that must be left
+            over for other requests (eg. replies); nothing is spent if there
+            is not enough. 0 always spends.
+
+    Returns True if the requests were spent (always if there is no budget)
+    """
+    if not _request_budget:
+        return True
+    return _request_budget.spend(num, reserve)
+
+# lazy-loaded cache of subreddit ban statuses (see: is_banned_from)
+_subreddit_bans = None
+
+def _get_subreddit_bans():
+    global _subreddit_bans
+    if not _subreddit_bans:
+        _subreddit_bans = database.SubredditBansDatabase()
+    return _subreddit_bans
+
+def is_banned_from(thing, max_age=0):
     """
     Returns True if the user is banned from thing's subreddit
             or False if not banned
             or None if thing has no subreddit
+
+    max_age (float, optional) - the number of seconds that a subreddit's
+            cached ban status is used for before it is looked up again
+            (0 => always look up)
     """
     def _is_banned(thing):
         banned = None
@@ -227,7 +290,45 @@ def is_banned_from(thing):
             banned = thing.user_is_banned
         return banned
 
-    return _network_wrapper(_is_banned, thing)
+    display_name = None
+    if max_age > 0 and not isinstance(thing, string_types):
+        display_name = subreddit_display_name(thing)
+    if display_name:
+        banned = _get_subreddit_bans().get_banned(display_name, max_age)
+        if banned is not None:
+            return banned
+
+    # (most likely) fetches the subreddit
+    spend_requests()
+    banned = _network_wrapper(_is_banned, thing)
+    if display_name and banned is not None:
+        subreddit_bans = _get_subreddit_bans()
+        with subreddit_bans:
+            subreddit_bans.insert(display_name, banned)
+    return banned
+
+def forget_banned_from(thing):
+    """
+    Removes the cached ban status of thing's subreddit so that the next
+    is_banned_from looks it up (eg. a reply failed because the bot may have
+    been banned)
+    """
+    display_name = subreddit_display_name(thing)
+    if display_name:
+        subreddit_bans = _get_subreddit_bans()
+        with subreddit_bans:
+            subreddit_bans.delete(display_name)
+
+def get_ban_cache_stats():
+    """
+    Returns a dictionary of this process's is_banned_from cache 'hits' (ie,
+            network requests saved) and 'misses'
+    """
+    subreddit_bans = _get_subreddit_bans()
+    return {
+            'hits': subreddit_bans.num_hits,
+            'misses': subreddit_bans.num_misses,
+    }
 
 def author(thing, replace_none=True):
     """
@@ -308,9 +409,8 @@ def get_ancestor_tree(comment, to_lower=True):
     comment (praw.models.Comment) - the comment to get the ancestors of
     to_lower (bool, optional) - whether the list results should be lower-cased
     """
-    # TODO? cache results for each comment-id hit to potentially lower
-    # number of requests made (in the unlikely event that we need the
-    # ancestors of a sibling this comment)
+    # XXX: this always fetches the entire tree; get_ancestry only
+    # fetches the ancestors that the bot has not seen
 
     # https://praw.readthedocs.io/en/latest/code_overview/models/comment.html#praw.models.Comment.parent
     def _get_ancestor_tree(comment, to_lower):
@@ -323,12 +423,216 @@ def get_ancestor_tree(comment, to_lower=True):
             if refresh_counter % 9 == 0:
                 # TODO? catch praw.exceptions.ClientException:
                 # This comment does not appear to be in the comment tree
+                spend_requests()
                 ancestor.refresh()
             refresh_counter += 1
         return result
 
     return _network_wrapper(_get_ancestor_tree, comment, to_lower)
 
+# lazy-loaded cache of seen comments' parents (see: get_ancestry)
+_comment_ancestry = None
+
+def _get_comment_ancestry():
+    global _comment_ancestry
+    if not _comment_ancestry:
+        _comment_ancestry = database.CommentAncestryDatabase()
+    return _comment_ancestry
+
+def ancestry_row(comment, fetch=False):
+    """
+    Returns the tuple (fullname, parent_fullname, author) of the comment
+            or None if the thing is not a comment or has not been fetched
+
+    fetch (bool, optional) - whether the comment should be fetched if it has
+            not been (otherwise this never hits the network)
+    """
+    if not isinstance(comment, praw.models.Comment):
+        return None
+
+    if fetch:
+        def _parent_id(comment):
+            return comment.parent_id
+
+        parent_fullname = _network_wrapper(_parent_id, comment)
+        name = author(comment)
+    else:
+        # XXX: vars() so that lazy comments are not fetched
+        data = vars(comment)
+        if 'parent_id' not in data or 'author' not in data:
+            return None
+        parent_fullname = data['parent_id']
+        name = data['author'].name if data['author'] else None
+
+    if not parent_fullname:
+        return None
+    return (
+            comment.fullname,
+            parent_fullname,
+            name or '[deleted/removed]',
+    )
+
+def remember_comments(comments):
+    """
+    Records the comments' parents and authors so that threads containing them
+    can be walked without fetching them (see: get_ancestry)
+
+    Comments that have not been fetched are skipped (this never hits the
+    network).
+    """
+    remember_ancestry([
+            row for row in (ancestry_row(comment) for comment in comments)
+            if row
+    ])
+
+def remember_ancestry(rows):
+    """
+    Records the (fullname, parent_fullname, author) rows (see: ancestry_row)
+    in a single transaction
+    """
+    if rows:
+        comment_ancestry = _get_comment_ancestry()
+        with comment_ancestry:
+            comment_ancestry.insert(rows)
+
+def remember_replied_thread(thing, replies=()):
+    """
+    Pins the thread of the replied-to thing (and the bot's replies to it) so
+    that the threads that the bot has replied in are never forgotten (see:
+    get_ancestry)
+
+    This never hits the network: only the ancestors that were remembered
+    when the thing's thread was checked are pinned (see:
+    Filter._too_many_replies_in_thread).
+    """
+    rows = [
+            row for row in (
+                ancestry_row(comment) for comment in [thing] + list(replies)
+            )
+            if row
+    ]
+    if rows:
+        comment_ancestry = _get_comment_ancestry()
+        with comment_ancestry:
+            comment_ancestry.insert(rows, pinned=True)
+            comment_ancestry.pin_thread(fullname(thing))
+
+def get_ancestry(comment):
+    """
+    Returns a list of (fullname, parent_fullname, author) tuples of the
+            comment's ancestors ordered from parent -> root (see:
+            get_ancestor_tree)
+            or None if the ancestors could not be fetched
+
+    Ancestors that the bot has seen (see: remember_comments,
+    remember_replied_thread) are looked up locally; the rest of the tree is
+    only fetched from the first unknown ancestor up.
+    """
+    row = ancestry_row(comment, fetch=True)
+    if not row:
+        return None
+
+    comment_kind = comment._reddit.config.kinds['comment']
+    ancestry = []
+    _, parent_fullname, _ = row
+    while split_fullname(parent_fullname)[0] == comment_kind:
+        row = _get_comment_ancestry().get(parent_fullname)
+        if not row:
+            break
+        ancestry.append(
+                (parent_fullname, row['parent_fullname'], row['author'])
+        )
+        parent_fullname = row['parent_fullname']
+
+    else:
+        # the entire thread is known
+        return ancestry
+
+    def _get_unknown_ancestors(parent_fullname):
+        _, parent_id = split_fullname(parent_fullname)
+        ancestor = comment._reddit.comment(parent_id)
+        tree = get_ancestor_tree(ancestor)
+        if tree is None:
+            return None
+        return [ancestor] + tree
+
+    ancestors = _network_wrapper(_get_unknown_ancestors, parent_fullname)
+    if ancestors is None:
+        return None
+
+    rows = [ancestry_row(ancestor, fetch=True) for ancestor in ancestors]
+    if None in rows:
+        return None
+
+    remember_comments(ancestors)
+    return ancestry + rows
+
+def get_ancestor_authors(comment):
+    """
+    Returns a list of the authors of the comment's ancestors ordered from
+            parent -> root
+            or None if the ancestors could not be fetched (see: get_ancestry)
+    """
+    ancestry = get_ancestry(comment)
+    if ancestry is None:
+        return None
+    return [name for _, _, name in ancestry]
+
+def get_ancestry_cache_stats():
+    """
+    Returns a dictionary of this process's get_ancestry 'hits' (ie, ancestors
+            that were not fetched) and 'misses' (ie, unknown ancestors that the
+            rest of the tree was fetched from)
+    """
+    comment_ancestry = _get_comment_ancestry()
+    return {
+            'hits': comment_ancestry.num_hits,
+            'misses': comment_ancestry.num_misses,
+    }
+
+class _ThingPickler(pickle.Pickler):
+    """
+    Pickles things without their praw.Reddit instance (see: pickle_thing)
+    """
+
+    def persistent_id(self, obj):
+        if isinstance(obj, praw.Reddit):
+            return 'reddit'
+        return None
+
+class _ThingUnpickler(pickle.Unpickler):
+    """
+    Unpickles things pickled by pickle_thing with the given reddit instance
+    """
+
+    def __init__(self, fd, reddit_instance):
+        pickle.Unpickler.__init__(self, fd)
+        self.reddit_instance = reddit_instance
+
+    def persistent_load(self, pid):
+        if pid == 'reddit':
+            return self.reddit_instance
+        raise pickle.UnpicklingError('Unknown persistent id: {0}'.format(pid))
+
+def pickle_thing(thing):
+    """
+    Returns the pickled thing so that it can be shipped to another process
+
+    The thing's praw.Reddit instance (which holds the session and cannot be
+    pickled) is not included; the unpickling process supplies its own
+    (see: unpickle_thing).
+    """
+    fd = io.BytesIO()
+    _ThingPickler(fd, pickle.HIGHEST_PROTOCOL).dump(thing)
+    return fd.getvalue()
+
+def unpickle_thing(data, reddit_instance):
+    """
+    Returns the thing pickled by pickle_thing bound to the given
+    praw.Reddit instance
+    """
+    return _ThingUnpickler(io.BytesIO(data), reddit_instance).load()
+
 # ######################################################################
 
 class Reddit(praw.Reddit):
@@ -341,6 +645,7 @@ class Reddit(praw.Reddit):
     RATELIMIT_ERR = ('RATELIMIT',)
     DELETED_ERR = ('DELETED_COMMENT',)
     SUBREDDIT_NOEXIST_ERR = ('SUBREDDIT_NOEXIST',)
+    BANNED_ERR = ('SUBREDDIT_NOTALLOWED',)
 
     LINE_SEP = '=' * 72
 
@@ -957,6 +1262,7 @@ class Reddit(praw.Reddit):
             redditor = self.redditor(to)
             try:
                 if not constants.dry_run:
+                    spend_requests()
                     def _message(redditor, subject, body):
                         return redditor.message(subject, body)
                     _network_wrapper(_message, redditor, subject, body)
@@ -1079,6 +1385,7 @@ class Reddit(praw.Reddit):
             subreddit = self.subreddit(display_name)
             try:
                 if not constants.dry_run:
+                    spend_requests()
                     def _submit(subreddit, *args, **kwargs):
                         return subreddit.submit(*args, **kwargs)
                     submission = _network_wrapper(
@@ -1161,7 +1468,8 @@ class Reddit(praw.Reddit):
                 to gracefully exit from this method in case it gets stuck
                 attempting to queue the reply from a rogue ratelimit.
 
-        Returns True if a successful reply is made
+        Returns the reply (or True if there is none; eg. dry run) if a
+                    successful reply is made
                 or False if the reply could not be made right now and should be
                     retried
                 or None if the reply is not possible
@@ -1202,8 +1510,11 @@ class Reddit(praw.Reddit):
                         placeholder=constants.THING_ID_PLACEHOLDER,
                 )
 
+            reply = None
             try:
                 if not constants.dry_run:
+                    # replies always spend (see: StreamMixin.POLL_RESERVE)
+                    spend_requests()
                     def _reply(thing, body):
                         return thing.reply(body)
                     reply = _network_wrapper(_reply, thing, body)
@@ -1214,6 +1525,8 @@ class Reddit(praw.Reddit):
                                 color_thing=display_id(thing),
                                 color_reply_id=reply.id,
                         )
+                        # the reply counts toward the thread's bot replies
+                        remember_comments([reply])
                 else:
                     if not self.__dry_run_test():
                         logger.id(logger.info, self,
@@ -1240,6 +1553,7 @@ class Reddit(praw.Reddit):
                         color_thing=display_id(thing),
                         exc_info=True,
                 )
+                forget_banned_from(thing)
                 success = None
 
             except praw.exceptions.APIException as e:
@@ -1263,8 +1577,12 @@ class Reddit(praw.Reddit):
                     )
                     success = None
 
+                elif err_type in Reddit.BANNED_ERR:
+                    # the bot may have been banned from the subreddit
+                    forget_banned_from(thing)
+
             else:
-                success = True
+                success = reply or True
 
         return success
 
@@ -1283,6 +1601,8 @@ class Reddit(praw.Reddit):
                     # comment, submission, subreddit, redditor
                     thing_class = getattr(self, thing_name)
                     thing = thing_class(thing_id)
+                    # the lazy thing is fetched once it is used
+                    spend_requests()
 
                     # XXX: this doesn't work for subreddits and redditors since
                     # the reddit object expects the display name to construct
@@ -1343,17 +1663,31 @@ __all__ = [
         'prefix_user',
         'prefix',
         'pack_subreddits',
+        'shard_subreddits',
         'unpack_subreddits',
         'display_id',
         'display_fullname',
         'fullname',
         'subreddit_display_name',
+        'initialize',
+        'spend_requests',
         'author',
         'score',
         'split_fullname',
         'get_type_from_fullname',
         'get_submission_for',
         'get_ancestor_tree',
+        'ancestry_row',
+        'remember_comments',
+        'remember_ancestry',
+        'remember_replied_thread',
+        'get_ancestry',
+        'get_ancestor_authors',
+        'get_ancestry_cache_stats',
+        'forget_banned_from',
+        'get_ban_cache_stats',
+        'pickle_thing',
+        'unpickle_thing',
         'Reddit',
 ]
 
@@ -1,4 +1,5 @@
 import re
+import time
 
 from praw.models import Comment
 
@@ -32,6 +33,26 @@ class Filter(object):
             HELP_URL.strip('/ '),
     ]
 
+    # the stages at which things are rejected (see: num_rejected)
+    REJECT_PREFILTER = 'prefilter'
+    REJECT_CAN_REPLY = 'can_reply'
+    REJECT_NO_USERNAMES = 'no_usernames'
+    REJECT_ALREADY_POSTED = 'already_posted'
+    REJECT_THREAD = 'thread'
+    REJECT_STAGES = [
+            REJECT_PREFILTER,
+            REJECT_CAN_REPLY,
+            REJECT_NO_USERNAMES,
+            REJECT_ALREADY_POSTED,
+            REJECT_THREAD,
+    ]
+
+    # the minimum number of seconds between log_stats() logs
+    STATS_INTERVAL = 60
+    # the max number of checked comments buffered before they are remembered
+    # (see: remember_seen)
+    REMEMBER_BATCH_SIZE = 100
+
     def __init__(self, cfg, username, blacklist):
         self.cfg = cfg
         self.blacklist = blacklist
@@ -41,13 +62,22 @@ class Filter(object):
         self.reply_queue = database.ReplyQueueDatabase()
         self.reddit_ratelimit_queue = database.RedditRateLimitQueueDatabase()
 
+        # per-process counts of things checked/rejected by
+        # replyable_usernames
+        self.num_checked = 0
+        self.num_rejected = {stage: 0 for stage in Filter.REJECT_STAGES}
+        self._last_stats = (0, time.time())
+        # the ancestry rows of the comments checked since the last
+        # remember_seen()
+        self._seen_ancestry = []
+
     def __str__(self):
         result = [self.__class__.__name__]
         if self.username:
             result.append(self.username)
         return ':'.join(result)
 
-    def _can_reply(self, thing):
+    def _can_reply(self, thing, local_only=False):
         """
         Checks if the bot is able to make a reply to the thing.
         This does not mean that the thing contains any content that the bot
@@ -66,6 +96,10 @@ class Filter(object):
             - the bot is not banned from thing's subreddit
             - thing not in a blacklisted subreddit or posted by a blacklisted
               user
+
+        local_only (bool, optional) - whether only the checks that do not hit
+                the network should be performed (ie, skip the ban check; see:
+                can_reply_remote)
         """
         # XXX: the code is fully written out instead of being a "simple" boolean
         # (eg. return not (a or b or c)) so that appropriate logging calls can
@@ -113,8 +147,10 @@ class Filter(object):
             return False
 
         submission = reddit.get_submission_for(thing)
-        replied = self.reply_history.replied_things_for_submission(submission)
-        if len(replied) > self.cfg.max_replies_per_post:
+        num_replied = self.reply_history.num_replied_things_for_submission(
+                submission
+        )
+        if num_replied > self.cfg.max_replies_per_post:
             logger.id(logger.info, self,
                     'I\'ve made too many replies (#{num}) to {color_post}:'
                     ' skipping.',
@@ -169,8 +205,17 @@ class Filter(object):
             )
             return False
 
-        # this will most likely incur an extra network hit
-        if reddit.is_banned_from(thing):
+        if local_only:
+            return True
+        return not self._is_banned(thing)
+
+    def _is_banned(self, thing):
+        """
+        Returns True if the bot is banned from the thing's subreddit
+        """
+        # this will most likely incur an extra network hit (unless the
+        # subreddit's ban status is cached)
+        if reddit.is_banned_from(thing, self.cfg.subreddit_ban_cache_time):
             logger.id(logger.info, self,
                     'I am banned from {color_subreddit}: skipping.',
                     color_subreddit=reddit.prefix_subreddit(
@@ -183,8 +228,8 @@ class Filter(object):
             # location from a duplication standpoint.
             self._remove_banned(thing)
 
-            return False
-        return True
+            return True
+        return False
 
     def _remove_banned(self, thing):
         """
@@ -194,7 +239,7 @@ class Filter(object):
         Effectively, this prevents the bot from attempting to process to things
         from subreddits it has been banned from.
         """
-        if reddit.is_banned_from(thing):
+        if reddit.is_banned_from(thing, self.cfg.subreddit_ban_cache_time):
             display_name = reddit.subreddit_display_name(thing)
             if display_name:
                 self.blacklist.add(display_name, prefix=PREFIX_SUBREDDIT)
@@ -336,16 +381,17 @@ class Filter(object):
         Returns True if the bot has made too many replies in the comment thread
 
         (This is separate from _can_reply because, depending on the depth of the
-         comment, it may trigger multiple network hits)
+         comment and how much of the thread the bot has seen, it may trigger
+         multiple network hits)
         """
         if not isinstance(comment, Comment):
             return False
 
         too_many_replies = False
-        ancestor_tree = reddit.get_ancestor_tree(comment)
-        # XXX: ancestor_tree may be None
-        if ancestor_tree:
-            author_tree = [reddit.author(c).lower() for c in ancestor_tree]
+        ancestor_authors = reddit.get_ancestor_authors(comment)
+        # XXX: ancestor_authors may be None
+        if ancestor_authors:
+            author_tree = [author.lower() for author in ancestor_authors]
         else:
             author_tree = []
 
@@ -368,7 +414,7 @@ class Filter(object):
         return too_many_replies
 
     def replyable_usernames(
-            self, thing, prelim_check=True, check_thread=True
+            self, thing, prelim_check=True, check_thread=True, local_only=False
     ):
         """
         Returns a tuple(list, from_link, is_guess) where
@@ -390,13 +436,39 @@ class Filter(object):
         check_thread (bool, optional) - whether the thing thread should be
                 checked for too many bot replies (this is an expensive operation
                 in terms of reddit's ratelimit)
+        local_only (bool, optional) - whether only the checks that do not hit
+                the network should be performed. The thing should then be
+                passed to can_reply_remote before it is queued for a reply.
         """
         usernames = []
         from_link = None
         is_guess = None
+        if not thing:
+            return (usernames, from_link, is_guess)
+
+        self.num_checked += 1
+        # remember the thing so that threads containing it can be checked
+        # without fetching it (see: remember_seen)
+        row = reddit.ancestry_row(thing)
+        if row:
+            self._seen_ancestry.append(row)
+            if len(self._seen_ancestry) >= Filter.REMEMBER_BATCH_SIZE:
+                self.remember_seen()
+        parsed_thing = Parser(thing)
+        # reject things that cannot contain any usernames before any database
+        # or network hits
+        if not parsed_thing.may_contain_usernames:
+            logger.id(logger.debug, self,
+                    '{color_thing} cannot contain any usernames: skipping.',
+                    color_thing=reddit.display_id(thing),
+            )
+            self.num_rejected[Filter.REJECT_PREFILTER] += 1
+
         # filter out things that the bot cannot reply to
-        if thing and (not prelim_check or self._can_reply(thing)):
-            parsed_thing = Parser(thing)
+        elif prelim_check and not self._can_reply(thing, local_only):
+            self.num_rejected[Filter.REJECT_CAN_REPLY] += 1
+
+        else:
             thing_usernames = parsed_thing.ig_usernames
             # XXX: these values must be set after .ig_usernames is referenced
             # since parsing is done lazily (.from_link, .is_guess are not set
@@ -412,7 +484,7 @@ class Filter(object):
                 # replied to in this submission
                 if new_usernames:
                     too_many_replies = False
-                    if check_thread:
+                    if check_thread and not local_only:
                         too_many_replies = self._too_many_replies_in_thread(
                                 thing,
                         )
@@ -420,9 +492,122 @@ class Filter(object):
                     # replies to
                     if not too_many_replies:
                         usernames = new_usernames
+                    else:
+                        self.num_rejected[Filter.REJECT_THREAD] += 1
+                else:
+                    self.num_rejected[Filter.REJECT_ALREADY_POSTED] += 1
+            else:
+                self.num_rejected[Filter.REJECT_NO_USERNAMES] += 1
 
         return (usernames, from_link, is_guess)
 
+    def remember_seen(self):
+        """
+        Records the ancestry of the comments checked by replyable_usernames
+        since the last call in a single transaction. This should be called
+        once per pass over a stream.
+        """
+        if self._seen_ancestry:
+            reddit.remember_ancestry(self._seen_ancestry)
+            self._seen_ancestry = []
+
+    def can_reply_remote(self, thing, check_thread=True):
+        """
+        Performs the network checks skipped by
+        replyable_usernames(..., local_only=True)
+
+        Returns True if the bot can still reply to the thing
+        """
+        self.num_checked += 1
+        if thing in self.reply_queue:
+            # queued since the local checks were performed (eg. a duplicate
+            # of the thing was checked at the same time)
+            logger.id(logger.info, self,
+                    '{color_thing} is already queued for a reply: skipping.',
+                    color_thing=reddit.display_id(thing),
+            )
+            self.num_rejected[Filter.REJECT_CAN_REPLY] += 1
+            return False
+
+        if self._is_banned(thing):
+            self.num_rejected[Filter.REJECT_CAN_REPLY] += 1
+            return False
+
+        if check_thread and self._too_many_replies_in_thread(thing):
+            self.num_rejected[Filter.REJECT_THREAD] += 1
+            return False
+        return True
+
+    def log_stats(self, force=False):
+        """
+        Logs the number of things rejected at each stage of
+        replyable_usernames and the hit rates of the parser's word caches, the
+        subreddit ban cache and the comment ancestry cache (at most once every
+        STATS_INTERVAL seconds)
+
+        force (bool, optional) - whether the interval should be ignored
+        """
+        last_checked, last_time = self._last_stats
+        if not force and (
+                self.num_checked == last_checked
+                or time.time() - last_time < Filter.STATS_INTERVAL
+        ):
+            return
+
+        num_accepted = self.num_checked - sum(self.num_rejected.values())
+        logger.id(logger.debug, self,
+                'Checked #{num} thing{plural}: accepted #{num_accepted};'
+                ' rejected {rejected}',
+                num=self.num_checked,
+                plural=('' if self.num_checked == 1 else 's'),
+                num_accepted=num_accepted,
+                rejected=', '.join(
+                    '{0}=#{1}'.format(stage, self.num_rejected[stage])
+                    for stage in Filter.REJECT_STAGES
+                ),
+        )
+        self._last_stats = (self.num_checked, time.time())
+
+        stats = Parser.cache_stats
+        logger.id(logger.debug, self,
+                'Word caches: english {english}; jargon {jargon};'
+                ' #{num_words_hits} english word list hit{plural}',
+                english=Filter._format_cache_stats(stats['english']),
+                jargon=Filter._format_cache_stats(stats['jargon']),
+                num_words_hits=stats['english_words']['hits'],
+                plural=('' if stats['english_words']['hits'] == 1 else 's'),
+        )
+
+        ban_stats = reddit.get_ban_cache_stats()
+        logger.id(logger.debug, self,
+                'Subreddit ban cache: #{num_hits} network request{plural}'
+                ' saved (#{num_misses} looked up)',
+                num_hits=ban_stats['hits'],
+                plural=('' if ban_stats['hits'] == 1 else 's'),
+                num_misses=ban_stats['misses'],
+        )
+
+        ancestry_stats = reddit.get_ancestry_cache_stats()
+        num_lookups = ancestry_stats['hits'] + ancestry_stats['misses']
+        logger.id(logger.debug, self,
+                'Comment ancestry cache: {hit_rate}% hits;'
+                ' #{num_hits} ancestor fetch{plural} saved',
+                hit_rate='{0:.1f}'.format(
+                    100.0 * ancestry_stats['hits'] / max(num_lookups, 1)
+                ),
+                num_hits=ancestry_stats['hits'],
+                plural=('' if ancestry_stats['hits'] == 1 else 'es'),
+        )
+
+    @staticmethod
+    def _format_cache_stats(stats):
+        return '{0:.1f}% hits (#{1}/#{2}; size: #{3})'.format(
+                100 * stats['hit_rate'],
+                stats['hits'],
+                stats['hits'] + stats['misses'],
+                stats['size'],
+        )
+
     # TODO? move; this doesn't really belong here ...
     def enqueue(self, thing, ig_usernames, mention=None):
         """
@@ -9,10 +9,6 @@ import multiprocessing
 import re
 import time
 
-from bs4 import (
-        BeautifulSoup,
-        FeatureNotFound,
-)
 import enchant
 from praw.models import (
         Comment,
@@ -32,6 +28,10 @@ from src.util import (
         logger,
         remove_duplicates,
 )
+from src.util.decorators import classproperty
+from src.util.hrefs import parse_hrefs
+from src.util.lru import LRUCache
+from src.util.regex import PrefixDispatchRegex
 
 
 def load_jargon():
@@ -73,6 +73,24 @@ def load_jargon():
 
     return jargon
 
+def load_english_words(path):
+    """
+    Returns the set of lower-cased words listed (one per line) in the file at
+            path
+    """
+    from src.util import readline
+
+    logger.id(logger.debug, __name__,
+            'Loading english words from \'{path}\' ...',
+            path=path,
+    )
+    words = set(line.lower() for _, line in readline(path))
+    logger.id(logger.debug, __name__,
+            'Loaded #{num} english words',
+            num=len(words),
+    )
+    return words
+
 @add_metaclass(abc.ABCMeta)
 class _ParserStrategy(object):
     """
@@ -140,6 +158,16 @@ class _ParserStrategy(object):
         (comment.body_html or submission.selftext_html)
         """
 
+    def may_contain_usernames(self):
+        """
+        Cheap check run before any parsing
+
+        Returns False if the thing cannot contain any instagram usernames
+        """
+        return bool(
+                instagram.MAY_CONTAIN_IG_USER_REGEX.search(self._thing_text)
+        )
+
     def _link_matches(self, link):
         """
         Returns True if the link should be added to the list of parsed links
@@ -184,16 +212,17 @@ class _ParserStrategy(object):
         Returns a list of parsed urls
         """
         links = []
-        try:
-            soup = BeautifulSoup(self._thing_html, 'lxml')
-        except FeatureNotFound:
-            soup = BeautifulSoup(self._thing_html, 'html.parser')
+        html = self._thing_html
+        # most things do not link to instagram at all; don't bother tokenizing
+        # their html
+        if not instagram.HAS_IG_DOMAIN_REGEX.search(html):
+            return links
 
         # Note: this only considers valid links in the body's text
         # TODO? regex search for anything that looks like a link
-        for a in soup.find_all('a', href=True):
-            if self._link_matches(a['href']):
-                links.append(a['href'])
+        for href in parse_hrefs(html):
+            if self._link_matches(href):
+                links.append(href)
 
         return links
 
@@ -313,17 +342,11 @@ class _ParserStrategy(object):
                 # prune previous bad matches (eg. usernames that were
                 # deleted due to downvotes)
                 usernames_db = _ParserStrategy._bad_usernames
-                patterns = usernames_db.get_bad_username_patterns()
-                bad_username_regex = re.compile(
-                        '^(?:{0})$'.format('|'.join(patterns)),
-                        flags=re.IGNORECASE,
-                )
-
-                pruned = []
-                for name in usernames:
-                    if bad_username_regex.search(name):
-                        usernames.remove(name)
-                        pruned.append(name)
+                pruned = [
+                        name for name in usernames
+                        if usernames_db.is_bad_username(name)
+                ]
+                usernames = [name for name in usernames if name not in pruned]
 
                 if pruned:
                     logger.id(logger.info, self,
@@ -434,6 +457,13 @@ class _SubmissionParser(_ParserStrategy):
         # non- self-posts' .selftext returns None
         return self.thing.selftext_html or ''
 
+    def may_contain_usernames(self):
+        return bool(
+                _ParserStrategy.may_contain_usernames(self)
+                # the post may link directly to an instagram profile
+                or instagram.HAS_IG_DOMAIN_REGEX.search(self.thing.url or '')
+        )
+
     def _parse_links(self):
         links = _ParserStrategy._parse_links(self)
         # check the post's url in case it links to an instagram profile
@@ -485,6 +515,9 @@ class Parser(object):
     for i, regex in enumerate(_JARGON_VARIATIONS_WHOLE):
         _JARGON_VARIATIONS.append(r'^{0}\b'.format(regex))
 
+    # XXX: kept so that the prefix-dispatched matcher can be built later
+    # (see: initialize)
+    _JARGON_PATTERNS = list(_JARGON_VARIATIONS)
     _JARGON_REGEX = re.compile(
             '{0}'.format('|'.join(_JARGON_VARIATIONS)), flags=re.IGNORECASE
     )
@@ -493,18 +526,69 @@ class Parser(object):
     _JARGON_FROM_FILE = bool(_JARGON_FROM_FILE)
     _JARGON_VARIATIONS = bool(_JARGON_VARIATIONS)
     _JARGON_VARIATIONS_WHOLE = bool(_JARGON_VARIATIONS_WHOLE)
+    # faster, equivalent form of _JARGON_REGEX (see: initialize)
+    _jargon_dispatch = None
+
+    _cfg = None
+    # process-local caches of is_english/is_jargon results
+    _english_lru = None
+    _jargon_lru = None
+    # precomputed (lower-cased) english words checked before the
+    # dictionaries (see: initialize)
+    _english_words = None
+    _english_words_hits = 0
+
+    @classproperty
+    def english_lru(cls):
+        if Parser._english_lru is None:
+            size = Parser._cfg.parser_word_cache_size if Parser._cfg else 0
+            Parser._english_lru = LRUCache(size)
+        return Parser._english_lru
+
+    @classproperty
+    def jargon_lru(cls):
+        if Parser._jargon_lru is None:
+            size = Parser._cfg.parser_word_cache_size if Parser._cfg else 0
+            Parser._jargon_lru = LRUCache(size)
+        return Parser._jargon_lru
+
+    @classproperty
+    def cache_stats(cls):
+        """
+        Returns the is_english/is_jargon caches' counters (see LRUCache.stats)
+        """
+        return {
+                'english': Parser.english_lru.stats,
+                'jargon': Parser.jargon_lru.stats,
+                'english_words': {
+                    'size': len(Parser._english_words or ()),
+                    'hits': Parser._english_words_hits,
+                },
+        }
 
     @staticmethod
     def is_english(word):
         """
         Returns True if the word is an english word
         """
+        result = Parser.english_lru.get(word)
+        if result is None:
+            result = Parser._is_english(word)
+            Parser.english_lru.set(word, result)
+        return result
+
+    @staticmethod
+    def _is_english(word):
+        if Parser._english_words and word.lower() in Parser._english_words:
+            Parser._english_words_hits += 1
+            return True
+
         if not Parser._en_US:
             Parser._en_US = enchant.Dict('en_US')
         if not Parser._en_GB:
             Parser._en_GB = enchant.Dict('en_GB')
 
-        return (
+        return bool(
                 Parser._en_US.check(word)
                 or Parser._en_US.check(word.capitalize())
                 or Parser._en_GB.check(word)
@@ -516,7 +600,13 @@ class Parser(object):
         """
         Returns True if the word looks like internet jargon
         """
-        return Parser._JARGON_REGEX.search(word)
+        # XXX: non-jargon is cached as False so that it is not a cache miss
+        match = Parser.jargon_lru.get(word)
+        if match is None:
+            regex = Parser._jargon_dispatch or Parser._JARGON_REGEX
+            match = regex.search(word) or False
+            Parser.jargon_lru.set(word, match)
+        return match or None
 
     def __init__(self, thing):
         self.thing = thing
@@ -537,6 +627,16 @@ class Parser(object):
             result.append('<invalid>')
         return ':'.join(result)
 
+    @property
+    def may_contain_usernames(self):
+        """
+        Returns False if the thing cannot contain any instagram usernames
+                (ie, parsing it would not find any)
+        """
+        if not self._strategy:
+            return False
+        return self._strategy.may_contain_usernames()
+
     @property
     def ig_links(self):
         """
@@ -590,7 +690,34 @@ class Parser(object):
         return self._strategy.is_guess if self._strategy else None
 
 
+def initialize(cfg):
+    """
+    Initializes the parser's word caches and jargon matcher
+
+    This should be called before any processes are started so that they
+    inherit the loaded words.
+    """
+    if Parser._cfg:
+        return
+    Parser._cfg = cfg
+
+    if cfg.english_words_path:
+        Parser._english_words = load_english_words(cfg.english_words_path)
+
+    if cfg.jargon_prefix_dispatch and Parser._JARGON_PATTERNS:
+        start = time.time()
+        Parser._jargon_dispatch = PrefixDispatchRegex(
+                Parser._JARGON_PATTERNS, flags=re.IGNORECASE,
+        )
+        logger.id(logger.debug, __name__,
+                'Compiled {matcher} in {time}',
+                matcher=Parser._jargon_dispatch,
+                time=time.time() - start,
+        )
+
+
 __all__ = [
+        'initialize',
         'Parser',
 ]
 
@@ -0,0 +1,307 @@
+import multiprocessing
+import time
+import zlib
+
+from six import iteritems
+from six.moves.queue import Empty
+
+from src import reddit
+from src.mixins import (
+        ProcessMixin,
+        RedditInstanceMixin,
+)
+from src.util import logger
+
+
+class ParseWorker(ProcessMixin, RedditInstanceMixin):
+    """
+    Comment stream parse worker process. parse_workers of these run
+    concurrently, each parsing and filtering the things routed to it by the
+    ParsePool.
+
+    Only the checks that do not hit reddit are made here (see:
+    Filter.replyable_usernames(..., local_only=True)); the results are handed
+    back to the ParsePool which makes the rest before queueing a reply.
+    """
+
+    # XXX: short so that kill()s are noticed promptly while idle
+    IDLE_DELAY = 1
+
+    def __init__(
+            self, cfg, rate_limited, thing_filter, worker_id, queue, results,
+    ):
+        """
+        thing_filter (replies.Filter) - the filter used to parse things
+        worker_id (int) - the worker's index in the ParsePool
+        queue (multiprocessing.Queue) - the things routed to this worker
+        results (multiprocessing.Queue) - the queue shared by every worker
+                that results are put into
+        """
+        ProcessMixin.__init__(self)
+        RedditInstanceMixin.__init__(self, cfg, rate_limited)
+        self.filter = thing_filter
+        self.worker_id = worker_id
+        self.queue = queue
+        self.results = results
+
+    def __str__(self):
+        return '{0}.{1}'.format(ProcessMixin.__str__(self), self.worker_id)
+
+    @property
+    def _pid_name(self):
+        return '{0}.{1}'.format(self.__class__.__name__, self.worker_id)
+
+    def _parse(self, data):
+        """
+        Returns the list of replyable usernames in the pickled thing
+        """
+        thing = reddit.unpickle_thing(data, self.reddit_instance)
+        usernames, _, _ = self.filter.replyable_usernames(
+                thing, local_only=True,
+        )
+        return usernames
+
+    def _run_forever(self):
+        while not self._killed.is_set():
+            try:
+                seq, data = self.queue.get(timeout=ParseWorker.IDLE_DELAY)
+            except Empty:
+                self.filter.remember_seen()
+                self.filter.log_stats()
+                continue
+
+            start = time.time()
+            try:
+                usernames = self._parse(data)
+            except Exception:
+                logger.id(logger.exception, self,
+                        'Failed to parse thing #{seq}!',
+                        seq=seq,
+                )
+                usernames = []
+
+            # always return a result so that the pool stops tracking the thing
+            self.results.put(
+                    (self.worker_id, seq, usernames, time.time() - start)
+            )
+            self.filter.log_stats()
+
+        self.filter.remember_seen()
+        # XXX: don't block exit on results the pool will never read
+        self.results.cancel_join_thread()
+
+
+class ParsePool(object):
+    """
+    Parses and filters the comment stream in parse_workers ParseWorkers.
+
+    Things are routed to a live worker by fullname so that duplicates of a
+    thing are parsed by the same worker in the order that they were
+    submitted. The results are handled in the submitting process which makes
+    the checks that hit reddit (see: Filter.can_reply_remote) and queues the
+    replies; a duplicate is skipped there if an earlier copy was already
+    queued. Things are submitted pickled and only unpickled here if they
+    contain replyable usernames.
+    """
+
+    # the max number of submitted things per worker that have not been
+    # handled yet before submit() blocks
+    MAX_PENDING_PER_WORKER = 100
+    # the number of seconds submit() waits for results when blocked
+    RESULT_DELAY = 1
+    # the minimum number of seconds between log_stats() logs
+    STATS_INTERVAL = 60
+
+    def __init__(self, cfg, rate_limited, thing_filter, reddit_instance):
+        """
+        thing_filter (replies.Filter) - the filter used to parse things and
+                queue replies
+        reddit_instance (reddit.Reddit) - the submitting process's instance
+                that parsed things are unpickled with
+        """
+        self.filter = thing_filter
+        self.reddit_instance = reddit_instance
+        self.results = multiprocessing.Queue()
+        self.workers = [
+                ParseWorker(
+                    cfg, rate_limited, thing_filter, i,
+                    multiprocessing.Queue(), self.results,
+                )
+                for i in range(cfg.parse_workers)
+        ]
+
+        self._seq = 0
+        # {seq: (worker_id, pickled thing)} of the submitted things without
+        # results
+        self._pending = {}
+        self._num_pending = [0] * len(self.workers)
+        self._num_done = [0] * len(self.workers)
+        self._parse_time = [0.0] * len(self.workers)
+        self._last_stats = (list(self._num_done), time.time())
+
+    def __str__(self):
+        return '{0}({1})'.format(self.__class__.__name__, len(self.workers))
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def kill(self):
+        for worker in self.workers:
+            worker.kill()
+
+    def join(self):
+        for worker in self.workers:
+            worker.join()
+        # XXX: things still queued at shutdown are dropped
+        for worker in self.workers:
+            worker.queue.cancel_join_thread()
+
+    @property
+    def is_alive(self):
+        return any(worker.is_alive for worker in self.workers)
+
+    def _alive_worker_ids(self):
+        """
+        Returns the ids of the live workers. The things routed to dead
+        workers are dropped since they will never be parsed.
+        """
+        alive = []
+        for worker_id, worker in enumerate(self.workers):
+            if worker.is_alive:
+                alive.append(worker_id)
+
+            elif self._num_pending[worker_id] > 0:
+                dropped = [
+                        seq for seq, (i, _) in iteritems(self._pending)
+                        if i == worker_id
+                ]
+                for seq in dropped:
+                    del self._pending[seq]
+                self._num_pending[worker_id] = 0
+                logger.id(logger.warn, self,
+                        '{worker} died! Dropping #{num} unparsed'
+                        ' thing{plural} ...',
+                        worker=worker,
+                        num=len(dropped),
+                        plural=('' if len(dropped) == 1 else 's'),
+                )
+        return alive
+
+    def _route(self, fullname):
+        """
+        Returns the id of the live worker that parses the thing
+                or None if every worker is dead
+        """
+        alive = self._alive_worker_ids()
+        if not alive:
+            return None
+        return alive[zlib.crc32(fullname.encode('utf-8')) % len(alive)]
+
+    def submit(self, fullname, data):
+        """
+        Sends the pickled thing (see: reddit.pickle_thing) to its worker to be
+        parsed. Blocks while too many things submitted to the worker have not
+        been handled yet.
+
+        Returns True if the thing was submitted
+                or False if every worker is dead
+        """
+        worker_id = self._route(fullname)
+        if worker_id is None:
+            return False
+
+        worker = self.workers[worker_id]
+        self._pending[self._seq] = (worker_id, data)
+        self._num_pending[worker_id] += 1
+        worker.queue.put((self._seq, data))
+        self._seq += 1
+
+        self.handle_results()
+        while (
+                self._num_pending[worker_id]
+                >= ParsePool.MAX_PENDING_PER_WORKER
+                and worker.is_alive
+        ):
+            self.handle_results(timeout=ParsePool.RESULT_DELAY)
+        return True
+
+    def handle_results(self, timeout=0):
+        """
+        Queues replies to the parsed things that the bot can still reply to
+
+        timeout (float, optional) - the number of seconds to wait for the
+                first result (0 => don't wait)
+
+        Returns the number of results handled
+        """
+        num_handled = 0
+        while True:
+            try:
+                if timeout > 0 and num_handled == 0:
+                    result = self.results.get(timeout=timeout)
+                else:
+                    result = self.results.get_nowait()
+            except Empty:
+                break
+
+            worker_id, seq, usernames, elapsed = result
+            self._num_done[worker_id] += 1
+            self._parse_time[worker_id] += elapsed
+            num_handled += 1
+            try:
+                _, data = self._pending.pop(seq)
+            except KeyError:
+                # the worker died after putting the result (see:
+                # _alive_worker_ids)
+                continue
+            self._num_pending[worker_id] -= 1
+
+            if usernames:
+                thing = reddit.unpickle_thing(data, self.reddit_instance)
+                if self.filter.can_reply_remote(thing):
+                    self.filter.enqueue(thing, usernames)
+
+        return num_handled
+
+    def log_stats(self, force=False):
+        """
+        Logs the queue depth and each worker's throughput (at most once every
+        STATS_INTERVAL seconds)
+
+        force (bool, optional) - whether the interval should be ignored
+        """
+        last_done, last_time = self._last_stats
+        elapsed = time.time() - last_time
+        if not force and (
+                self._num_done == last_done
+                or elapsed < ParsePool.STATS_INTERVAL
+        ):
+            return
+
+        workers = []
+        for i, worker in enumerate(self.workers):
+            num_done = self._num_done[i]
+            workers.append(
+                    '{0}: #{1} queued, #{2} parsed ({3:.1f}/s;'
+                    ' avg {4:.1f}ms)'.format(
+                        worker,
+                        self._num_pending[i],
+                        num_done,
+                        (num_done - last_done[i]) / max(elapsed, 1),
+                        1000 * self._parse_time[i] / max(num_done, 1),
+                    )
+            )
+
+        logger.id(logger.debug, self,
+                'Queue depth: #{num}\n\t{workers}',
+                num=len(self._pending),
+                workers='\n\t'.join(workers),
+        )
+        self._last_stats = (list(self._num_done), time.time())
+
+
+__all__ = [
+        'ParseWorker',
+        'ParsePool',
+]
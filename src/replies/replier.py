@@ -1,3 +1,5 @@
+import time
+
 from .filter import Filter
 from .formatter import Formatter
 from constants import PREFIX_USER
@@ -9,7 +11,10 @@ from src.database import (
         SubredditsDatabase,
         UniqueConstraintFailed,
 )
-from src.instagram import Instagram
+from src.instagram import (
+        FetchScheduler,
+        Instagram,
+)
 from src.mixins import (
         ProcessMixin,
         RedditInstanceMixin,
@@ -25,6 +30,15 @@ class Replier(ProcessMixin, RedditInstanceMixin):
     separate process so that stream fetching processes are never interrupted.
     """
 
+    # the maximum number of reply-queued things processed per pass
+    BATCH_SIZE = 25
+    # the number of seconds a thing waiting on an instagram fetch is deferred
+    # (doubled every attempt up to MAX_RETRY_DELAY)
+    RETRY_DELAY = 5
+    MAX_RETRY_DELAY = 10 * 60
+    # the minimum number of seconds between log_stats() logs
+    STATS_INTERVAL = 60
+
     def __init__(self, cfg, rate_limited, blacklist):
         ProcessMixin.__init__(self)
         RedditInstanceMixin.__init__(self, cfg, rate_limited)
@@ -39,9 +53,10 @@ class Replier(ProcessMixin, RedditInstanceMixin):
         # cache to prevent the replier from refetching reddit information every
         # run_forever pass
         self._thing_cache = {}
-        # cache so that the replier can skip queued things if instagram is
+        # cache so that the replier can defer queued things if instagram is
         # ratelimited
         self._thing_requires_fetch = {}
+        self._last_stats = 0
 
     def _get_instagram_data(self, thing, ig_usernames):
         """
@@ -61,7 +76,11 @@ class Replier(ProcessMixin, RedditInstanceMixin):
 
         ig_list = []
         for ig_user in ig_usernames:
-            ig = Instagram(ig_user, self._killed)
+            # queue any required fetch for the fetch workers so that the
+            # replier can move on to other things in the meantime
+            ig = Instagram(
+                    ig_user, self._killed, FetchScheduler.PRIORITY_REPLY,
+            )
             if ig.top_media:
                 ig_list.append(ig)
             else:
@@ -209,11 +228,15 @@ class Replier(ProcessMixin, RedditInstanceMixin):
                 lengths=lengths,
         )
 
+        replies = []
         for body, ig_usernames in reply_list:
-            if self._reddit.do_reply(thing, body, self._killed):
+            reply = self._reddit.do_reply(thing, body, self._killed)
+            if reply:
                 # only require a single reply to succeed to consider this method
                 # a success
                 success = True
+                if reply is not True:
+                    replies.append(reply)
                 try:
                     self.reply_history.insert(thing, ig_usernames)
                 except UniqueConstraintFailed:
@@ -229,6 +252,9 @@ class Replier(ProcessMixin, RedditInstanceMixin):
                     )
 
         if success:
+            # remember the thread so that later thread checks in it do not
+            # need to fetch it (see: Filter._too_many_replies_in_thread)
+            reddit.remember_replied_thread(thing, replies)
             self.reply_history.commit()
         return success
 
@@ -243,33 +269,37 @@ class Replier(ProcessMixin, RedditInstanceMixin):
         except KeyError:
             pass
 
-    def _process_reply_queue(self):
+    def _defer(self, fullname, attempts):
         """
-        Processes the reply-queue until all elements have been seen.
+        Defers the reply-queued thing so that other things can be replied to
+        while it waits on its instagram fetches. The delay doubles with every
+        attempt and lasts at least as long as any instagram ratelimit.
         """
+        delay = min(
+                Replier.RETRY_DELAY * 2 ** attempts, Replier.MAX_RETRY_DELAY,
+        )
+        delay = max(delay, Instagram.ratelimit_delay)
+        with self.reply_queue:
+            self.reply_queue.update(fullname, delay)
 
-        seen = set()
-        while not self._killed.is_set() and self.reply_queue.size() > 0:
-            data = self.reply_queue.get()
-            if not data:
-                # queue is empty
-                break
+    def _process_reply_queue(self):
+        """
+        Processes a batch of the ready things in the reply-queue (see:
+        ReplyQueueDatabase.get_ready)
+        """
 
-            fullname, mention_id = data
-            if fullname in seen:
-                # all elements in the queue were processed
+        batch = self.reply_queue.get_ready(Replier.BATCH_SIZE)
+        for fullname, mention_id, attempts in batch:
+            if self._killed.is_set():
                 break
 
-            seen.add(fullname)
-
             if (
                     fullname in self._thing_requires_fetch
                     and Instagram.is_ratelimited
             ):
                 # the reply-queued thing requires an instagram fetch but
-                # instagram is ratelimited: skip the thing
-                # XXX: this doesn't sleep in case a thing that does not need
-                # any fetching is reply-queued
+                # instagram is ratelimited: wait out the ratelimit
+                self._defer(fullname, attempts)
                 continue
 
             try:
@@ -327,10 +357,9 @@ class Replier(ProcessMixin, RedditInstanceMixin):
             elif ig_list:
                 if None in ig_list:
                     # at least one user's fetch was interrupted.
-                    # cycle it to the back of the queue so we can check if we
-                    # can reply immediately to other things.
-                    with self.reply_queue:
-                        self.reply_queue.update(thing)
+                    # defer it so we can check if we can reply immediately to
+                    # other things.
+                    self._defer(fullname, attempts)
                     self._thing_requires_fetch[fullname] = True
 
                 else:
@@ -367,7 +396,7 @@ class Replier(ProcessMixin, RedditInstanceMixin):
                                 ' no instagram data to post!',
                                 color_thing=reddit.display_id(thing),
                         )
-                        return
+                        continue
 
                     if mention:
                         # successfully summoned to a subreddit (ie, found an
@@ -390,6 +419,24 @@ class Replier(ProcessMixin, RedditInstanceMixin):
                             mention,
                     )
 
+    def log_stats(self, force=False):
+        """
+        Logs the hit rate of the in-memory instagram user data cache (at most
+        once every STATS_INTERVAL seconds)
+
+        force (bool, optional) - whether the interval should be ignored
+        """
+        if not force and (
+                time.time() - self._last_stats < Replier.STATS_INTERVAL
+        ):
+            return
+
+        logger.id(logger.debug, self,
+                'Instagram user data cache: {stats}',
+                stats=Filter._format_cache_stats(Instagram.lru_stats),
+        )
+        self._last_stats = time.time()
+
     def _run_forever(self):
         # XXX: instantiated here so that the _reddit instance is constructed
         # in the child process
@@ -406,6 +453,7 @@ class Replier(ProcessMixin, RedditInstanceMixin):
 
             if not self._killed.is_set():
                 self._process_reply_queue()
+                self.log_stats()
 
             # sleep a bit in case all queues are empty to prevent wasteful CPU
             # spin
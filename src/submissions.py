@@ -4,19 +4,25 @@ from src import (
 )
 from src.mixins import (
         ProcessMixin,
-        SubredditsSubmissionsStreamMixin,
+        SubscriptionStreamMixin,
 )
 from src.util import logger
 
 
-class Submissions(ProcessMixin, SubredditsSubmissionsStreamMixin):
+class Submissions(ProcessMixin, SubscriptionStreamMixin):
     """
     Submissions process
     """
 
-    def __init__(self, cfg, rate_limited, blacklist):
+    def __init__(self, cfg, rate_limited, blacklist, subscription):
+        """
+        subscription (multiprocessing.Queue) - the poller's submissions queue
+                (see: poller.StreamPoller.subscribe)
+        """
         ProcessMixin.__init__(self)
-        SubredditsSubmissionsStreamMixin.__init__(self, cfg, rate_limited)
+        SubscriptionStreamMixin.__init__(
+                self, cfg, rate_limited, subscription,
+        )
         self.blacklist = blacklist
 
     def _run_forever(self):
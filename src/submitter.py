@@ -11,6 +11,7 @@ from src.database import (
 )
 from src.instagram import (
         Fetcher,
+        FetchScheduler,
         Instagram,
 )
 from src.mixins import (
@@ -153,9 +154,10 @@ class Submitter(ProcessMixin, RedditInstanceMixin):
 
         return pool
 
-    def _wait_for_fetch_delay(self):
+    def _wait_for_fetch_delay(self, user=None):
         """
-        Attempts to wait out the remaining instagram fetch delay
+        Attempts to wait out the remaining instagram fetch delay (or the
+        user's queued fetch)
 
         Returns True if a wait occurred
         """
@@ -165,6 +167,24 @@ class Submitter(ProcessMixin, RedditInstanceMixin):
         if delay < 0:
             delay = Instagram.ratelimit_delay
 
+        if delay <= 0 and user and FetchScheduler.is_pending(user):
+            # a fetch worker will fetch the user's data
+            logger.id(logger.debug, self,
+                    'Waiting for {color_user}\'s fetch ...',
+                    color_user=user,
+            )
+            FetchScheduler.wait_for(user, parse_time('5m'), self._killed)
+            return True
+
+        if delay <= 0 and user and Instagram.is_fetching(user):
+            # another process is fetching the user's data
+            logger.id(logger.debug, self,
+                    'Waiting for {color_user}\'s in-progress fetch ...',
+                    color_user=user,
+            )
+            Instagram.wait_for_fetch(user, parse_time('5m'), self._killed)
+            return True
+
         if delay <= 0:
             # another process is probably fetching the user's data
             delay = parse_time('5m')
@@ -216,10 +236,12 @@ class Submitter(ProcessMixin, RedditInstanceMixin):
 
             # verify that the user's profile is still public
             while not (ig or self._killed.is_set()):
-                ig = Instagram(user, self._killed)
+                ig = Instagram(
+                        user, self._killed, FetchScheduler.PRIORITY_SUBMIT,
+                )
                 if ig.non_highlighted_media is None:
-                    # fetch interrupted; retry when the delay is over
-                    self._wait_for_fetch_delay()
+                    # fetch interrupted or queued; retry when the delay is over
+                    self._wait_for_fetch_delay(user)
                     ig = None
 
                 elif (
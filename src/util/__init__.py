@@ -1,21 +1,28 @@
 import os
 
 
-def format_repeat_each_character_pattern(text):
+def remove_repeat_characters(text):
     """
-    Returns a regex pattern matching the given text and any variation of it that
-            repeats any character. eg. 'blah' -> 'b+l+a+h+' => matches 'blaaaah'
+    Returns the lower-cased text with any repeated characters collapsed.
+            eg. 'BlaAAah' -> 'blah'
+
+    Every variation of a string matched by its
+    format_repeat_each_character_pattern shares the same result.
     """
-    # remove repeating characters
     cleaned_text = []
     seen = ''
-    for c in text:
-        c = c.lower()
-        if c != seen.lower():
+    for c in text.lower():
+        if c != seen:
             cleaned_text.append(c)
             seen = c
-    cleaned_text = ''.join(cleaned_text)
+    return ''.join(cleaned_text)
 
+def format_repeat_each_character_pattern(text):
+    """
+    Returns a regex pattern matching the given text and any variation of it that
+            repeats any character. eg. 'blah' -> 'b+l+a+h+' => matches 'blaaaah'
+    """
+    cleaned_text = remove_repeat_characters(text)
     return ''.join( map(lambda c: '{0}+'.format(c), cleaned_text) )
 
 def get_padding(num):
@@ -0,0 +1,69 @@
+import ctypes
+import multiprocessing
+import time
+
+
+class SharedBudget(object):
+    """
+    Process-safe token bucket holding at most size tokens which refills at
+    size tokens per period seconds. The budget is shared by every process
+    spawned after it is created.
+    """
+
+    def __init__(self, size, period):
+        """
+        size (int) - the maximum number of tokens
+        period (float) - the number of seconds to refill an empty budget
+        """
+        self.size = float(size)
+        self.period = float(period)
+        self.__lock = multiprocessing.Lock()
+        self.__tokens = multiprocessing.Value(ctypes.c_double, self.size)
+        self.__timestamp = multiprocessing.Value(ctypes.c_double, time.time())
+
+    def __str__(self):
+        return '{0}({1:.1f}/{2:.0f})'.format(
+                self.__class__.__name__, self.tokens, self.size,
+        )
+
+    def __refill(self):
+        now = time.time()
+        elapsed = max(0, now - self.__timestamp.value)
+        self.__tokens.value = min(
+                self.size,
+                self.__tokens.value + elapsed * self.size / self.period,
+        )
+        self.__timestamp.value = now
+
+    @property
+    def tokens(self):
+        """
+        Returns the number of tokens left (negative if overspent)
+        """
+        with self.__lock:
+            self.__refill()
+            return self.__tokens.value
+
+    def spend(self, num=1, reserve=0):
+        """
+        Spends num tokens
+
+        reserve (float, optional) - the fraction of the budget that must be
+                left over after spending; nothing is spent if there is not
+                enough. 0 always spends, overdrawing the budget (by at most
+                its size) if necessary.
+
+        Returns True if the tokens were spent
+        """
+        with self.__lock:
+            self.__refill()
+            tokens = self.__tokens.value - num
+            if reserve > 0 and tokens < reserve * self.size:
+                return False
+            self.__tokens.value = max(tokens, -self.size)
+            return True
+
+
+__all__ = [
+        'SharedBudget',
+]
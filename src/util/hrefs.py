@@ -0,0 +1,38 @@
+from six.moves.html_parser import HTMLParser
+
+
+class _HrefParser(HTMLParser):
+    """
+    Streaming html tokenizer which collects the href of every anchor tag
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href' and value is not None:
+                    self.hrefs.append(value)
+                    break
+
+def parse_hrefs(html):
+    """
+    Returns the list of anchor hrefs in the html (in order). This is
+            equivalent to
+
+            >>> soup = BeautifulSoup(html)
+            >>> [a['href'] for a in soup.find_all('a', href=True)]
+
+            without building a tree.
+    """
+    parser = _HrefParser()
+    parser.feed(html)
+    parser.close()
+    return parser.hrefs
+
+
+__all__ = [
+        'parse_hrefs',
+]
@@ -105,22 +105,28 @@ class ProcessStreamHandler(logging.StreamHandler):
         with _lock:
             logging.StreamHandler.emit(self, *args, **kwargs)
 
+def _log_path(root_dir):
+    """
+    Returns (directory, filename) of a new log file in root_dir
+    """
+    # structure the logging directory by date
+    # eg. root/2017/09/24.131142.log
+    path = os.path.join(root_dir, time.strftime('%Y'), time.strftime('%m'))
+    return path, os.path.join(path, time.strftime('%d.%H%M%S.log'))
+
 class ProcessFileHandler(logging.FileHandler):
     """
     multiprocessing-safe file logging handler
     """
 
     def __init__(self, root_dir, mode='a', encoding=None, delay=False):
-        # structure the logging directory by date
-        # eg. root/2017/09/24.131142.log
-        path = os.path.join(root_dir, time.strftime('%Y'), time.strftime('%m'))
+        path, filename = _log_path(root_dir)
         if not delay:
             mkdirs(path)
         else:
             # set the path so that the creating the directories is delayed until
             # the first emit call
             self.__path = path
-        filename = os.path.join(path, time.strftime('%d.%H%M%S.log'))
 
         logging.FileHandler.__init__(self, filename, mode, encoding, delay)
 
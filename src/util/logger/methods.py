@@ -1,5 +1,4 @@
 from __future__ import print_function
-import inspect
 import logging
 import sys
 
@@ -10,6 +9,7 @@ from src.util.logger.classes import (
         ProcessStreamHandler,
 )
 from src.util.logger.formatter import Formatter
+from src.util.logger.writer import stop_writer
 
 
 DEBUG    = logging.DEBUG
@@ -25,24 +25,53 @@ __ROOT_LOGGER = None
 
 __EMPTY_FORMATTER = logging.Formatter('')
 
+# code object -> name of the module the code belongs to (see: _module_name)
+__CODE_MODULES = {}
+__CODE_MODULES_MAXSIZE = 4096
+# module name -> _Logger (see: _get)
+__LOGGERS = {}
+# the lowest level that any logger is enabled for; calls below it are dropped
+# before the calling module is resolved (see: _min_level, set_level)
+__MIN_LEVEL = None
+
+def _code_module_name(frame):
+    """
+    Returns the name of the module the frame's code belongs to
+            or None if the code does not belong to a module (eg. interpreter
+                input)
+    """
+    code = frame.f_code
+    try:
+        return __CODE_MODULES[code]
+    except KeyError:
+        pass
+
+    name = None
+    # eg. '<stdin>', '<string>'
+    if not code.co_filename.startswith('<'):
+        name = frame.f_globals.get('__name__')
+
+    if len(__CODE_MODULES) >= __CODE_MODULES_MAXSIZE:
+        # lots of dynamically created code; start over
+        __CODE_MODULES.clear()
+    __CODE_MODULES[code] = name
+    return name
+
 def _module_name():
     """
     Returns the first non-logger module name in the stack (ie, returns the
     calling module's name)
             or None if eg. called from interpreter
     """
-    name = None
-    module = None
-    stack = inspect.stack()
-    while stack and not module:
-        frame = stack.pop(0)
-        module = inspect.getmodule(frame[0])
-        if module and module.__name__ == __name__:
-            # not the calling module; keep looking
-            module = None
-    if module:
-        name = module.__name__
-    return name
+    # XXX: walk the frames directly; inspect.stack() reads the source context
+    # of every frame in the stack
+    frame = sys._getframe(1)
+    while frame:
+        name = _code_module_name(frame)
+        if name and name != __name__:
+            return name
+        frame = frame.f_back
+    return None
 
 def _initialize_root_logger():
     """
@@ -91,9 +120,33 @@ def _get(name=None):
     _initialize_root_logger()
 
     if name:
-        return __ROOT_LOGGER.getChild(name)
+        try:
+            return __LOGGERS[name]
+        except KeyError:
+            # getChild acquires the logging module's lock
+            logger = __ROOT_LOGGER.getChild(name)
+            __LOGGERS[name] = logger
+            return logger
     return __ROOT_LOGGER
 
+def _min_level():
+    """
+    Returns the lowest level that the root logger or any module's logger is
+    enabled for
+
+    Note: this is cached; levels should only be changed through set_level.
+    """
+    global __MIN_LEVEL
+
+    if __MIN_LEVEL is None:
+        levels = [_get().getEffectiveLevel()]
+        levels.extend(
+                logger.level for logger in __LOGGERS.values()
+                if logger.level != logging.NOTSET
+        )
+        __MIN_LEVEL = min(levels)
+    return __MIN_LEVEL
+
 def _empty(logger, level):
     if logger.isEnabledFor(level):
         # get all handlers for this logger and its ancestors
@@ -124,7 +177,15 @@ def _empty(logger, level):
                         handler.setFormatter(formatters[handler])
 
 def _log(__level__, __msg__, *__args__, **__kwargs__):
+    if __level__ < _min_level():
+        # disabled everywhere; don't bother resolving the calling module
+        return
+
     logger = _get(_module_name())
+    if not logger.isEnabledFor(__level__):
+        # don't bother building the record
+        return
+
     if __msg__ is None:
         _empty(logger, __level__)
     else:
@@ -173,8 +234,11 @@ def set_level(level, root=True):
     """
     Sets the level for either the root logger or the calling module's logger
     """
+    global __MIN_LEVEL
+
     name = None if root else _module_name()
     _get(name).setLevel(level)
+    __MIN_LEVEL = None
 
 def get_level(root=True):
     """
@@ -229,6 +293,7 @@ def clear_handlers(root=True):
         logger.removeHandler(logger.handlers[-1])
 
 def shutdown():
+    stop_writer()
     logging.shutdown()
 
 
@@ -0,0 +1,286 @@
+from __future__ import print_function
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import time
+
+from six import (
+        binary_type,
+        integer_types,
+        string_types,
+)
+from six.moves.queue import (
+        Empty,
+        Full,
+)
+
+from src.util import mkdirs
+from src.util.logger.classes import _log_path
+
+
+# the running LogWriter (see: start_writer)
+__WRITER = None
+# the pid of the process which started the LogWriter
+__WRITER_PARENT = None
+
+# the types that are shipped to the writer as-is
+_SHIPPABLE_TYPES = string_types + integer_types + (
+        binary_type, float, bool, type(None), list, tuple, set, dict,
+)
+
+class QueueHandler(logging.Handler):
+    """
+    Non-blocking handler which ships records to a LogWriter process instead of
+    formatting and writing them.
+
+    Records are dropped (and counted) if the queue is full rather than
+    blocking the logging process.
+    """
+
+    # exceptions are formatted in the logging process since tracebacks cannot
+    # be pickled
+    __EXC_FORMATTER = logging.Formatter()
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+        self.num_dropped = 0
+
+    def _serialize(self, record):
+        """
+        Returns the pickled record
+        """
+        if record.exc_info:
+            record.exc_text = self.__EXC_FORMATTER.formatException(
+                    record.exc_info
+            )
+            record.exc_info = None
+        if hasattr(record, 'ident') and not isinstance(
+                record.ident, string_types
+        ):
+            # eg. logger.id(..., self, ...)
+            record.ident = str(record.ident)
+
+        data = record.__dict__
+        try:
+            return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # stringify anything that could not be pickled
+            data = dict(data)
+            data['args'] = tuple(
+                    arg if isinstance(arg, _SHIPPABLE_TYPES) else str(arg)
+                    for arg in (data['args'] or ())
+            )
+            data['kwargs'] = {
+                    key: (
+                        val if isinstance(val, _SHIPPABLE_TYPES) else str(val)
+                    )
+                    for key, val in getattr(record, 'kwargs', {}).items()
+            }
+            try:
+                return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                # unpicklable object nested in a container
+                data['args'] = tuple(str(arg) for arg in data['args'])
+                data['kwargs'] = {
+                        key: str(val) for key, val in data['kwargs'].items()
+                }
+                return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+    def _put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except Full:
+            return False
+        return True
+
+    def emit(self, record):
+        try:
+            data = self._serialize(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        if self.num_dropped > 0:
+            dropped = logging.makeLogRecord({
+                'name': record.name,
+                'levelno': logging.WARNING,
+                'levelname': logging.getLevelName(logging.WARNING),
+                'msg': 'Log queue full: dropped #{num} record{plural}',
+                'kwargs': {
+                    'num': self.num_dropped,
+                    'plural': '' if self.num_dropped == 1 else 's',
+                },
+            })
+            if self._put(self._serialize(dropped)):
+                self.num_dropped = 0
+
+        if not self._put(data):
+            self.num_dropped += 1
+
+class RotatingFileHandler(logging.FileHandler):
+    """
+    File handler which starts a new log file once the current file exceeds a
+    size or age. Records are not flushed individually (see: LogWriter).
+
+    This is not process-safe; it is intended to be used by a single LogWriter.
+    """
+
+    def __init__(self, root_dir, max_bytes=0, max_age=0, encoding=None):
+        """
+        root_dir (str) - the logging directory (see: ProcessFileHandler)
+        max_bytes (int, optional) - the file size to rotate at (0 => never)
+        max_age (float, optional) - the number of seconds to rotate after
+                (0 => never)
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        path, filename = _log_path(root_dir)
+        mkdirs(path)
+        logging.FileHandler.__init__(self, filename, 'a', encoding, delay=True)
+        self.opened = time.time()
+
+    def should_rotate(self):
+        if self.stream is None:
+            return False
+        if self.max_age > 0 and time.time() - self.opened >= self.max_age:
+            return True
+        return self.max_bytes > 0 and self.stream.tell() >= self.max_bytes
+
+    def rotate(self):
+        self.close()
+        path, filename = _log_path(self.root_dir)
+        if filename == self.baseFilename:
+            # rotated within the same second
+            filename = '{0}.{1}'.format(filename, int(time.time() * 1000))
+        mkdirs(path)
+        self.baseFilename = os.path.abspath(filename)
+        self.stream = None
+        self.opened = time.time()
+
+    def emit(self, record):
+        if self.should_rotate():
+            self.rotate()
+        if self.stream is None:
+            self.stream = self._open()
+
+        try:
+            self.stream.write(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+class LogWriter(multiprocessing.Process):
+    """
+    Process which formats and writes the records shipped by every process's
+    QueueHandler. Records are written in batches and the handlers are flushed
+    once per batch.
+    """
+
+    def __init__(self, queue, handlers, batch_size=256, flush_interval=0.5):
+        """
+        queue (multiprocessing.Queue) - the QueueHandlers' queue
+        handlers (list) - the handlers which write the records
+        batch_size (int, optional) - the max number of records per batch
+        flush_interval (float, optional) - the max number of seconds a record
+                waits before being written
+        """
+        multiprocessing.Process.__init__(self, name=self.__class__.__name__)
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    __EMPTY_FORMATTER = logging.Formatter('')
+
+    def _write(self, batch):
+        for data in batch:
+            record = logging.makeLogRecord(pickle.loads(data))
+            for handler in self.handlers:
+                if record.levelno < handler.level:
+                    continue
+
+                if record.msg == '':
+                    # an empty line (see: methods._empty)
+                    formatter = handler.formatter
+                    handler.setFormatter(self.__EMPTY_FORMATTER)
+                    handler.handle(record)
+                    handler.setFormatter(formatter)
+                else:
+                    handler.handle(record)
+        for handler in self.handlers:
+            handler.flush()
+
+    def run(self):
+        # keep writing until stop() so that the other processes' shutdown
+        # logging is not lost
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        done = False
+        while not done:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                pass
+
+            if None in batch:
+                # stop() sentinel; write everything queued before it
+                done = True
+                batch = batch[:batch.index(None)]
+            if batch:
+                self._write(batch)
+
+        for handler in self.handlers:
+            handler.close()
+
+    def stop(self, timeout=10):
+        self.queue.put(None)
+        self.join(timeout)
+
+def start_writer(handlers, maxsize=100000, **kwargs):
+    """
+    Starts a LogWriter which writes to the given handlers
+
+    This should be called before any other processes are started so that they
+    inherit the queue.
+
+    Returns the QueueHandler which ships records to the writer
+    """
+    global __WRITER
+    global __WRITER_PARENT
+
+    stop_writer()
+    queue = multiprocessing.Queue(maxsize)
+    __WRITER = LogWriter(queue, handlers, **kwargs)
+    __WRITER_PARENT = os.getpid()
+    __WRITER.daemon = True
+    __WRITER.start()
+    return QueueHandler(queue)
+
+def stop_writer():
+    """
+    Writes any queued records and stops the LogWriter (if one is running)
+    """
+    global __WRITER
+
+    if __WRITER_PARENT != os.getpid():
+        # only the process that started the writer can stop it
+        return
+
+    if __WRITER and __WRITER.is_alive():
+        __WRITER.stop()
+    __WRITER = None
+
+
+__all__ = [
+        'QueueHandler',
+        'RotatingFileHandler',
+        'LogWriter',
+        'start_writer',
+        'stop_writer',
+]
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Size-bounded, in-memory least-recently-used cache which counts its lookup
+    hits and misses. This class is not intended to be process safe (each
+    process gets its own copy).
+    """
+
+    def __init__(self, maxsize):
+        """
+        maxsize (int) - the maximum number of entries to hold; the least
+                recently used entry is evicted once this is exceeded.
+                <= 0 disables the cache (nothing is stored)
+        """
+        self.maxsize = maxsize
+        self.__data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return '{0}({1}/{2})'.format(
+                self.__class__.__name__, len(self), self.maxsize,
+        )
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        # note: membership tests do not count as hits/misses or bump recency
+        return key in self.__data
+
+    def __iter__(self):
+        # iterate over a copy so that callers may pop while iterating
+        return iter(list(self.__data.keys()))
+
+    def get(self, key, default=None, count=True):
+        """
+        Returns the cached value for key (marking it as most recently used)
+                or default if key is not cached
+
+        count (bool, optional) - whether the lookup is counted as a hit/miss.
+                Callers caching containers of values may instead count the
+                lookups of the contained values themselves (see: count_lookup)
+        """
+        try:
+            # re-insert to mark as most recently used
+            value = self.__data.pop(key)
+        except KeyError:
+            if count:
+                self.misses += 1
+            return default
+
+        self.__data[key] = value
+        if count:
+            self.hits += 1
+        return value
+
+    def count_lookup(self, hit):
+        """
+        Counts a lookup made outside of get() as a hit or miss
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def set(self, key, value):
+        """
+        Caches value under key, evicting the least recently used entries if
+        the cache is full
+        """
+        if self.maxsize <= 0:
+            return
+
+        self.__data.pop(key, None)
+        self.__data[key] = value
+        while len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        return self.__data.pop(key, default)
+
+    def clear(self):
+        self.__data.clear()
+
+    @property
+    def hit_rate(self):
+        """
+        Returns the ratio of lookups that were hits (0 if nothing was looked up)
+        """
+        total = self.hits + self.misses
+        return float(self.hits) / total if total > 0 else 0
+
+    @property
+    def stats(self):
+        """
+        Returns a dictionary of the cache's counters
+        """
+        return {
+                'size': len(self),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate,
+        }
+
+
+__all__ = [
+        'LRUCache',
+]
+
@@ -0,0 +1,187 @@
+from collections import defaultdict
+import re
+
+try:
+    # python 3.11+
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+# the largest character range expanded when looking for a pattern's starting
+# characters (eg. '[a-z]'); larger ranges may start with any character
+_MAX_RANGE = 128
+
+def _first_characters(items):
+    """
+    Returns a tuple (chars, nullable) where
+            chars (set) - the lower-cased characters that the parsed pattern
+                can start with or None if it could start with any character
+            nullable (bool) - whether the pattern can match an empty string
+    """
+    chars = set()
+    for op, av in items:
+        nullable = False
+        if op == sre_parse.LITERAL:
+            first = set([chr(av)])
+
+        elif op == sre_parse.IN:
+            first = set()
+            for in_op, in_av in av:
+                if in_op == sre_parse.LITERAL:
+                    first.add(chr(in_av))
+                elif (
+                        in_op == sre_parse.RANGE
+                        and in_av[1] - in_av[0] <= _MAX_RANGE
+                ):
+                    first.update(
+                            chr(c) for c in range(in_av[0], in_av[1] + 1)
+                    )
+                else:
+                    # negated set, category (eg. '\w'), large range
+                    return None, False
+
+        elif op == sre_parse.BRANCH:
+            first = set()
+            for branch in av[1]:
+                branch_first, branch_nullable = _first_characters(branch)
+                if branch_first is None:
+                    return None, False
+                first |= branch_first
+                nullable = nullable or branch_nullable
+
+        elif op == sre_parse.SUBPATTERN:
+            # (group, add_flags, del_flags, pattern)
+            first, nullable = _first_characters(av[-1])
+
+        elif op in (
+                sre_parse.MAX_REPEAT,
+                sre_parse.MIN_REPEAT,
+                getattr(sre_parse, 'POSSESSIVE_REPEAT', None),
+        ):
+            # (min, max, pattern)
+            first, nullable = _first_characters(av[2])
+            nullable = nullable or av[0] == 0
+
+        elif op == sre_parse.AT:
+            # zero-width (eg. '\b')
+            first = set()
+            nullable = True
+
+        else:
+            # any character, category, lookaround, group reference, ...
+            return None, False
+
+        if first is None:
+            return None, False
+        chars |= first
+        if not nullable:
+            return set(c.lower() for c in chars), False
+
+    return set(c.lower() for c in chars), True
+
+def start_characters(pattern):
+    """
+    Returns the set of lower-cased characters that a search of the pattern can
+            match at the start of
+            or None if the pattern is not anchored to the start of the string
+            (ie, '^') or if its starting characters could not be determined
+
+    eg. '^(?:foo|ba+r)' -> set(['f', 'b'])
+    """
+    items = list(sre_parse.parse(pattern))
+    if len(items) == 1 and items[0][0] == sre_parse.BRANCH:
+        # every branch must be anchored
+        branches = items[0][1][1]
+    else:
+        branches = [items]
+
+    result = set()
+    for branch in branches:
+        branch = list(branch)
+        if not branch or branch[0] != (sre_parse.AT, sre_parse.AT_BEGINNING):
+            return None
+
+        chars, nullable = _first_characters(branch[1:])
+        if (
+                chars is None
+                or nullable
+                # XXX: some non-ascii characters match ascii characters when
+                # ignoring case (eg. the kelvin sign matches 'k')
+                or any(ord(c) >= 128 for c in chars)
+        ):
+            return None
+        result |= chars
+    return result
+
+
+class PrefixDispatchRegex(object):
+    """
+    Alternation of many regex patterns which only tries the patterns that can
+    match the start of the searched string.
+
+    Patterns anchored to the start of the string (see: start_characters) are
+    grouped by their possible starting characters so that a search only
+    compiles in the patterns that could match; the remaining patterns are
+    tried for every search. The results are identical to searching the full
+    alternation ('|'.join(patterns)).
+    """
+
+    def __init__(self, patterns, flags=0):
+        """
+        patterns (list) - the regex patterns to alternate between (in order)
+        flags (int, optional) - the re flags to compile the patterns with
+                (re.MULTILINE disables the dispatch)
+        """
+        patterns = list(patterns)
+        self.regex = re.compile('|'.join(patterns), flags=flags)
+        self.num_patterns = len(patterns)
+
+        dispatched = defaultdict(set)
+        always = set()
+        for i, pattern in enumerate(patterns):
+            chars = None
+            if not flags & re.MULTILINE:
+                chars = start_characters(pattern)
+            if chars is None:
+                always.add(i)
+            else:
+                for c in chars:
+                    dispatched[c].add(i)
+
+        def compile_patterns(indices):
+            # keep the original order so that the same alternative matches
+            return re.compile(
+                    '|'.join(patterns[i] for i in sorted(indices)),
+                    flags=flags,
+            )
+
+        self.__dispatch = {
+                c: compile_patterns(indices | always)
+                for c, indices in dispatched.items()
+        }
+        self.__default = compile_patterns(always) if always else None
+        self.num_always = len(always)
+
+    def __str__(self):
+        return '{0}({1} patterns; {2} dispatched)'.format(
+                self.__class__.__name__,
+                self.num_patterns,
+                self.num_patterns - self.num_always,
+        )
+
+    def search(self, text):
+        """
+        Returns the same result as re.search('|'.join(patterns), text)
+        """
+        if not text or ord(text[0]) >= 128:
+            return self.regex.search(text)
+
+        regex = self.__dispatch.get(text[0].lower(), self.__default)
+        return regex.search(text) if regex else None
+
+
+__all__ = [
+        'start_characters',
+        'PrefixDispatchRegex',
+]
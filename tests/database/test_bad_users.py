@@ -48,3 +48,16 @@ def test_bad_users_get_username_patterns(bad_users_db, _cassiebrown_bot_reply):
         assert len(patterns) == 1
         assert re.search('^{0}$'.format('|'.join(patterns)), '_cassiebrown_')
 
+
+def test_bad_users_is_bad_username(bad_users_db, _cassiebrown_bot_reply):
+    with _seed(bad_users_db, _cassiebrown_bot_reply):
+        assert bad_users_db.is_bad_username('_cassiebrown_')
+        assert bad_users_db.is_bad_username('_CaSSiebroooown__')
+        assert not bad_users_db.is_bad_username('cassiebrown')
+
+def test_bad_users_is_bad_username_sees_changes(bad_users_db):
+    assert not bad_users_db.is_bad_username('foobar')
+    bad_users_db.insert('foobar', 't3_foobar', score=-10)
+    assert bad_users_db.is_bad_username('foobar')
+    bad_users_db.delete('foobar')
+    assert not bad_users_db.is_bad_username('foobar')
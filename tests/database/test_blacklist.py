@@ -0,0 +1,67 @@
+import time
+
+from src.database import BlacklistDatabase
+
+
+def _expire(blacklist, name):
+    start = time.time() - 2 * blacklist.cfg.blacklist_temp_ban_time
+    with blacklist:
+        blacklist._db.execute(
+                'UPDATE blacklist SET start = ? WHERE name = ?',
+                (start, name),
+        )
+
+def test_blacklist_snapshot(blacklist_db):
+    blacklist = blacklist_db
+    names = [
+            ('AskReddit', BlacklistDatabase.TYPE_SUBREDDIT),
+            ('u/foobar', BlacklistDatabase.TYPE_SUBREDDIT),
+            ('perma', BlacklistDatabase.TYPE_USER),
+    ]
+    with blacklist:
+        for name, name_type in names:
+            blacklist.insert(name, name_type)
+        blacklist.insert('temp', BlacklistDatabase.TYPE_USER, True)
+
+    snapshot = blacklist.get_snapshot()
+    assert len(snapshot) == 4
+    assert snapshot.is_blacklisted_subreddit('askreddit')
+    assert snapshot.is_blacklisted_subreddit('u_FooBar')
+    assert not snapshot.is_blacklisted_subreddit('pics')
+    assert snapshot.is_blacklisted_user('PERMA')
+    assert snapshot.time_left_seconds('perma') == BlacklistDatabase.PERMANENT
+    temp_ban_time = blacklist.cfg.blacklist_temp_ban_time
+    assert 0 < snapshot.time_left_seconds('temp') <= temp_ban_time
+    assert not snapshot.is_blacklisted_user('someone')
+
+    with blacklist:
+        for name, name_type in names:
+            blacklist.delete(name, name_type)
+        blacklist.delete('temp', BlacklistDatabase.TYPE_USER)
+
+def test_blacklist_expired_checks_do_not_write(blacklist_db):
+    blacklist = blacklist_db
+    with blacklist:
+        blacklist.insert('lifted', BlacklistDatabase.TYPE_USER, True)
+        blacklist.insert('permanent', BlacklistDatabase.TYPE_USER, True)
+        blacklist.set_make_permanent('permanent', BlacklistDatabase.TYPE_USER)
+    _expire(blacklist, 'lifted')
+    _expire(blacklist, 'permanent')
+
+    num_changes = blacklist._db.total_changes
+    assert not blacklist.is_blacklisted_user('lifted')
+    assert blacklist.is_blacklisted_user('permanent')
+    assert not blacklist.is_blacklisted_temporarily('permanent')
+    snapshot = blacklist.get_snapshot()
+    assert not snapshot.is_blacklisted_user('lifted')
+    assert snapshot.is_blacklisted_user('permanent')
+    assert blacklist._db.total_changes == num_changes
+
+    assert blacklist.sweep_expired() == (1, 1)
+    assert blacklist.sweep_expired() == (0, 0)
+    snapshot = blacklist.get_snapshot()
+    assert len(snapshot) == 1
+    assert snapshot.time_left_seconds('permanent') == BlacklistDatabase.PERMANENT
+
+    with blacklist:
+        blacklist.delete('permanent', BlacklistDatabase.TYPE_USER)
@@ -0,0 +1,56 @@
+import time
+
+from src.database import CommentAncestryDatabase
+
+
+def test_comment_ancestry_get(comment_ancestry_db):
+    ancestry = comment_ancestry_db
+    num_hits, num_misses = ancestry.num_hits, ancestry.num_misses
+    with ancestry:
+        ancestry.insert([
+            ('t1_root', 't3_post', 'foo'),
+            ('t1_child', 't1_root', 'bar'),
+        ])
+    assert 't1_child' in ancestry
+    row = ancestry.get('t1_child')
+    assert (row['parent_fullname'], row['author']) == ('t1_root', 'bar')
+    assert ancestry.get('t1_unknown') is None
+    assert ancestry.num_hits - num_hits == 1
+    assert ancestry.num_misses - num_misses == 1
+
+def test_comment_ancestry_prunes_expired(comment_ancestry_db, monkeypatch):
+    ancestry = comment_ancestry_db
+    # prune on every insert
+    monkeypatch.setattr(CommentAncestryDatabase, 'PRUNE_INTERVAL', 1)
+    expired = time.time() - 2 * CommentAncestryDatabase.EXPIRE_TIME
+    with ancestry:
+        ancestry.insert([('t1_old', 't3_post', 'foo')])
+        ancestry._db.execute(
+                'UPDATE comments SET seen = ? WHERE fullname = ?',
+                (expired, 't1_old'),
+        )
+        ancestry.insert([('t1_new', 't3_post', 'bar')])
+    assert 't1_old' not in ancestry
+    assert 't1_new' in ancestry
+
+def test_comment_ancestry_pins_thread(comment_ancestry_db, monkeypatch):
+    ancestry = comment_ancestry_db
+    monkeypatch.setattr(CommentAncestryDatabase, 'PRUNE_INTERVAL', 1)
+    with ancestry:
+        ancestry.insert([
+            ('t1_top', 't3_thread', 'foo'),
+            ('t1_mid', 't1_top', 'bar'),
+            ('t1_side', 't1_top', 'baz'),
+        ])
+        ancestry.insert([('t1_reply', 't1_mid', 'bot')], pinned=True)
+        assert ancestry.pin_thread('t1_reply') == 2
+        # re-seeing a pinned comment does not unpin it
+        ancestry.insert([('t1_mid', 't1_top', 'bar')])
+
+        ancestry._db.execute(
+                'UPDATE comments SET seen = ?',
+                (time.time() - 2 * CommentAncestryDatabase.EXPIRE_TIME,),
+        )
+        ancestry.insert([('t1_new', 't3_thread', 'qux')])
+    assert all(f in ancestry for f in ('t1_top', 't1_mid', 't1_reply'))
+    assert 't1_side' not in ancestry
@@ -0,0 +1,193 @@
+import sqlite3
+
+import pytest
+
+from src.database import (
+        BadUsernamesDatabase,
+        Database,
+        InstagramFetchQueueDatabase,
+        ReplyDatabase,
+        SeenThingsDatabase,
+)
+
+
+def _db(tmpdir, name='test.db'):
+    db = BadUsernamesDatabase()
+    db.path = str(tmpdir.join(name))
+    return db
+
+class _Thing(object):
+    def __init__(self, fullname):
+        self.fullname = fullname
+
+def _reply_db(tmpdir):
+    db = ReplyDatabase()
+    db.path = str(tmpdir.join('replies.db'))
+    return db
+
+def test_database_shares_connection(tmpdir):
+    first = _db(tmpdir)
+    second = _db(tmpdir)
+    assert first._db.connection is second._db.connection
+    first.close()
+    second.close()
+
+def test_database_separate_files_do_not_share_connection(tmpdir):
+    first = _db(tmpdir, 'first.db')
+    second = _db(tmpdir, 'second.db')
+    assert first._db.connection is not second._db.connection
+    first.close()
+    second.close()
+
+def test_database_close_keeps_shared_connection_open(tmpdir):
+    first = _db(tmpdir)
+    second = _db(tmpdir)
+    first._db
+    second._db
+    first.close()
+    assert second._db.execute('SELECT 1').fetchone()[0] == 1
+    second.close()
+    assert Database.resolve_path(second.path) not in Database._connections
+
+def test_database_reopens_after_close(tmpdir):
+    db = _db(tmpdir)
+    connection = db._db.connection
+    db.close()
+    assert db._db.connection is not connection
+    db.close()
+
+@pytest.mark.parametrize('pragma,expected', [
+    ('journal_mode', 'wal'),
+    ('synchronous', 1), # NORMAL
+    ('cache_size', -8192),
+    ('mmap_size', 64 * 1024 * 1024),
+])
+def test_database_pragmas(tmpdir, pragma, expected):
+    db = _db(tmpdir)
+    cursor = db._db.execute('PRAGMA {0}'.format(pragma))
+    assert cursor.fetchone()[0] == expected
+    db.close()
+
+def test_database_lock_stats_default(tmpdir):
+    db = _db(tmpdir)
+    assert db.lock_stats['num_waits'] == 0
+    db._record_lock_wait(1.5, 3)
+    db._record_lock_wait(0.5, 1)
+    stats = db.lock_stats
+    assert stats['num_waits'] == 2
+    assert stats['num_retries'] == 4
+    assert stats['total_wait'] == 2.0
+    assert stats['max_wait'] == 1.5
+
+def test_database_creates_declared_indexes(tmpdir):
+    db = _reply_db(tmpdir)
+    cursor = db._db.execute(
+            'SELECT name FROM sqlite_master WHERE type = \'index\''
+    )
+    names = set(row['name'] for row in cursor)
+    for index in db._create_index_data:
+        assert index.split()[0] in names
+
+    plan = db._db.execute(
+            'EXPLAIN QUERY PLAN SELECT 1 FROM comments'
+            ' WHERE replied_fullname = ?',
+            ('t1_foo',),
+    ).fetchall()
+    assert any('comments_replied_idx' in row['detail'] for row in plan)
+    db.close()
+
+def test_database_count_and_exists(tmpdir):
+    db = _reply_db(tmpdir)
+    with db:
+        db._db.executemany(
+                'INSERT INTO comments('
+                '   replied_fullname, submission_fullname, ig_user'
+                ') VALUES(?, ?, ?)',
+                [
+                    ('t1_a', 't3_a', 'foo'),
+                    ('t1_a', 't3_a', 'bar'),
+                    ('t1_b', 't3_a', 'baz'),
+                    ('t1_c', 't3_b', 'foo'),
+                ],
+        )
+
+    assert db._count('comments') == 4
+    assert db._count('comments', 'submission_fullname = ?', ('t3_a',)) == 3
+    assert db._exists('comments')
+    assert db._exists('comments', 'replied_fullname = ?', ('t1_c',))
+    assert not db._exists('comments', 'replied_fullname = ?', ('t1_d',))
+    assert not db._exists('comments', 'submission_fullname = ?', ('t3_c',))
+    assert db.num_replied_things_for_submission(_Thing('t3_a')) == 2
+    assert db.num_replied_things_for_submission(_Thing('t3_c')) == 0
+    assert db.has_replied(_Thing('t1_b'))
+    assert not db.has_replied(_Thing('t1_d'))
+    db.close()
+
+def test_database_nested_rollback_keeps_other_changes(tmpdir):
+    path = str(tmpdir.join('seen.db'))
+    first = SeenThingsDatabase()
+    first.path = path
+    second = SeenThingsDatabase()
+    second.path = path
+    with first:
+        first.insert('t1_a')
+        with pytest.raises(ValueError):
+            with second:
+                second.insert('t1_b')
+                raise ValueError
+        # the nested block neither committed nor discarded the outer changes
+        assert first._db.in_transaction
+    assert not first._db.in_transaction
+    assert 't1_a' in first
+    assert 't1_b' not in first
+    first.close()
+    second.close()
+
+def test_database_nested_method_block(tmpdir):
+    queue = InstagramFetchQueueDatabase()
+    queue.path = str(tmpdir.join('queue.db'))
+    with pytest.raises(ValueError):
+        with queue:
+            queue.insert('foo', 0)
+            # claim opens its own block on the connection
+            assert queue.claim(0) == 'foo'
+            assert queue._db.in_transaction
+            raise ValueError
+    assert 'foo' not in queue
+
+    with queue:
+        queue.insert('foo', 0)
+        assert queue.claim(0) == 'foo'
+        queue.commit()
+        assert queue._db.in_transaction
+    assert not queue._db.in_transaction
+    assert 'foo' in queue
+    queue.close()
+
+class _NewSeenThingsDatabase(SeenThingsDatabase):
+    @property
+    def _create_table_data(self):
+        return (
+                'seen('
+                '   slot INTEGER PRIMARY KEY NOT NULL,'
+                '   seq INTEGER NOT NULL,'
+                '   fullname TEXT NOT NULL UNIQUE,'
+                '   extra INTEGER'
+                ')'
+        )
+
+def test_database_outdated_file_evicts_shared_connection(tmpdir):
+    path = str(tmpdir.join('seen.db'))
+    old = SeenThingsDatabase()
+    old.path = path
+    old_connection = old._db.connection
+    new = _NewSeenThingsDatabase()
+    new.path = path
+    new_connection = new._db.connection
+    assert new_connection is not old_connection
+    with pytest.raises(sqlite3.ProgrammingError):
+        old_connection.execute('SELECT 1')
+    # the evicted instance reopens the new file
+    assert old._db.connection is new_connection
+    old.close()
+    new.close()
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', ''])
+    proc.wait()
+    return proc.pid
+
+def test_fetch_lease_single_owner(ig_fetch_lease_db):
+    leases = ig_fetch_lease_db
+    pid = os.getpid()
+    other = os.getppid()
+    assert leases.acquire('foo', pid, 60)
+    # renewing an owned lease
+    assert leases.acquire('FOO', pid, 60)
+    assert not leases.acquire('foo', other, 60)
+    assert leases.get_owner('foo') == pid
+    assert 'foo' in leases
+    assert not leases.renew('foo', other, 60)
+    leases.release('foo', other)
+    assert 'foo' in leases
+    leases.release('foo', pid)
+    assert 'foo' not in leases
+    assert leases.acquire('foo', other, 60)
+    leases.release('foo', other)
+
+def test_fetch_lease_reclaims_stale(ig_fetch_lease_db):
+    leases = ig_fetch_lease_db
+    pid = os.getpid()
+    other = os.getppid()
+    assert leases.acquire('dead', _dead_pid(), 60)
+    assert 'dead' not in leases
+    assert leases.acquire('dead', pid, 60)
+
+    assert leases.acquire('expired', other, -1)
+    assert 'expired' not in leases
+    assert leases.acquire('expired', pid, 60)
+
+    assert leases.acquire('stale', _dead_pid(), 60)
+    assert leases.acquire('live', pid, 60)
+    assert leases.reap() == 1
+    assert leases.get_owner('live') == pid
+    for ig_user in ('dead', 'expired', 'live'):
+        leases.release(ig_user, pid)
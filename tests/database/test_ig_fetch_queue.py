@@ -0,0 +1,44 @@
+def test_fetch_queue_claims_by_priority(ig_fetch_queue_db):
+    queue = ig_fetch_queue_db
+    with queue:
+        queue.insert('prefetch', 10)
+        queue.insert('reply', 0)
+        queue.insert('later_reply', 0)
+    assert queue.claim(0) == 'reply'
+    assert queue.claim(1) == 'later_reply'
+    assert queue.claim(2) == 'prefetch'
+    assert queue.claim(3) is None
+    assert queue.num_waiting() == 0
+    with queue:
+        for ig_user in ('prefetch', 'reply', 'later_reply'):
+            queue.delete(ig_user)
+
+def test_fetch_queue_requeue_raises_priority(ig_fetch_queue_db):
+    queue = ig_fetch_queue_db
+    with queue:
+        queue.insert('foo', 10)
+        queue.insert('bar', 5)
+        queue.insert('foo', 0)
+        # never lowered
+        queue.insert('bar', 10)
+    assert queue.size() == 2
+    assert queue.claim(0) == 'foo'
+    # the worker's existing claim
+    assert queue.claim(0) == 'foo'
+    assert queue.claim(1) == 'bar'
+    with queue:
+        queue.delete('foo')
+        queue.delete('bar')
+
+def test_fetch_queue_release(ig_fetch_queue_db):
+    queue = ig_fetch_queue_db
+    with queue:
+        queue.insert('foo', 0)
+    assert queue.claim(0) == 'foo'
+    assert queue.claim(1) is None
+    queue.release(0, 'foo')
+    assert queue.claim(1) == 'foo'
+    assert 'FOO' in queue
+    with queue:
+        queue.delete('foo')
+    assert 'foo' not in queue
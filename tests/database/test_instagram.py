@@ -0,0 +1,150 @@
+import pytest
+
+from src.database import (
+        InstagramDatabase,
+        InstagramStoreDatabase,
+)
+
+
+def _item(i, num_likes, num_comments=0):
+    return {
+            'shortcode': 'code{0}'.format(i),
+            'edge_media_preview_like': {'count': num_likes},
+            'edge_media_to_comment': {'count': num_comments},
+            'taken_at_timestamp': 1500000000 + i,
+    }
+
+ITEMS = [_item(i, (i * 7919) % 1000 + 1, (i * 31) % 50) for i in range(50)]
+
+def _seed(db, items=ITEMS):
+    with db:
+        for item in items:
+            db.insert(item)
+    return db
+
+def _store(tmpdir, user):
+    return InstagramStoreDatabase(str(tmpdir.join('store.db')), user)
+
+def test_instagram_store_path_shards():
+    single = InstagramStoreDatabase.get_path('foo', 1)
+    assert single.endswith(InstagramStoreDatabase.PATH)
+    paths = set(
+            InstagramStoreDatabase.get_path('user{0}'.format(i), 4)
+            for i in range(100)
+    )
+    assert len(paths) == 4
+    # the shard must be stable for a given user
+    assert (
+            InstagramStoreDatabase.get_path('foo', 4)
+            == InstagramStoreDatabase.get_path('FOO', 4)
+    )
+
+def test_instagram_store_users_are_separate(tmpdir):
+    foo = _seed(_store(tmpdir, 'foo'))
+    bar = _seed(_store(tmpdir, 'bar'), ITEMS[:10])
+    assert foo.size() == len(ITEMS)
+    assert bar.size() == 10
+    assert not _store(tmpdir, 'baz').exists
+
+    bar.flag_as_bad()
+    assert bar.is_flagged_as_bad
+    assert not foo.is_flagged_as_bad
+    assert foo.size() == len(ITEMS)
+
+    foo.remove()
+    assert not foo.exists
+    assert foo.size() == 0
+    assert bar.exists
+
+def test_instagram_store_matches_user_database(tmpdir):
+    user_db = _seed(InstagramDatabase(str(tmpdir.join('foo.db'))))
+    store = _store(tmpdir, 'foo')
+    assert store.migrate(user_db) == len(ITEMS)
+    assert store.size() == user_db.size()
+    assert store.get_all_codes() == user_db.get_all_codes()
+    assert store.order_string == user_db.order_string
+    assert store.mtime == pytest.approx(user_db.mtime)
+    # re-importing does not duplicate anything
+    assert store.migrate(user_db) == 0
+
+@pytest.fixture(params=['user', 'store'])
+def igdb(request, tmpdir):
+    if request.param == 'user':
+        return _seed(InstagramDatabase(str(tmpdir.join('foo.db'))))
+    return _seed(_store(tmpdir, 'foo'))
+
+def test_instagram_top_media_uses_order_string(igdb):
+    igdb.update_ranking()
+    cursor = igdb._execute(
+            'SELECT code FROM cache WHERE {{where}}'
+            ' ORDER BY {0}'.format(igdb.order_string)
+    )
+    codes = [row['code'] for row in cursor]
+    media = igdb.get_top_media()
+    assert len(media) == len(ITEMS)
+    assert all(link.endswith('/{0}'.format(code)) for link, code in zip(
+        media, codes
+    ))
+
+def test_instagram_top_media_num_start(igdb):
+    media = igdb.get_top_media()
+    assert igdb.get_top_media(num=10) == media[:10]
+    assert igdb.get_top_media(num=10, start=5) == media[5:15]
+    assert igdb.get_top_media(num=-1, start=45) == media[45:]
+
+def test_instagram_ranking_invalidated_by_changes(igdb):
+    igdb.update_ranking()
+    assert igdb.is_ranked
+    igdb.delete('code0')
+    igdb.commit()
+    assert not igdb.is_ranked
+    assert len(igdb.get_top_media()) == len(ITEMS) - 1
+    assert igdb.is_ranked
+
+def test_instagram_upsert_updates_existing(igdb):
+    updated = [_item(i, 5000 + i, 7) for i in range(5)]
+    new = [_item(i, 1) for i in range(len(ITEMS), len(ITEMS) + 3)]
+    with igdb:
+        assert igdb.upsert(updated + new) == len(updated) + len(new)
+    assert igdb.size() == len(ITEMS) + len(new)
+    cursor = igdb._execute(
+            'SELECT num_likes, num_comments FROM cache'
+            ' WHERE code = :code AND {where}',
+            code='code0',
+    )
+    row = cursor.fetchone()
+    assert (row['num_likes'], row['num_comments']) == (5000, 7)
+
+def test_instagram_prune_unseen(igdb):
+    with igdb:
+        igdb.upsert(ITEMS[:10])
+        igdb.upsert(ITEMS[5:20])
+    assert igdb.num_seen() == 20
+    assert igdb.get_unseen_codes() == set(
+            item['shortcode'] for item in ITEMS[20:]
+    )
+    assert igdb.prune_unseen() == len(ITEMS) - 20
+    assert igdb.get_all_codes() == set(
+            item['shortcode'] for item in ITEMS[:20]
+    )
+    assert igdb.num_seen() == 0
+
+def test_instagram_upsert_without_seen(igdb):
+    with igdb:
+        igdb.upsert(ITEMS[:10], mark_seen=False)
+    assert igdb.num_seen() == 0
+    assert igdb.get_top_codes(num=3) == [
+            link.rsplit('/', 1)[-1] for link in igdb.get_top_media(num=3)
+    ]
+
+def test_instagram_fetch_stats(igdb):
+    assert igdb.last_full_fetch is None
+    assert igdb.get_fetch_stats() == {}
+    igdb.record_fetch(InstagramDatabase.FETCH_FULL, 12)
+    igdb.record_fetch(InstagramDatabase.FETCH_INCREMENTAL, 3)
+    igdb.record_fetch(InstagramDatabase.FETCH_INCREMENTAL, 4)
+    assert igdb.last_full_fetch is not None
+    assert igdb.get_fetch_stats() == {
+            InstagramDatabase.FETCH_FULL: (1, 12),
+            InstagramDatabase.FETCH_INCREMENTAL: (2, 7),
+    }
@@ -0,0 +1,76 @@
+import sqlite3
+
+from src.database import ReplyQueueDatabase
+
+
+class _Thing(object):
+    def __init__(self, fullname, created_utc):
+        self.fullname = fullname
+        self.created_utc = created_utc
+
+def _clear(queue, *fullnames):
+    with queue:
+        for fullname in fullnames:
+            queue.delete(fullname)
+
+def test_reply_queue_dequeues_oldest_things_first(reply_queue_db):
+    queue = reply_queue_db
+    with queue:
+        queue.insert(_Thing('t1_new', 300))
+        queue.insert(_Thing('t1_old', 100))
+        queue.insert(_Thing('t1_mid', 200))
+
+    assert [data[0] for data in queue.get_ready(2)] == ['t1_old', 't1_mid']
+    assert queue.size() == 3
+    _clear(queue, 't1_new', 't1_old', 't1_mid')
+
+def test_reply_queue_defers_things(reply_queue_db):
+    queue = reply_queue_db
+    with queue:
+        queue.insert(_Thing('t1_a', 100))
+        queue.insert(_Thing('t1_b', 200))
+        queue.update('t1_a', 60)
+
+    # deferred things are skipped until their delay elapses
+    assert queue.get_ready(10) == [('t1_b', None, 0)]
+    assert 't1_a' in queue
+
+    with queue:
+        queue.update('t1_a', 0)
+    assert queue.get_ready(1) == [('t1_a', None, 2)]
+    _clear(queue, 't1_a', 't1_b')
+
+def test_reply_queue_migrates_old_queue(tmpdir):
+    # an existing queue from before the created_utc ordering
+    path = tmpdir.join(ReplyQueueDatabase.PATH)
+    old_db = sqlite3.connect(str(path))
+    old_db.execute(
+            'CREATE TABLE queue('
+            '   thing_fullname TEXT PRIMARY KEY NOT NULL,'
+            '   timestamp REAL NOT NULL,'
+            '   mention_id TEXT'
+            ')'
+    )
+    old_db.execute('INSERT INTO queue VALUES(\'t1_old\', 100, \'m\')')
+    old_db.commit()
+    old_db.close()
+
+    queue = ReplyQueueDatabase()
+    queue.path = str(path)
+    with queue:
+        queue.insert(_Thing('t1_new', 50))
+    # the queued thing is kept and ordered by its queue time
+    assert queue.get_ready(10) == [('t1_new', None, 0), ('t1_old', 'm', 0)]
+    queue.close()
+
+def test_reply_queue_get_ready_does_not_sort(reply_queue_db):
+    plan = reply_queue_db._db.execute(
+            'EXPLAIN QUERY PLAN'
+            ' SELECT thing_fullname, mention_id, attempts FROM queue'
+            ' WHERE not_before <= ?'
+            ' ORDER BY created_utc ASC LIMIT ?',
+            (0, 1),
+    ).fetchall()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'queue_ready_idx' in details
+    assert 'TEMP B-TREE' not in details
@@ -0,0 +1,31 @@
+from src.database import SeenThingsDatabase
+
+
+def _insert(seen, *fullnames):
+    with seen:
+        for fullname in fullnames:
+            seen.insert(fullname)
+
+def test_seen_things_overwrites_oldest(seen_things_db):
+    seen = seen_things_db
+    _insert(seen, 't1_a', 't1_b', 't1_c')
+    assert all(f in seen for f in ('t1_a', 't1_b', 't1_c'))
+
+    _insert(seen, 't1_d')
+    assert 't1_a' not in seen
+    assert 't1_d' in seen
+    assert seen.size() == 3
+
+def test_seen_things_persists_head(seen_things_db):
+    _insert(seen_things_db, 't1_p1', 't1_p2', 't1_p3', 't1_p4')
+
+    # a new instance (eg. after a restart) continues from the newest fullname
+    seen = SeenThingsDatabase(3)
+    seen.path = seen_things_db.path
+    _insert(seen, 't1_p5')
+    assert 't1_p2' not in seen
+    assert all(f in seen for f in ('t1_p3', 't1_p4', 't1_p5'))
+
+    shrunk = SeenThingsDatabase(2)
+    shrunk.path = seen_things_db.path
+    assert shrunk.size() <= 2
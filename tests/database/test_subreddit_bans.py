@@ -0,0 +1,34 @@
+import time
+
+
+def test_subreddit_bans_get_banned(subreddit_bans_db):
+    bans = subreddit_bans_db
+    num_hits, num_misses = bans.num_hits, bans.num_misses
+    assert bans.get_banned('pics', 60) is None
+    with bans:
+        bans.insert('Pics', True)
+        bans.insert('aww', False)
+    assert bans.get_banned('pics', 60) is True
+    assert bans.get_banned('AWW', 60) is False
+    assert bans.num_hits - num_hits == 2
+    assert bans.num_misses - num_misses == 1
+
+    with bans:
+        bans.insert('pics', False)
+        bans.delete('aww')
+    assert bans.get_banned('pics', 60) is False
+    assert bans.get_banned('aww', 60) is None
+
+    with bans:
+        bans.delete('pics')
+
+def test_subreddit_bans_expire(subreddit_bans_db):
+    bans = subreddit_bans_db
+    with bans:
+        bans.insert('pics', True)
+        bans._db.execute('UPDATE bans SET checked = ?', (time.time() - 120,))
+    assert bans.get_banned('pics', 60) is None
+    assert bans.get_banned('pics', 600) is True
+
+    with bans:
+        bans.delete('pics')
@@ -20,3 +20,52 @@ def bad_users_db(tmpdir_factory):
     db.path = str(_test_path(tmpdir_factory, db))
     return db
 
+
+@pytest.fixture(scope='module')
+def ig_fetch_queue_db(tmpdir_factory):
+    """ InstagramFetchQueueDatabase """
+    db = database.InstagramFetchQueueDatabase()
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def ig_fetch_lease_db(tmpdir_factory):
+    """ InstagramFetchLeaseDatabase """
+    db = database.InstagramFetchLeaseDatabase()
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def blacklist_db(tmpdir_factory, cfg):
+    """ BlacklistDatabase (unseeded) """
+    db = database.BlacklistDatabase(cfg, do_seed=False)
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def subreddit_bans_db(tmpdir_factory):
+    """ SubredditBansDatabase """
+    db = database.SubredditBansDatabase()
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def comment_ancestry_db(tmpdir_factory):
+    """ CommentAncestryDatabase """
+    db = database.CommentAncestryDatabase()
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def seen_things_db(tmpdir_factory):
+    """ SeenThingsDatabase (with room for 3 fullnames) """
+    db = database.SeenThingsDatabase(3)
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
+
+@pytest.fixture(scope='module')
+def reply_queue_db(tmpdir_factory):
+    """ ReplyQueueDatabase """
+    db = database.ReplyQueueDatabase()
+    db.path = str(_test_path(tmpdir_factory, db))
+    return db
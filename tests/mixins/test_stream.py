@@ -0,0 +1,168 @@
+import time
+
+from src import reddit
+from src.mixins import (
+        StreamMixin,
+        StreamShard,
+        SubredditsThingsStreamMixin,
+)
+
+
+class _Config(object):
+    stream_shard_size = 2
+    stream_max_poll_interval = 60
+    poll_min_interval = 15
+    poll_max_interval = 600
+
+class _Thing(object):
+    def __init__(self, fullname, created_utc=None):
+        self.fullname = fullname
+        self.created_utc = created_utc or time.time()
+
+    def __eq__(self, other):
+        return getattr(other, 'fullname', other) == self.fullname
+
+class _SubredditStream(object):
+    def __init__(self, listings):
+        self.listings = listings
+
+    def _stream(self, stream_type):
+        # mimic stream_generator(pause_after=-1)
+        for batch in self.listings.get(stream_type, []):
+            for thing in batch:
+                yield thing
+            yield None
+        while True:
+            yield None
+
+    def comments(self, pause_after):
+        return self._stream('comments')
+
+    def submissions(self, pause_after):
+        return self._stream('submissions')
+
+class _Subreddits(object):
+    def __init__(self, listings):
+        self.stream = _SubredditStream(listings)
+
+class _Reddit(object):
+    def __init__(self, listings):
+        self.listings = listings
+
+    def subreddit(self, name):
+        return _Subreddits(self.listings.get(name, {}))
+
+def _things_stream(listings):
+    mixin = SubredditsThingsStreamMixin.__new__(SubredditsThingsStreamMixin)
+    mixin.cfg = _Config()
+    mixin.shards = []
+    mixin._RedditInstanceMixin__reddit_instance = _Reddit(listings)
+    return mixin
+
+def test_things_stream_polls_each_shard():
+    mixin = _things_stream({
+        'a+B': {
+            'comments': [[_Thing('t1_a'), _Thing('t1_b')]],
+            'submissions': [[_Thing('t3_a')]],
+        },
+        'c': {
+            'comments': [[_Thing('t1_c')]],
+        },
+    })
+    stream = mixin._create_stream(set(['c', 'B', 'a']))
+    assert [shard.name for shard in mixin.shards] == ['a+B', 'c']
+    things = [next(stream) for _ in range(6)]
+    assert things == ['t1_a', 't1_b', 't3_a', 't1_c', None, None]
+    assert [shard.num_polls for shard in mixin.shards] == [1, 1]
+
+def test_stream_shard_interval_follows_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    busy = [[_Thing('t1_{0}_{1}'.format(i, j)) for j in range(100)]
+            for i in range(3)]
+    shard = StreamShard('a', _Subreddits({'comments': busy}), ('comments',), 60)
+
+    assert len(shard.poll()) == 100
+    assert shard.num_full == 0
+    for _ in range(2):
+        now[0] += 1
+        assert len(shard.poll()) == 100
+    assert shard.interval == StreamShard.MIN_INTERVAL
+    assert shard.num_full == 2
+    assert shard.next_poll == now[0] + StreamShard.MIN_INTERVAL
+
+    # quiet => backs off until max_interval
+    for _ in range(20):
+        now[0] += shard.interval
+        assert shard.poll() == []
+    assert shard.interval == 60
+    assert shard.num_polls == 23
+
+def test_stream_shard_inherit_skips_replayed_listing(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    listing = [[_Thing('t1_{0}'.format(i)) for i in range(100)]]
+    shard = StreamShard(
+            'a', _Subreddits({'comments': listing}), ('comments',), 600,
+    )
+    shard.poll()
+    now[0] += 600
+    assert shard.poll() == []
+    assert shard.interval == 600
+
+    # the re-initialized stream replays the existing listing
+    restarted = StreamShard(
+            'a', _Subreddits({'comments': listing}), ('comments',), 600,
+    )
+    restarted.inherit(shard)
+    now[0] += 600
+    assert len(restarted.poll()) == 100
+    assert restarted.interval == 600
+    assert restarted.num_full == 0
+    assert restarted.lag == 0
+
+def test_poll_delay_adapts_to_activity():
+    mixin = StreamMixin(_Config(), None)
+    # idle => backs off exponentially
+    assert [mixin._poll_delay(0) for _ in range(6)] == [
+            30, 60, 120, 240, 480, 600,
+    ]
+    # new items => shortens
+    assert [mixin._poll_delay(1) for _ in range(7)] == [
+            300, 150, 75, 37.5, 18.75, 15, 15,
+    ]
+
+def test_can_poll_is_forced_after_poll_max_interval(monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    # the budget is always too low for a poll respecting the reserve
+    monkeypatch.setattr(reddit, 'spend_requests',
+            lambda num=1, reserve=0: not reserve
+    )
+    mixin = StreamMixin(_Config(), None)
+    assert mixin._can_poll()
+    now[0] += 1
+    assert not mixin._can_poll()
+    # the skipped loop wakes up in time for the forced poll
+    assert [mixin._poll_delay(0) for _ in range(6)] == [
+            30, 60, 120, 240, 480, 599,
+    ]
+    now[0] += 599
+    assert mixin._can_poll()
+    assert not mixin._can_poll()
+
+class _InboxStream(StreamMixin):
+    def __init__(self):
+        StreamMixin.__init__(self, _Config(), None)
+        self.num_requests = 0
+
+    def _stream_method(self, limit, **kwargs):
+        self.num_requests += 1
+        return [_Thing('t1_{0}'.format(self.num_requests))]
+
+def test_stream_poll_is_one_request():
+    mixin = _InboxStream()
+    assert next(mixin._stream) == 't1_1'
+    # pauses after the response even though it had new items
+    assert next(mixin._stream) is None
+    assert mixin.num_requests == 1
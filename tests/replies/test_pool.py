@@ -0,0 +1,116 @@
+import praw
+import pytest
+
+from src import reddit
+from src.replies import (
+        Filter,
+        ParsePool,
+        ParseWorker,
+)
+
+
+class _Config(object):
+    parse_workers = 3
+
+class _Filter(object):
+    def __init__(self, can_reply=True):
+        self.can_reply = can_reply
+        self.checked = []
+        self.enqueued = []
+
+    def can_reply_remote(self, thing):
+        self.checked.append(thing)
+        return self.can_reply
+
+    def enqueue(self, thing, usernames):
+        self.enqueued.append((thing, usernames))
+
+class _Thing(object):
+    def __init__(self, fullname):
+        self.fullname = fullname
+        self.permalink_url = fullname
+
+    def __eq__(self, other):
+        return getattr(other, 'fullname', other) == self.fullname
+
+def _praw_reddit():
+    return praw.Reddit(
+            client_id='test', client_secret='test', user_agent='test',
+    )
+
+def _pickled(reddit_instance, comment_id):
+    comment = praw.models.Comment(reddit_instance, _data={
+        'id': comment_id,
+        'author': 'foo',
+    })
+    return comment.fullname, reddit.pickle_thing(comment)
+
+@pytest.fixture
+def dead_workers(monkeypatch):
+    dead = set()
+    monkeypatch.setattr(ParseWorker, 'is_alive', property(
+        lambda worker: worker.worker_id not in dead
+    ))
+    return dead
+
+def test_parse_pool_skips_dead_workers(dead_workers):
+    receiver = _praw_reddit()
+    pool = ParsePool(_Config(), None, _Filter(), receiver)
+    things = [_pickled(receiver, 'c{0}'.format(i)) for i in range(30)]
+    for fullname, data in things:
+        assert pool.submit(fullname, data)
+    assert sum(pool._num_pending) == len(things)
+    # duplicates are routed to the same worker
+    assert pool._route(things[0][0]) == pool._route(things[0][0])
+
+    dead_workers.add(0)
+    num_dead_pending = pool._num_pending[0]
+    for fullname, data in things:
+        assert pool._route(fullname) != 0
+    # the dead worker's things will never be parsed
+    assert pool._num_pending[0] == 0
+    assert len(pool._pending) == len(things) - num_dead_pending
+
+    dead_workers.update([1, 2])
+    assert not pool.submit(*things[0])
+    assert not pool._pending
+    pool.join()
+
+def test_parse_pool_handles_results(dead_workers):
+    sender = _praw_reddit()
+    receiver = _praw_reddit()
+    thing_filter = _Filter()
+    pool = ParsePool(_Config(), None, thing_filter, receiver)
+    fullname, data = _pickled(sender, 'foo')
+    assert pool.submit(fullname, data)
+    worker_id, = [i for i, num in enumerate(pool._num_pending) if num]
+
+    pool.results.put((worker_id, 0, ['instagram'], 0.01))
+    assert pool.handle_results(timeout=5) == 1
+    thing, = thing_filter.checked
+    assert thing.fullname == fullname
+    assert thing._reddit is receiver
+    assert thing_filter.enqueued == [(thing, ['instagram'])]
+    assert not pool._pending
+    pool.join()
+
+def test_filter_can_reply_remote():
+    thing_filter = Filter.__new__(Filter)
+    thing_filter.num_checked = 0
+    thing_filter.num_rejected = {stage: 0 for stage in Filter.REJECT_STAGES}
+    thing_filter.reply_queue = [_Thing('t1_queued')]
+    thing_filter._is_banned = lambda thing: thing.fullname == 't1_banned'
+    thing_filter._too_many_replies_in_thread = (
+            lambda thing: thing.fullname == 't1_thread'
+    )
+
+    assert thing_filter.can_reply_remote(_Thing('t1_foo'))
+    assert not thing_filter.can_reply_remote(_Thing('t1_queued'))
+    assert not thing_filter.can_reply_remote(_Thing('t1_banned'))
+    assert not thing_filter.can_reply_remote(_Thing('t1_thread'))
+    assert thing_filter.can_reply_remote(
+            _Thing('t1_thread'), check_thread=False,
+    )
+    assert thing_filter.num_checked == 5
+    assert thing_filter.num_rejected[Filter.REJECT_CAN_REPLY] == 2
+    assert thing_filter.num_rejected[Filter.REJECT_THREAD] == 1
@@ -90,15 +90,39 @@ def test_config__str__(tmpdir_factory):
     ('blacklist_temp_ban_time', config.parse_time('3d')),
     ('bad_actor_expire_time', config.parse_time('1d')),
     ('bad_actor_threshold', 3),
+    ('parser_word_cache_size', 10000),
+    ('english_words_path', ''),
+    ('jargon_prefix_dispatch', True),
+    ('parse_workers', 0),
+    ('subreddit_ban_cache_time', config.parse_time('1d')),
+    ('stream_shard_size', 100),
+    ('stream_max_poll_interval', config.parse_time('1m')),
+    ('poll_min_interval', config.parse_time('15s')),
+    ('poll_max_interval', config.parse_time('10m')),
+    ('reddit_requests_per_minute', 60),
 
     ('instagram_cache_expire_time', config.parse_time('7d')),
     ('min_follower_count', 1000),
+    ('media_store_shards', 0),
+    ('top_media_cache_size', 5000),
+    ('fetch_workers', 2),
+    ('instagram_reconcile_time', config.parse_time('30d')),
+    ('refresh_top_k', 25),
+
+    ('database_synchronous', 'NORMAL'),
+    ('database_busy_timeout', 5),
+    ('database_cache_size', 8192),
+    ('database_mmap_size', 64 * 1024 * 1024),
+    ('database_lock_max_delay', 2),
 
     ('logging_path',
         config.resolve_path(
             os.path.join(constants.DATA_ROOT_DIR, 'logs'))),
     ('logging_level', 'INFO'),
     ('colorful_logs', True),
+    ('log_writer', True),
+    ('log_max_size', 52428800),
+    ('log_rotate_time', config.parse_time('1d')),
 ])
 def test_config_properties(cfg, attr, expected):
     assert getattr(cfg, attr) == expected
@@ -195,6 +195,31 @@ def test_instagram_guesses_potential_ig_user_strings(string):
 def test_instagram_does_not_overmatch_potential_ig_user_strings(string):
     assert not instagram.IG_USER_STRING_REGEX.search(string)
 
+@pytest.mark.parametrize('string', [
+    'https://www.instagram.com/haileypandolfi/',
+    '[yeah she is disgusting](https://www.instagram.com/p/_3FsrHxd0T/)',
+    'Love her. Melvinbrucefrench@yahoo.com',
+    'IG: @linstahh',
+    'Possibly nikinikiii on insta?',
+    'Deliahatesyou (IG)',
+    'Name: Caprice\n\nIG:capbarista',
+    '> Karmabirdfly\n\n[your welcome](https://www.pornhub.com/)',
+    '   >>>>Karmabirdfly',
+    'vyvan.le',
+    'Meow ',
+])
+def test_instagram_may_contain_ig_user_strings(string):
+    assert instagram.MAY_CONTAIN_IG_USER_REGEX.search(string)
+
+@pytest.mark.parametrize('string', [
+    'Who is that? ',
+    'Yo that\'s not cool',
+    'Story of my life.\n\nSauce? sauce sauce',
+    'Big if true',
+])
+def test_instagram_cannot_contain_ig_user_strings(string):
+    assert not instagram.MAY_CONTAIN_IG_USER_REGEX.search(string)
+
 def test_instagram_matches_links(haileypandolfi, viktoria_kay):
     assert instagram.IG_LINK_REGEX.search(haileypandolfi.body)
     assert not instagram.IG_LINK_QUERY_REGEX.search(haileypandolfi.body)
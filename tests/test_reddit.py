@@ -1,3 +1,4 @@
+import praw
 import pytest
 
 from constants import(
@@ -73,6 +74,15 @@ def test_prefix_user(name, expected):
 def test_pack_subreddits():
     assert reddit.pack_subreddits(['games', 'memes', 'AskReddit']) == 'games+memes+AskReddit'
 
+@pytest.mark.parametrize('size,expected', [
+    (2, ['AskReddit+games', 'memes']),
+    (3, ['AskReddit+games+memes']),
+    (0, ['AskReddit+games+memes']),
+])
+def test_shard_subreddits(size, expected):
+    subreddits = ['games', 'memes', 'AskReddit']
+    assert reddit.shard_subreddits(subreddits, size) == expected
+
 def test_unpack_subreddits():
     unpacked = reddit.unpack_subreddits('games+memes+AskReddit')
     assert len(unpacked) == 3
@@ -98,6 +108,26 @@ def test_display_fullname_submission(submission):
 def test_display_fullname_subreddit(subreddit):
     assert reddit.display_fullname(subreddit).startswith('t5_3odt0')
 
+def _praw_reddit():
+    return praw.Reddit(
+            client_id='test', client_secret='test', user_agent='test',
+    )
+
+def test_pickle_thing_comment():
+    comment = praw.models.Comment(_praw_reddit(), _data={
+        'id': 'dmzb5qa',
+        'author': 'lv10wizard',
+        'body': 'foo',
+    })
+    receiver = _praw_reddit()
+    unpickled = reddit.unpickle_thing(reddit.pickle_thing(comment), receiver)
+    assert unpickled.fullname == comment.fullname
+    assert unpickled.body == 'foo'
+    # rebound to the receiving process's instance
+    assert unpickled._reddit is receiver
+    assert unpickled.author._reddit is receiver
+    assert str(unpickled.author) == 'lv10wizard'
+
 # def test_author_comment(comment):
 #     assert reddit.author(comment) == 'lv10wizard'
 
@@ -96,6 +96,28 @@ def test_get_level_module():
     logger_methods.set_level(logging.DEBUG, root=False)
     assert logger_methods.get_level(root=False) == logging.DEBUG
 
+def test_module_name_nested():
+    def nested():
+        return (lambda: logger_methods._module_name())()
+    assert nested() == __name__
+    # cached
+    assert nested() == __name__
+
+def test_disabled_level_is_not_handled():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger_methods.add_handler(handler, root=False)
+    try:
+        logger_methods.set_level(logging.WARNING, root=False)
+        logger_methods.debug('{foo}', foo='bar')
+        assert not records
+        logger_methods.warn('{foo}', foo='bar')
+        assert len(records) == 1
+    finally:
+        logger_methods.remove_handler(handler, root=False)
+        logger_methods.set_level(logging.DEBUG, root=False)
+
 def test_is_enabled_for():
     logger_methods.set_level(logging.ERROR, root=False)
     assert logger_methods.is_enabled_for(logging.DEBUG) is False
@@ -159,3 +181,18 @@ def test_clear_handlers_module(root_logger):
 # TODO: test Formatter methods, handles unicode
 #def test_
 
+
+def test_disabled_level_skips_module_resolution(monkeypatch):
+    def _module_name():
+        raise AssertionError('resolved the calling module')
+
+    level = logger_methods.get_level()
+    logger_methods.set_level(logging.WARNING)
+    logger_methods.set_level(logging.WARNING, root=False)
+    monkeypatch.setattr(logger_methods, '_module_name', _module_name)
+    try:
+        logger_methods.debug('{foo}', foo='bar')
+    finally:
+        monkeypatch.undo()
+        logger_methods.set_level(level)
+        logger_methods.set_level(logging.DEBUG, root=False)
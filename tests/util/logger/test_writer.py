@@ -0,0 +1,62 @@
+import logging
+import threading
+
+from six.moves import queue
+
+from src.util.logger import (
+        formatter as logger_formatter,
+        writer as logger_writer,
+)
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+def _record(msg, exc_info=None, **kwargs):
+    record = logging.LogRecord(
+            'test', logging.INFO, __file__, 1, msg, (), exc_info,
+    )
+    record.kwargs = kwargs
+    return record
+
+def _ship(records, maxsize=0):
+    q = queue.Queue(maxsize)
+    handler = logger_writer.QueueHandler(q)
+    for record in records:
+        handler.handle(record)
+
+    target = _ListHandler()
+    target.setFormatter(logger_formatter.Formatter(fmt='%(message)s'))
+    writer = logger_writer.LogWriter(q, [target])
+    batch = []
+    while not q.empty():
+        batch.append(q.get_nowait())
+    writer._write(batch)
+    return handler, target.lines
+
+def test_queue_handler_ships_unpicklable_kwargs():
+    _, lines = _ship([
+        _record('{foo} {lock}', foo='bar', lock=threading.Lock()),
+    ])
+    assert len(lines) == 1
+    assert lines[0].startswith('bar <unlocked')
+
+def test_queue_handler_formats_exceptions():
+    try:
+        raise ValueError('oops')
+    except ValueError:
+        import sys
+        record = _record('failed', exc_info=sys.exc_info())
+    _, lines = _ship([record])
+    assert lines[0].startswith('failed\nTraceback')
+    assert lines[0].endswith('ValueError: oops')
+
+def test_queue_handler_drops_when_full():
+    handler, lines = _ship([_record(str(i)) for i in range(5)], maxsize=3)
+    assert handler.num_dropped == 2
+    assert lines == ['0', '1', '2']
@@ -0,0 +1,32 @@
+import time
+
+from src.util.budget import SharedBudget
+
+
+def test_budget_reserve(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    budget = SharedBudget(10, 60)
+
+    # background spending stops at the reserve
+    for _ in range(7):
+        assert budget.spend(1, reserve=0.25)
+    assert not budget.spend(1, reserve=0.25)
+    assert budget.tokens == 3
+
+    # priority spending overdraws by at most the size of the budget
+    for _ in range(20):
+        assert budget.spend(1)
+    assert budget.tokens == -10
+
+def test_budget_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    budget = SharedBudget(10, 60)
+    assert budget.spend(10)
+    assert budget.tokens == 0
+
+    now[0] += 30
+    assert budget.tokens == 5
+    now[0] += 600
+    assert budget.tokens == 10
@@ -0,0 +1,20 @@
+from bs4 import BeautifulSoup
+import pytest
+
+from src.util.hrefs import parse_hrefs
+
+
+@pytest.mark.parametrize('html', [
+    '',
+    '<div class="md"><p>Who is that?</p>\n</div>',
+    '<div class="md"><p><a href="https://www.instagram.com/foo/">foo</a></p>'
+    '\n</div>',
+    '<p><a href="https://imgur.com/a">a</a> and'
+    ' <A HREF="https://instagram.com/p/abc/?taken-by=bar&amp;hl=en">b</A></p>',
+    '<p><a name="anchor">no href</a><a href="/r/foo">r/foo</a></p>',
+    '<p><a href="https://instagram.com/foo">unclosed <em>tags</p>',
+])
+def test_hrefs_matches_beautifulsoup(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    expected = [a['href'] for a in soup.find_all('a', href=True)]
+    assert parse_hrefs(html) == expected
@@ -0,0 +1,48 @@
+from src.util.lru import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    # touch 'a' so that 'b' is the least recently used
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert 'b' not in lru
+    assert 'a' in lru and 'c' in lru
+    assert lru.evictions == 1
+
+def test_lru_counts_hits_and_misses():
+    lru = LRUCache(10)
+    lru.set('a', 1)
+    assert lru.get('a') == 1
+    assert lru.get('b') is None
+    assert lru.get('b', 'default') == 'default'
+    assert lru.hits == 1
+    assert lru.misses == 2
+    assert lru.stats['hit_rate'] == 1.0 / 3
+
+def test_lru_pop_while_iterating():
+    lru = LRUCache(10)
+    for i in range(5):
+        lru.set(('user', i), i)
+    for key in lru:
+        if key[1] % 2 == 0:
+            lru.pop(key)
+    assert len(lru) == 2
+
+def test_lru_disabled():
+    lru = LRUCache(0)
+    lru.set('a', 1)
+    assert len(lru) == 0
+    assert lru.get('a') is None
+
+def test_lru_uncounted_lookup():
+    lru = LRUCache(10)
+    lru.set('user', {'a': 1})
+    values = lru.get('user', count=False)
+    assert lru.get('missing', count=False) is None
+    lru.count_lookup('a' in values)
+    lru.count_lookup('b' in values)
+    assert lru.hits == 1
+    assert lru.misses == 1
@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+from src.util.regex import (
+        PrefixDispatchRegex,
+        start_characters,
+)
+
+
+@pytest.mark.parametrize('pattern,expected', [
+    (r'^foo', set(['f'])),
+    (r'^(?:Foo|ba+r)\b', set(['f', 'b'])),
+    (r'^a*b+', set(['a', 'b'])),
+    (r'^[x-z]', set(['x', 'y', 'z'])),
+    (r'^foo|^bar', set(['f', 'b'])),
+    (r'foo', None),
+    (r'^\w+', None),
+    (r'^a*', None),
+    (r'^foo|bar', None),
+])
+def test_regex_start_characters(pattern, expected):
+    assert start_characters(pattern) == expected
+
+def test_regex_prefix_dispatch_matches_alternation():
+    patterns = [
+            r'l+o+l+\b',
+            r'^b+r+o+\b',
+            r'^(?:a+y+)?l+m+a+o+\b',
+            r'^\d+[a-z]+\b',
+            r'^h+a+(?:h+a+)*\b',
+    ]
+    regex = re.compile('|'.join(patterns), flags=re.IGNORECASE)
+    dispatch = PrefixDispatchRegex(patterns, flags=re.IGNORECASE)
+    for word in [
+            'lol', 'trolololol', 'BROOO', 'brother', 'aylmao', 'Lmaooo',
+            '2spooky', 'hahaha', 'Ha', 'foobar', '', 'é', 'kbro',
+    ]:
+        expected = regex.search(word)
+        match = dispatch.search(word)
+        assert bool(match) == bool(expected)
+        if expected:
+            assert match.span() == expected.span()